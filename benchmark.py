@@ -0,0 +1,417 @@
+"""
+Benchmarks offline da aplicação (updated_app.py).
+
+Uso:
+    python benchmark.py freeze-corpus [--corpus DIR] [--browser]
+        Baixa as páginas de URLs_Datasets_TCC.txt e salva o HTML no corpus (uma vez).
+
+    python benchmark.py clean-text [--corpus DIR] [--repeat N]
+        Compara os backends de clean_text (bs4 e lxml) nas páginas do corpus:
+        tempo, páginas/s, MB/s e se o texto gerado é idêntico.
+
+    python benchmark.py pipeline [--corpus DIR] [--provider ollama|openai] [--latency MS] [--concurrency N]
+                                 [--fields CAMPOS] [--templates] [--pack] [--items N] [--stream] [--output ARQUIVO]
+        Executa process_url completo sobre o corpus, com um servidor LLM local que imita as APIs
+        da OpenAI e do Ollama (latência configurável). Reporta, por dataset: páginas/s, latência
+        p50/p95, tempo até o primeiro item, pico de RSS, tokens de prompt e chamadas ao LLM.
+        Nenhum acesso à rede é feito.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import resource
+import threading
+import concurrent.futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import updated_app
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASETS_FILE = os.path.join(BASE_DIR, 'URLs_Datasets_TCC.txt')
+DEFAULT_CORPUS = os.path.join(BASE_DIR, 'benchmark_corpus')
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_FIELDS = 'Título, Autor, Preço, Descrição'
+STAND_IN_MODEL = 'llama3.1:latest'  # Nome de modelo Ollama usado com o servidor local
+
+def load_dataset_urls(path=DATASETS_FILE):
+    """
+    Lê URLs_Datasets_TCC.txt agrupando as URLs pelo título do dataset ("Dataset - Livros:" etc.).
+
+    Args:
+        path (str): Caminho do arquivo de datasets
+
+    Returns:
+        dict: Nome do dataset -> lista de URLs
+    """
+    datasets = {}
+    current = 'Sem dataset'
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            heading = re.match(r'^\s*Dataset\s*-\s*(.+?):?\s*$', line)
+            if heading:
+                current = heading.group(1)
+                continue
+            for url in updated_app.parse_url_list(line):
+                datasets.setdefault(current, []).append(url)
+    return datasets
+
+def load_corpus(corpus_dir):
+    """
+    Carrega as páginas salvas do corpus, mais a página de exemplo de create_mock_html.
+
+    Args:
+        corpus_dir (str): Diretório do corpus
+
+    Returns:
+        list: Dicionários com 'url', 'dataset' e 'html'
+    """
+    pages = [{'url': 'mock://create_mock_html', 'dataset': 'Exemplo', 'html': updated_app.create_mock_html()}]
+    manifest_path = os.path.join(corpus_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        print(f"Corpus não encontrado em {corpus_dir}. Execute 'python benchmark.py freeze-corpus'. "
+              f"Usando apenas a página de exemplo.")
+        return pages
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    for entry in manifest:
+        with open(os.path.join(corpus_dir, entry['file']), 'r', encoding='utf-8') as f:
+            pages.append({'url': entry['url'], 'dataset': entry['dataset'], 'html': f.read()})
+    return pages
+
+def freeze_corpus(args):
+    """Baixa as páginas dos datasets e grava o HTML e o manifesto no diretório do corpus."""
+    os.makedirs(args.corpus, exist_ok=True)
+    manifest = []
+    for dataset, urls in load_dataset_urls().items():
+        for url in urls:
+            name = hashlib.sha256(updated_app.normalize_url(url).encode('utf-8')).hexdigest()[:16] + '.html'
+            path = os.path.join(args.corpus, name)
+            if not os.path.exists(path):
+                if args.browser:
+                    html_content = updated_app.scrape_webpage_with_selenium(url)
+                else:
+                    html_content, _, _ = updated_app.fetch_webpage(url, cache_policy='use')
+                if not html_content:
+                    print(f"[falha] {url}")
+                    continue
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(html_content)
+                print(f"[ok] {url}")
+            manifest.append({'url': url, 'dataset': dataset, 'file': name})
+
+    with open(os.path.join(args.corpus, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"Corpus com {len(manifest)} páginas salvo em {args.corpus}")
+
+def benchmark_clean_text(args):
+    """Mede os backends de clean_text nas páginas do corpus e verifica se as saídas são idênticas."""
+    pages = load_corpus(args.corpus)
+    total_bytes = sum(len(page['html'].encode('utf-8')) for page in pages)
+    backends = ['bs4'] + (['lxml'] if updated_app.lxml_etree is not None else [])
+    if len(backends) == 1:
+        print("lxml não instalado: apenas o backend bs4 será medido.")
+
+    timings = {}
+    outputs = {}
+    for backend in backends:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            outputs[backend] = [updated_app.clean_text(page['html'], backend=backend) for page in pages]
+        timings[backend] = (time.perf_counter() - start) / args.repeat
+
+    print(f"\n{len(pages)} páginas, {total_bytes / 1024 / 1024:.2f} MB, {args.repeat} repetições\n")
+    print(f"{'backend':<8} {'tempo (s)':>10} {'páginas/s':>10} {'MB/s':>8} {'speedup':>8}")
+    for backend in backends:
+        elapsed = timings[backend]
+        print(f"{backend:<8} {elapsed:>10.3f} {len(pages) / elapsed:>10.1f} "
+              f"{total_bytes / 1024 / 1024 / elapsed:>8.2f} {timings['bs4'] / elapsed:>7.2f}x")
+
+    if 'lxml' in outputs:
+        mismatches = [page['url'] for page, a, b in zip(pages, outputs['bs4'], outputs['lxml']) if a != b]
+        print(f"\nSaídas idênticas: {len(pages) - len(mismatches)}/{len(pages)}")
+        for url in mismatches:
+            print(f"  diferente: {url}")
+        return 1 if mismatches else 0
+    return 0
+
+class StandInLLMHandler(BaseHTTPRequestHandler):
+    """
+    Servidor LLM local para benchmarks: responde às rotas /v1/chat/completions (OpenAI),
+    /api/chat e /api/generate (Ollama) com um array JSON contendo os campos pedidos no prompt
+    (dentro de {"items": [...]} quando a requisição pede saída estruturada), após a latência
+    configurada (latency ± jitter, em segundos). Prompts agrupados ("=== PÁGINA <id> ===")
+    recebem um objeto indexado pelo ID de cada página.
+    
+    Na rota da OpenAI, a resposta informa os tokens do prompt em cache como o cache de prompt real:
+    maior prefixo comum com um prompt recente, a partir de 1024 tokens, em blocos de 128.
+    
+    Requisições com stream=true recebem a resposta em trechos (SSE na OpenAI, uma linha JSON por
+    trecho no Ollama) distribuídos ao longo da latência, como a geração token a token de um modelo real.
+    """
+    latency = 0.0
+    jitter = 0.0
+    items = 1               # Itens por resposta (páginas de listagem)
+    rng = random.Random(0)  # Semente fixa: mesma sequência de latências em cada execução
+    requests = 0            # Chamadas recebidas
+    recent_prompts = []     # Prompts recentes (para o cache de prompt simulado)
+    lock = threading.Lock()
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if 'messages' in body:
+            prompt = ' '.join(message['content'] if isinstance(message['content'], str) else
+                              ' '.join(part.get('text', '') for part in message['content'])
+                              for message in body['messages'])
+        else:
+            prompt = body.get('prompt', '')
+        
+        with self.lock:
+            StandInLLMHandler.requests += 1
+            cached_tokens = self._cached_prefix_tokens(prompt)
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0 and not body.get('stream'):
+            time.sleep(delay)
+        
+        rows = [{field: f"valor de {field}" + (f" {number + 1}" if self.items > 1 else '')
+                 for field in self._requested_fields(prompt)} for number in range(self.items)]
+        page_ids = re.findall(r'=== PÁGINA (\S+) ===', prompt)
+        # Saída estruturada (response_format da OpenAI ou format do Ollama): raiz {"items": [...]}
+        structured = body.get('response_format', {}).get('type') == 'json_schema' or isinstance(body.get('format'), dict)
+        if page_ids:
+            content = json.dumps({page_id: rows for page_id in page_ids}, ensure_ascii=False)
+        else:
+            content = json.dumps({'items': rows} if structured else rows, ensure_ascii=False)
+        if body.get('stream') and self.path.startswith(('/v1/chat/completions', '/api/chat')):
+            self._send_stream(body, prompt, content, cached_tokens, max(delay, 0.0))
+            return
+        if self.path.startswith('/v1/chat/completions'):
+            payload = {
+                'id': 'benchmark', 'object': 'chat.completion', 'created': int(time.time()), 'model': body.get('model'),
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                'usage': {
+                    'prompt_tokens': len(prompt) // updated_app.CHARS_PER_TOKEN,
+                    'completion_tokens': len(content) // updated_app.CHARS_PER_TOKEN,
+                    'total_tokens': (len(prompt) + len(content)) // updated_app.CHARS_PER_TOKEN,
+                    'prompt_tokens_details': {'cached_tokens': cached_tokens}
+                }
+            }
+        elif self.path.startswith('/api/chat'):
+            payload = {'model': body.get('model'), 'message': {'role': 'assistant', 'content': content}, 'done': True}
+        elif self.path.startswith('/api/generate'):
+            payload = {'model': body.get('model'), 'response': content, 'done': True}
+        else:
+            self.send_error(404)
+            return
+        
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_stream(self, body, prompt, content, cached_tokens, delay, pieces=20):
+        """Envia content em trechos, espaçados para que o último chegue após delay segundos."""
+        openai = self.path.startswith('/v1/chat/completions')
+        prompt_tokens = len(prompt) // updated_app.CHARS_PER_TOKEN
+        completion_tokens = len(content) // updated_app.CHARS_PER_TOKEN
+        size = max(1, -(-len(content) // pieces))
+        
+        def event(payload):
+            data = json.dumps(payload, ensure_ascii=False)
+            return (f"data: {data}\n\n" if openai else f"{data}\n").encode('utf-8')
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream' if openai else 'application/x-ndjson')
+        self.end_headers()
+        for start in range(0, len(content), size):
+            time.sleep(delay / pieces)
+            piece = content[start:start + size]
+            if openai:
+                payload = {'id': 'benchmark', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                           'model': body.get('model'),
+                           'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+            else:
+                payload = {'model': body.get('model'), 'message': {'role': 'assistant', 'content': piece}, 'done': False}
+            self.wfile.write(event(payload))
+            self.wfile.flush()
+        if openai:
+            self.wfile.write(event({
+                'id': 'benchmark', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': body.get('model'),
+                'choices': [],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens,
+                          'prompt_tokens_details': {'cached_tokens': cached_tokens}}
+            }))
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            self.wfile.write(event({'model': body.get('model'), 'message': {'role': 'assistant', 'content': ''}, 'done': True,
+                                    'prompt_eval_count': prompt_tokens, 'eval_count': completion_tokens}))
+        self.wfile.flush()
+    
+    @classmethod
+    def _cached_prefix_tokens(cls, prompt, min_tokens=1024, block=128, history=64):
+        """Tokens do maior prefixo comum com os prompts recentes (arredondado como o cache da OpenAI)."""
+        longest = max((len(os.path.commonprefix([prompt, previous])) for previous in cls.recent_prompts), default=0)
+        cls.recent_prompts = (cls.recent_prompts + [prompt])[-history:]
+        tokens = longest // updated_app.CHARS_PER_TOKEN
+        return tokens // block * block if tokens >= min_tokens else 0
+    
+    @staticmethod
+    def _requested_fields(prompt):
+        """Lê a lista de campos do prompt de extração ("Campos solicitados: campo1, campo2")."""
+        matches = re.findall(r'Campos solicitados:\s*(.+)', prompt)
+        if not matches:
+            return ['Resultado']
+        return [field.strip() for field in matches[-1].split(',') if field.strip()]
+
+def start_stand_in_llm(latency, jitter=0.0, items=1):
+    """
+    Inicia o servidor LLM local em uma porta livre.
+    
+    Returns:
+        ThreadingHTTPServer: Servidor em execução (encerrar com shutdown())
+    """
+    handler = type('ConfiguredStandInLLMHandler', (StandInLLMHandler,),
+                   {'latency': latency, 'jitter': jitter, 'items': items})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stand-in-llm', daemon=True).start()
+    return server
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (MB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def benchmark_pipeline(args):
+    """Executa process_url sobre o corpus com o LLM local e reporta as métricas por dataset."""
+    pages = load_corpus(args.corpus)
+    fields = [field.strip() for field in args.fields.split(',') if field.strip()]
+    server = start_stand_in_llm(args.latency / 1000.0, args.jitter / 1000.0, args.items)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    
+    # Busca substituída pelo corpus (sem rede) e estado entre páginas isolado por execução
+    by_url = {page['url']: page['html'] for page in pages}
+    updated_app.fetch_webpage = lambda url, cache_policy='use': (by_url[url], updated_app.clean_text(by_url[url]), 'cache')
+    updated_app.boilerplate_memory = updated_app.BoilerplateMemory()
+    templates_dir = tempfile.mkdtemp(prefix='benchmark-templates-')
+    updated_app.extraction_templates = updated_app.ExtractionTemplateStore(
+        path=os.path.join(templates_dir, 'templates.json'), enabled=args.templates
+    )
+    if args.provider == 'openai':
+        os.environ['OPENAI_BASE_URL'] = f"{base_url}/v1"
+        os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+        model_provider, api_base = 'openai', None
+    else:
+        model_provider, api_base = STAND_IN_MODEL, base_url
+    llm_packer = None
+    if args.pack and args.concurrency >= 2:
+        llm_packer = updated_app.LLMPagePacker(max_pages=min(updated_app.LLM_PACK_MAX_PAGES, args.concurrency))
+    
+    def run_page(page):
+        stats = {}
+        start = time.perf_counter()
+        # Tempo até o primeiro item: o primeiro item parcial (--stream) ou o resultado completo
+        first_row = []
+        on_row = (lambda row: first_row or first_row.append(time.perf_counter() - start)) if args.stream else None
+        if page['url'].startswith('mock://'):
+            updated_app.process_url(None, fields, model_provider, api_base, True, None, 'bypass', stats, llm_packer=llm_packer,
+                                    on_row=on_row)
+        else:
+            updated_app.process_url(page['url'], fields, model_provider, api_base, False, None, 'bypass', stats,
+                                    llm_packer=llm_packer, on_row=on_row)
+        elapsed = time.perf_counter() - start
+        stats['first_row'] = first_row[0] if first_row else elapsed
+        return elapsed, stats
+    
+    datasets = {}
+    for page in pages:
+        datasets.setdefault(page['dataset'], []).append(page)
+    
+    report = {'provider': args.provider, 'latency_ms': args.latency, 'concurrency': args.concurrency,
+              'pack': args.pack, 'stream': args.stream, 'items': args.items, 'fields': fields, 'datasets': {}}
+    print(f"\n{len(pages)} páginas, LLM local ({args.provider}) com {args.latency} ms de latência, "
+          f"{args.concurrency} páginas simultâneas\n")
+    print(f"{'dataset':<20} {'páginas':>7} {'págs/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'1º item':>8} {'tokens':>9} "
+          f"{'em cache':>9} {'chamadas':>8} {'RSS (MB)':>9}")
+    try:
+        for dataset, dataset_pages in datasets.items():
+            start = time.perf_counter()
+            calls_before = StandInLLMHandler.requests
+            with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                results = list(executor.map(run_page, dataset_pages))
+            elapsed = time.perf_counter() - start
+            
+            latencies = sorted(latency for latency, _ in results)
+            first_rows = sorted(stats['first_row'] for _, stats in results)
+            prompt_tokens = sum(stats.get('llm', {}).get('prompt_tokens', 0) for _, stats in results)
+            cached_tokens = sum(stats.get('llm', {}).get('cached_tokens', 0) for _, stats in results)
+            entry = {
+                'pages': len(dataset_pages),
+                'pages_per_second': round(len(dataset_pages) / elapsed, 3),
+                'latency_p50': round(updated_app._percentile(latencies, 50), 4),
+                'latency_p95': round(updated_app._percentile(latencies, 95), 4),
+                'first_row_p50': round(updated_app._percentile(first_rows, 50), 4),
+                'prompt_tokens': prompt_tokens,
+                'cached_tokens': cached_tokens,
+                'llm_calls': StandInLLMHandler.requests - calls_before,
+                'peak_rss_mb': round(peak_rss_mb(), 1)
+            }
+            report['datasets'][dataset] = entry
+            print(f"{dataset[:20]:<20} {entry['pages']:>7} {entry['pages_per_second']:>8.2f} {entry['latency_p50']:>8.3f} "
+                  f"{entry['latency_p95']:>8.3f} {entry['first_row_p50']:>8.3f} {entry['prompt_tokens']:>9} {entry['cached_tokens']:>9} {entry['llm_calls']:>8} {entry['peak_rss_mb']:>9.1f}")
+    finally:
+        server.shutdown()
+    
+    print("\nO pico de RSS é acumulado: cada linha inclui os datasets anteriores.")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Relatório salvo em {args.output}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do extrator de dados web com LLM")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    freeze = subparsers.add_parser('freeze-corpus', help="Salva o HTML das páginas dos datasets")
+    freeze.add_argument('--corpus', default=DEFAULT_CORPUS, help="Diretório do corpus")
+    freeze.add_argument('--browser', action='store_true', help="Sempre usar o Selenium (páginas renderizadas)")
+    freeze.set_defaults(func=freeze_corpus)
+
+    clean = subparsers.add_parser('clean-text', help="Compara os backends de clean_text")
+    clean.add_argument('--corpus', default=DEFAULT_CORPUS, help="Diretório do corpus")
+    clean.add_argument('--repeat', type=int, default=3, help="Repetições de cada medição")
+    clean.set_defaults(func=benchmark_clean_text)
+
+    pipeline = subparsers.add_parser('pipeline', help="Executa process_url completo com um LLM local")
+    pipeline.add_argument('--corpus', default=DEFAULT_CORPUS, help="Diretório do corpus")
+    pipeline.add_argument('--provider', choices=['ollama', 'openai'], default='ollama', help="API imitada pelo LLM local")
+    pipeline.add_argument('--latency', type=float, default=500, help="Latência de cada chamada ao LLM local (ms)")
+    pipeline.add_argument('--jitter', type=float, default=0, help="Variação aleatória da latência (± ms)")
+    pipeline.add_argument('--concurrency', type=int, default=4, help="Páginas processadas simultaneamente")
+    pipeline.add_argument('--fields', default=DEFAULT_FIELDS, help="Campos a extrair, separados por vírgula")
+    pipeline.add_argument('--templates', action='store_true', help="Ativar os templates de extração aprendidos por domínio")
+    pipeline.add_argument('--pack', action='store_true', help="Agrupar páginas curtas em uma chamada ao LLM (LLMPagePacker)")
+    pipeline.add_argument('--items', type=int, default=1, help="Itens em cada resposta do LLM local (páginas de listagem)")
+    pipeline.add_argument('--stream', action='store_true', help="Receber as respostas em streaming e medir o tempo até o primeiro item")
+    pipeline.add_argument('--output', help="Arquivo JSON para salvar o relatório (comparação entre execuções)")
+    pipeline.set_defaults(func=benchmark_pipeline)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -30,7 +30,18 @@ document.addEventListener('DOMContentLoaded', function() {
     // Variáveis globais
     let currentTaskId = null;
     let pollingInterval = null;
+    let statusStream = null;
     let extractedData = null;
+    let partialRows = [];
+    
+    // Mensagens e progresso de cada etapa informada pelo stream de status
+    const stageInfo = {
+        queued: { badge: 'Pendente', className: 'bg-info', progress: '25%', message: 'Aguardando processamento...' },
+        fetching: { badge: 'Processando', className: 'bg-warning', progress: '35%', message: 'Acessando a página...' },
+        cleaning: { badge: 'Processando', className: 'bg-warning', progress: '50%', message: 'Limpando o conteúdo da página...' },
+        llm: { badge: 'Processando', className: 'bg-warning', progress: '65%', message: 'Extraindo campos com o modelo LLM...' },
+        exporting: { badge: 'Processando', className: 'bg-warning', progress: '90%', message: 'Gerando arquivos de resultado...' }
+    };
     
     // Verificar se o modelo selecionado é um modelo de visão
     function isVisionModel() {
@@ -77,8 +88,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
         
         // Se um modelo de visão for selecionado, verificar se uma imagem foi fornecida
-        if (isVisionModel() && !pageImageInput.files.length && !useMockCheckbox.checked) {
-            alert('O modelo de visão requer uma imagem. Por favor, carregue uma imagem ou selecione outro modelo.');
+        // (com uma URL, a captura de tela da página é feita pelo servidor)
+        if (isVisionModel() && !pageImageInput.files.length && !urlInput.value && !useMockCheckbox.checked) {
+            alert('O modelo de visão requer uma imagem ou uma URL. Por favor, carregue uma imagem, informe a URL ou selecione outro modelo.');
             return false;
         }
         
@@ -181,6 +193,7 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             
             currentTaskId = data.task_id;
+            partialRows = [];
             
             // Atualizar status
             statusBadge.textContent = 'Em Processamento';
@@ -188,8 +201,8 @@ document.addEventListener('DOMContentLoaded', function() {
             progressBar.style.width = '25%';
             statusMessage.textContent = 'Processando a página...';
             
-            // Iniciar polling para verificar o status
-            startPolling();
+            // Acompanhar o status pelo stream (ou por polling, se indisponível)
+            startStatusStream();
         })
         .catch(error => {
             console.error('Erro ao iniciar extração:', error);
@@ -205,6 +218,65 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Acompanhar o status da tarefa via Server-Sent Events
+    function startStatusStream() {
+        if (!window.EventSource) {
+            startPolling();
+            return;
+        }
+        
+        stopStatusStream();
+        statusStream = new EventSource(`/api/status/${currentTaskId}/stream`);
+        
+        // Mudança de etapa
+        statusStream.addEventListener('stage', function(event) {
+            const data = JSON.parse(event.data);
+            const info = stageInfo[data.stage];
+            if (!info) {
+                return;
+            }
+            statusBadge.textContent = info.badge;
+            statusBadge.className = `badge ${info.className} status-badge`;
+            progressBar.style.width = info.progress;
+            statusMessage.textContent = data.stage === 'queued' && data.queue_position
+                ? `Aguardando processamento (posição ${data.queue_position} na fila)...`
+                : info.message;
+        });
+        
+        // Itens preliminares: o LLM responde em streaming e cada item completo chega assim que fica pronto
+        statusStream.addEventListener('rows', function(event) {
+            const data = JSON.parse(event.data);
+            partialRows = partialRows.slice(0, data.offset).concat(data.rows);
+            showPartialResults();
+        });
+        
+        // Resultado final (enviado uma única vez)
+        statusStream.addEventListener('done', function(event) {
+            stopStatusStream();
+            handleTaskStatus(JSON.parse(event.data));
+        });
+        
+        // Queda da conexão (ou fim após TASK_STREAM_MAX_DURATION): o navegador reconecta sozinho.
+        // Só quando o stream é fechado de vez (ex.: resposta de erro) voltamos para o polling
+        statusStream.onerror = function() {
+            if (statusStream.readyState !== EventSource.CLOSED) {
+                console.warn('Conexão do stream de status interrompida; reconectando...');
+                return;
+            }
+            console.warn('Stream de status indisponível; usando polling.');
+            stopStatusStream();
+            startPolling();
+        };
+    }
+    
+    // Fechar o stream de status, se aberto
+    function stopStatusStream() {
+        if (statusStream) {
+            statusStream.close();
+            statusStream = null;
+        }
+    }
+    
     // Iniciar polling para verificar o status da tarefa
     function startPolling() {
         // Limpar intervalo anterior se existir
@@ -229,61 +301,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(data.error);
             }
             
-            // Atualizar status com base no status da tarefa
-            switch (data.status) {
-                case 'pending':
-                    statusBadge.textContent = 'Pendente';
-                    statusBadge.className = 'badge bg-info status-badge';
-                    progressBar.style.width = '25%';
-                    statusMessage.textContent = 'Aguardando processamento...';
-                    break;
-                    
-                case 'processing':
-                    statusBadge.textContent = 'Processando';
-                    statusBadge.className = 'badge bg-warning status-badge';
-                    progressBar.style.width = '50%';
-                    statusMessage.textContent = 'Processando a página...';
-                    break;
-                    
-                case 'completed':
-                    // Limpar intervalo de polling
-                    clearInterval(pollingInterval);
-                    pollingInterval = null;
-                    
-                    // Atualizar status
-                    statusBadge.textContent = 'Concluído';
-                    statusBadge.className = 'badge bg-success status-badge';
-                    progressBar.style.width = '100%';
-                    
-                    // Verificar se há resultados
-                    if (data.result_count && data.result_count > 0) {
-                        statusMessage.textContent = `Processamento concluído com sucesso! ${data.result_count} resultados encontrados.`;
-                    } else {
-                        statusMessage.textContent = 'Processamento concluído com sucesso!';
-                    }
-                    
-                    // Armazenar dados extraídos
-                    extractedData = data.extracted_data;
-                    
-                    // Mostrar resultados
-                    showResults();
-                    break;
-                    
-                case 'error':
-                    // Limpar intervalo de polling
-                    clearInterval(pollingInterval);
-                    pollingInterval = null;
-                    
-                    // Atualizar status
-                    statusBadge.textContent = 'Erro';
-                    statusBadge.className = 'badge bg-danger status-badge';
-                    progressBar.style.width = '100%';
-                    statusMessage.textContent = `Erro durante o processamento: ${data.message}`;
-                    
-                    // Resetar estado de processamento
-                    resetProcessingState();
-                    break;
-            }
+            handleTaskStatus(data);
         })
         .catch(error => {
             console.error('Erro ao verificar status:', error);
@@ -303,17 +321,97 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Atualizar a interface com a resposta de /api/status (polling ou evento final do stream)
+    function handleTaskStatus(data) {
+        // Atualizar status com base no status da tarefa
+        switch (data.status) {
+            case 'pending':
+                statusBadge.textContent = 'Pendente';
+                statusBadge.className = 'badge bg-info status-badge';
+                progressBar.style.width = '25%';
+                statusMessage.textContent = data.queue_position
+                    ? `Aguardando processamento (posição ${data.queue_position} na fila)...`
+                    : 'Aguardando processamento...';
+                break;
+                
+            case 'processing':
+                statusBadge.textContent = 'Processando';
+                statusBadge.className = 'badge bg-warning status-badge';
+                progressBar.style.width = stageInfo[data.stage] ? stageInfo[data.stage].progress : '50%';
+                statusMessage.textContent = stageInfo[data.stage] ? stageInfo[data.stage].message : 'Processando a página...';
+                if (data.partial_data && data.partial_data.length > 0) {
+                    partialRows = data.partial_data;
+                    showPartialResults();
+                }
+                break;
+                
+            case 'completed':
+                // Limpar intervalo de polling
+                clearInterval(pollingInterval);
+                pollingInterval = null;
+                
+                // Atualizar status
+                statusBadge.textContent = 'Concluído';
+                statusBadge.className = 'badge bg-success status-badge';
+                progressBar.style.width = '100%';
+                
+                // Verificar se há resultados
+                if (data.result_count && data.result_count > 0) {
+                    statusMessage.textContent = `Processamento concluído com sucesso! ${data.result_count} resultados encontrados.`;
+                } else {
+                    statusMessage.textContent = 'Processamento concluído com sucesso!';
+                }
+                
+                // Armazenar dados extraídos
+                extractedData = data.extracted_data;
+                
+                // Mostrar resultados
+                showResults();
+                break;
+                
+            case 'error':
+                // Limpar intervalo de polling
+                clearInterval(pollingInterval);
+                pollingInterval = null;
+                
+                // Atualizar status
+                statusBadge.textContent = 'Erro';
+                statusBadge.className = 'badge bg-danger status-badge';
+                progressBar.style.width = '100%';
+                statusMessage.textContent = `Erro durante o processamento: ${data.message}`;
+                
+                // Resetar estado de processamento
+                resetProcessingState();
+                break;
+        }
+    }
+    
     // Mostrar resultados
     function showResults() {
         // Resetar estado de processamento
         resetProcessingState();
         
+        renderResults(extractedData, false);
+    }
+    
+    // Mostrar os itens preliminares recebidos durante a extração (substituídos pelo resultado final)
+    function showPartialResults() {
+        statusMessage.textContent = `Extraindo campos com o modelo LLM... ${partialRows.length} itens recebidos até agora.`;
+        renderResults(partialRows, true);
+    }
+    
+    // Montar a tabela de resultados (preliminary: downloads desabilitados até a conclusão)
+    function renderResults(rows, preliminary) {
+        [downloadCSVBtn, downloadJSONBtn, downloadTextBtn].forEach(btn => {
+            btn.disabled = preliminary;
+        });
+        
         // Limpar tabela de resultados
         resultHeaders.innerHTML = '';
         resultBody.innerHTML = '';
         
         // Verificar se há dados extraídos
-        if (!extractedData || extractedData.length === 0) {
+        if (!rows || rows.length === 0) {
             resultContainer.style.display = 'block';
             resultBody.innerHTML = '<tr><td colspan="100%" class="text-center">Nenhum resultado encontrado.</td></tr>';
             return;
@@ -321,7 +419,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Obter todas as chaves únicas de todos os resultados
         const allKeys = new Set();
-        extractedData.forEach(item => {
+        rows.forEach(item => {
             Object.keys(item).forEach(key => allKeys.add(key));
         });
         const keys = Array.from(allKeys);
@@ -353,7 +451,7 @@ document.addEventListener('DOMContentLoaded', function() {
         });
         
         // Adicionar linhas de dados
-        extractedData.forEach(item => {
+        rows.forEach(item => {
             const row = document.createElement('tr');
             
             keys.forEach(key => {
@@ -411,12 +509,14 @@ document.addEventListener('DOMContentLoaded', function() {
         // Resetar variáveis globais
         currentTaskId = null;
         extractedData = null;
+        partialRows = [];
         
-        // Limpar intervalo de polling se existir
+        // Limpar intervalo de polling e stream de status se existirem
         if (pollingInterval) {
             clearInterval(pollingInterval);
             pollingInterval = null;
         }
+        stopStatusStream();
     }
     
     // Testar conexão com LLM
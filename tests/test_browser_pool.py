@@ -0,0 +1,58 @@
+from selenium.common.exceptions import WebDriverException
+
+import updated_app
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+    
+    def new_window(self, kind):
+        self.driver.calls.append(('new_window', kind))
+        self.driver.window_handles.append('nova')
+        self.driver.current_window_handle = 'nova'
+    
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    def __init__(self, cdp_available=True):
+        self.cdp_available = cdp_available
+        self.calls = []
+        self.window_handles = ['antiga']
+        self.current_window_handle = 'antiga'
+        self.switch_to = FakeSwitchTo(self)
+    
+    def execute_cdp_cmd(self, method, params):
+        if not self.cdp_available:
+            raise WebDriverException('CDP indisponível')
+        self.calls.append((method, params))
+    
+    def execute_script(self, script):
+        self.calls.append(('script', script))
+    
+    def delete_all_cookies(self):
+        self.calls.append(('delete_all_cookies',))
+    
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+
+def test_reset_clears_cookies_and_storage_of_all_origins_before_new_tab():
+    driver = FakeDriver()
+    assert updated_app.BrowserPool(size=1)._reset(driver)
+    
+    assert driver.calls == [
+        ('Network.clearBrowserCookies', {}),
+        ('Storage.clearDataForOrigin', {'origin': '*', 'storageTypes': 'all'}),
+        ('new_window', 'tab'),
+    ]
+    assert driver.window_handles == ['nova']
+
+
+def test_reset_falls_back_to_current_origin_without_cdp():
+    driver = FakeDriver(cdp_available=False)
+    assert updated_app.BrowserPool(size=1)._reset(driver)
+    
+    assert [call[0] for call in driver.calls] == ['script', 'delete_all_cookies', 'new_window']
@@ -0,0 +1,31 @@
+import pytest
+
+import updated_app
+
+pytestmark = pytest.mark.skipif(updated_app.lxml_etree is None, reason="lxml não instalado")
+
+FIXTURES = [
+    '<p>texto simples</p>',
+    '<html><head><title>Título <b>x</b></title></head><body><p>corpo</p></body></html>',
+    '<p>t</p><textarea>t <b>x</b></textarea>',
+    '<TEXTAREA class="ads">oculto</TEXTAREA><p>visível</p>',
+    '<p><![CDATA[x]]></p>',
+    '<p>a<![CDATA[x]]>b</p>',
+    '<p><![CDATA[a<b>c]]></p>',
+    '<!-- <![CDATA[x]]> --><p>c</p>',
+    '<p>a\r\nb</p>',
+    '<div\r\nclass="ads">x</div><p>y\rz</p>',
+    '<p>a &amp;lt; b &nbsp; c</p>',
+    '<div class="banner promo">anúncio</div><div class="product">Livro</div>',
+    '<script>var s = "<p>não</p>";</script><style>p {}</style><p>sim</p>',
+    '<noscript><p>sem JavaScript</p></noscript><p>com</p>',
+    '<iframe src="x">quadro</iframe><p>a<br>b</p>',
+    '<ul><li>um</li>\n\n\n<li>dois</li></ul>',
+    '<template><p>modelo</p></template><p>fora</p>',
+    '<p>não fechado<div>bloco',
+]
+
+
+@pytest.mark.parametrize('html_content', FIXTURES + [updated_app.create_mock_html()])
+def test_lxml_backend_matches_bs4(html_content):
+    assert updated_app._clean_text_lxml(html_content) == updated_app._clean_text_bs4(html_content)
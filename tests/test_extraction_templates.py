@@ -0,0 +1,88 @@
+import pytest
+
+import updated_app
+
+
+FIELDS = ['Nome', 'Preço']
+URL = 'https://loja.test/produto/1'
+
+
+def page(name, price):
+    return (f'<html><body><nav>Menu</nav><div class="produto"><h1 class="titulo">{name}</h1>'
+            f'<span class="preco">{price}</span></div></body></html>')
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    monkeypatch.setattr(updated_app, 'EXTRACTION_TEMPLATE_RECHECK_RATE', 0)
+    return updated_app.ExtractionTemplateStore(path=str(tmp_path / 'templates.json'), enabled=True)
+
+
+def confirm(templates, pages):
+    for name, price in pages:
+        html_content = page(name, price)
+        values, status = templates.apply(URL, html_content, FIELDS)
+        assert status == 'shadow'
+        assert values == {'Nome': name, 'Preço': price}
+        templates.learn(URL, html_content, FIELDS, {'Nome': name, 'Preço': price}, values)
+
+
+def test_template_is_learned_and_applied_only_after_confirmations(templates):
+    assert templates.apply(URL, page('Caneca', 'R$ 30'), FIELDS) == ({}, 'none')
+    templates.learn(URL, page('Caneca', 'R$ 30'), FIELDS, {'Nome': 'Caneca', 'Preço': 'R$ 30'})
+    
+    assert updated_app.EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS >= 3
+    confirm(templates, [(f'Produto {i}', f'R$ {i}0') for i in range(updated_app.EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS)])
+    
+    values, status = templates.apply('https://www.loja.test/produto/9', page('Copo', 'R$ 12'), FIELDS)
+    assert status == 'applied'
+    assert values == {'Nome': 'Copo', 'Preço': 'R$ 12'}
+    
+    # Os templates são persistidos e recarregados
+    reloaded = updated_app.ExtractionTemplateStore(path=templates.path, enabled=True)
+    assert reloaded.apply(URL, page('Copo', 'R$ 12'), FIELDS)[1] == 'applied'
+
+
+def test_template_is_not_learned_when_value_is_not_on_the_page(templates):
+    templates.learn(URL, page('Caneca', 'R$ 30'), FIELDS, {'Nome': 'Caneca azul', 'Preço': 'R$ 30'})
+    assert templates.apply(URL, page('Caneca', 'R$ 30'), FIELDS) == ({}, 'none')
+
+
+def test_shadow_disagreement_discards_template_that_cannot_be_relearned(templates):
+    templates.learn(URL, page('Caneca', 'R$ 30'), FIELDS, {'Nome': 'Caneca', 'Preço': 'R$ 30'})
+    confirm(templates, [('Copo', 'R$ 12')])
+    
+    html_content = page('Prato', 'R$ 20')
+    values, status = templates.apply(URL, html_content, FIELDS)
+    templates.learn(URL, html_content, FIELDS, {'Nome': 'Prato', 'Preço': 'R$ 25'}, values)
+    # 'R$ 25' não aparece na página: o template antigo é descartado e nada é reaprendido
+    assert templates.apply(URL, html_content, FIELDS) == ({}, 'none')
+
+
+def test_failed_validation_discards_template_after_max_failures(templates):
+    templates.learn(URL, page('Caneca', 'R$ 30'), FIELDS, {'Nome': 'Caneca', 'Preço': 'R$ 30'})
+    broken = '<html><body><p>Página reformulada</p></body></html>'
+    
+    for _ in range(updated_app.EXTRACTION_TEMPLATE_MAX_FAILURES):
+        assert templates.apply(URL, broken, FIELDS) == ({}, 'failed')
+    assert templates.apply(URL, page('Copo', 'R$ 12'), FIELDS) == ({}, 'none')
+
+
+def test_confirmed_template_is_rechecked_and_relearned_on_drift(templates, monkeypatch):
+    templates.learn(URL, page('Caneca', 'R$ 30'), FIELDS, {'Nome': 'Caneca', 'Preço': 'R$ 30'})
+    confirm(templates, [(f'Produto {i}', f'R$ {i}0') for i in range(updated_app.EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS)])
+    monkeypatch.setattr(updated_app, 'EXTRACTION_TEMPLATE_RECHECK_RATE', 1)
+    
+    # O layout mudou: o preço antigo continua na página, mas o preço real está em outro elemento
+    html_content = ('<html><body><div class="produto"><h1 class="titulo">Copo</h1><span class="preco">R$ 12</span>'
+                    '<strong class="promo">R$ 9</strong></div></body></html>')
+    values, status = templates.apply(URL, html_content, FIELDS)
+    assert status == 'recheck'
+    assert values['Preço'] == 'R$ 12'
+    templates.learn(URL, html_content, FIELDS, {'Nome': 'Copo', 'Preço': 'R$ 9'}, values)
+    
+    # O template foi reaprendido com o novo elemento e volta ao modo sombra
+    monkeypatch.setattr(updated_app, 'EXTRACTION_TEMPLATE_RECHECK_RATE', 0)
+    values, status = templates.apply(URL, html_content, FIELDS)
+    assert status == 'shadow'
+    assert values == {'Nome': 'Copo', 'Preço': 'R$ 9'}
@@ -0,0 +1,51 @@
+import updated_app
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+    
+    def __init__(self, text):
+        self.text = text
+
+
+SPA_HTML = '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+RENDERED_HTML = '<html><body><h1>Produto</h1><p>' + 'Descrição do produto renderizada. ' * 40 + '</p></body></html>'
+
+
+def fetch_with(monkeypatch, memory, overrides=None):
+    monkeypatch.setattr(updated_app, 'fetch_tier_memory', memory)
+    monkeypatch.setattr(updated_app, 'FETCH_TIER_OVERRIDES', overrides or {})
+    monkeypatch.setattr(updated_app, 'fetch_webpage_with_requests', lambda url: FakeResponse(SPA_HTML))
+    browser_calls = []
+    monkeypatch.setattr(updated_app, 'scrape_webpage_with_selenium',
+                        lambda url: browser_calls.append(url) or RENDERED_HTML)
+    html_content, _, tier, _ = updated_app._fetch_webpage_from_network('https://loja.test/p/1')
+    return html_content, tier, browser_calls
+
+
+def test_learned_http_tier_still_detects_spa_pages(monkeypatch):
+    memory = updated_app.FetchTierMemory()
+    memory.remember('loja.test', 'http')
+    html_content, tier, browser_calls = fetch_with(monkeypatch, memory)
+    assert tier == 'browser'
+    assert html_content == RENDERED_HTML
+    assert browser_calls == ['https://loja.test/p/1']
+
+
+def test_http_override_accepts_plain_response(monkeypatch):
+    memory = updated_app.FetchTierMemory()
+    html_content, tier, browser_calls = fetch_with(monkeypatch, memory, {'loja.test': 'http'})
+    assert tier == 'http'
+    assert html_content == SPA_HTML
+    assert browser_calls == []
+
+
+def test_overrides_match_subdomains():
+    memory = updated_app.FetchTierMemory()
+    updated_app.FETCH_TIER_OVERRIDES.setdefault('exemplo.test', 'browser')
+    try:
+        assert memory.get('m.exemplo.test') == ('browser', True)
+        assert memory.get('outroexemplo.test') == (None, False)
+    finally:
+        updated_app.FETCH_TIER_OVERRIDES.pop('exemplo.test')
@@ -0,0 +1,66 @@
+from updated_app import IncrementalJSONArrayParser, make_row_streamer, parse_llm_json
+
+
+def test_parse_llm_json_complete_array():
+    assert parse_llm_json('[{"a": "1"}, {"a": "2"}]') == ([{'a': '1'}, {'a': '2'}], True)
+
+
+def test_parse_llm_json_empty_results_are_complete():
+    assert parse_llm_json('[]') == ([], True)
+    assert parse_llm_json('{"items": []}') == ([], True)
+    assert parse_llm_json('Resultado: []') == ([], True)
+
+
+def test_parse_llm_json_truncated_bare_array():
+    assert parse_llm_json('[{"a":"1"},{"a":"2"},{"a":"3') == ([{'a': '1'}, {'a': '2'}], False)
+
+
+def test_parse_llm_json_array_after_leading_text():
+    assert parse_llm_json('Aqui está: [{"a": "1"}, {"a": "2"}] Obrigado!') == ([{'a': '1'}, {'a': '2'}], True)
+    assert parse_llm_json('Aqui está: [{"a":"1"},{"a":"2"},{"a":"3') == ([{'a': '1'}, {'a': '2'}], False)
+
+
+def test_parse_llm_json_truncated_items_root():
+    assert parse_llm_json('{"items": [{"a":"1"},{"a":"2"},{"a":"3') == ([{'a': '1'}, {'a': '2'}], False)
+
+
+def test_parse_llm_json_markdown_and_single_object():
+    assert parse_llm_json('```json\n{"items": [{"a": "1"}]}\n```') == ([{'a': '1'}], True)
+    assert parse_llm_json('Resposta: {"a": "1", "tags": ["x"]} fim') == ([{'a': '1', 'tags': ['x']}], True)
+
+
+def test_parse_llm_json_truncated_object_salvages_pairs():
+    assert parse_llm_json('{"a": "x", "b": "y') == ([{'a': 'x'}], False)
+
+
+def test_parse_llm_json_unusable():
+    assert parse_llm_json('sem JSON') == (None, False)
+
+
+def test_incremental_parser_emits_items_as_they_complete():
+    parser = IncrementalJSONArrayParser()
+    assert parser.feed('{"items": [{"a": "1"}, {"a"') == [{'a': '1'}]
+    assert parser.feed(': "2"}') == [{'a': '2'}]
+    assert not parser.closed
+    assert parser.feed(']}') == []
+    assert parser.closed
+    assert parser.items == [{'a': '1'}, {'a': '2'}]
+
+
+def test_incremental_parser_ignores_text_before_array():
+    parser = IncrementalJSONArrayParser()
+    assert parser.feed('Aqui: ') == []
+    assert parser.feed('[{"a": "[1]"}, {"a": "2"') == [{'a': '[1]'}]
+    assert parser.items == [{'a': '[1]'}]
+    assert not parser.closed
+
+
+
+def test_row_streamer_fills_fields_and_skips_repeated_rows():
+    rows = []
+    on_delta = make_row_streamer(rows.append, ['a', 'b'])
+    on_delta(None)
+    on_delta('[{"a": "1"}, {"a": ')
+    on_delta(None)  # nova tentativa da chamada
+    on_delta('[{"a": "1"}, {"a": "2", "b": "3"}]')
+    assert rows == [{'a': '1', 'b': 'Não disponível'}, {'a': '2', 'b': '3'}]
@@ -0,0 +1,118 @@
+import json
+import re
+import threading
+
+import updated_app
+
+
+FIELDS = ['Título', 'Preço']
+PAGES = {
+    'Dom Casmurro': 'R$ 69,90',
+    'Memórias Póstumas': 'R$ 54,00',
+    'Quincas Borba': 'R$ 48,50',
+}
+PAGE_PATTERN = re.compile(r'=== PÁGINA (\w+) ===\n(.*?)\n=== FIM DA PÁGINA \1 ===', re.S)
+
+
+def page_text(title):
+    return f"Livro: {title}\nPreço: {PAGES[title]}\nFrete grátis para todo o Brasil."
+
+
+def answer_for(text):
+    title = re.search(r'Livro: (.*)', text).group(1)
+    return {'Título': title, 'Preço': PAGES[title]}
+
+
+def fake_chat(calls, skip=()):
+    """Responde às chamadas agrupadas por ID de página (em ordem inversa) e às individuais com {"items": [...]}."""
+    async def chat(provider, model, messages, temperature, max_tokens, api_base=None, usage=None, **kwargs):
+        prompt = messages[-1]['content']
+        calls.append(prompt)
+        if usage is not None:
+            usage['prompt_tokens'] = usage.get('prompt_tokens', 0) + 10
+        pages = PAGE_PATTERN.findall(prompt)
+        if not pages:
+            return json.dumps({'items': [answer_for(prompt)]}, ensure_ascii=False)
+        response = {page_id: [answer_for(text)] for page_id, text in reversed(pages)
+                    if answer_for(text)['Título'] not in skip}
+        return json.dumps(response, ensure_ascii=False)
+    return chat
+
+
+def test_packed_prompt_delimits_each_page_by_id():
+    texts = [page_text(title) for title in PAGES]
+    fields_to_extract, prompt = updated_app.build_packed_extraction_prompt(FIELDS, ['p1', 'p2', 'p3'], texts)
+    
+    assert fields_to_extract == FIELDS
+    assert 'IDs das páginas: p1, p2, p3' in prompt
+    assert PAGE_PATTERN.findall(prompt) == list(zip(['p1', 'p2', 'p3'], texts))
+
+
+def test_parse_packed_response_by_page_id():
+    content = '```json\n{"p2": {"items": [{"Título": "B"}]}, "p1": [{"Título": "A"}, {"Título": "A2"}], "p9": []}\n```'
+    assert updated_app.parse_packed_llm_json(content, ['p1', 'p2', 'p3']) == {
+        'p1': ([{'Título': 'A'}, {'Título': 'A2'}], True),
+        'p2': ([{'Título': 'B'}], True),
+    }
+
+
+def test_parse_truncated_packed_response_keeps_complete_items():
+    content = '{"p1": [{"Título": "A"}], "p2": [{"Título": "B"}, {"Título": "C'
+    assert updated_app.parse_packed_llm_json(content, ['p1', 'p2']) == {
+        'p1': ([{'Título': 'A'}], True),
+        'p2': ([{'Título': 'B'}], False),
+    }
+
+
+def test_packed_extraction_attributes_items_to_each_page(monkeypatch):
+    calls = []
+    monkeypatch.setattr(updated_app.llm_clients, 'chat', fake_chat(calls))
+    titles = list(PAGES)
+    usages = [{} for _ in titles]
+    
+    results = updated_app.llm_clients.run(updated_app.extract_packed_pages_async(
+        [page_text(title) for title in titles], FIELDS, 'openai', cache_policy='bypass', usages=usages
+    ))
+    
+    assert len(calls) == 1
+    assert results == [[{'Título': title, 'Preço': PAGES[title]}] for title in titles]
+    assert [usage['packed_pages'] for usage in usages] == [3, 3, 3]
+    assert sum(usage.get('prompt_tokens', 0) for usage in usages) == 10
+
+
+def test_pages_missing_from_packed_response_are_extracted_individually(monkeypatch):
+    calls = []
+    monkeypatch.setattr(updated_app.llm_clients, 'chat', fake_chat(calls, skip={'Memórias Póstumas'}))
+    titles = list(PAGES)
+    
+    results = updated_app.llm_clients.run(updated_app.extract_packed_pages_async(
+        [page_text(title) for title in titles], FIELDS, 'openai', cache_policy='bypass'
+    ))
+    
+    assert len(calls) == 2
+    assert 'Memórias Póstumas' in calls[1] and not PAGE_PATTERN.search(calls[1])
+    assert results == [[{'Título': title, 'Preço': PAGES[title]}] for title in titles]
+
+
+def test_packer_groups_concurrent_pages_into_one_call(monkeypatch):
+    calls = []
+    monkeypatch.setattr(updated_app.llm_clients, 'chat', fake_chat(calls))
+    packer = updated_app.LLMPagePacker(max_pages=len(PAGES), max_wait=5)
+    results = {}
+    
+    def worker(title):
+        results[title] = packer.extract(page_text(title), FIELDS, 'openai', cache_policy='bypass')
+    
+    threads = [threading.Thread(target=worker, args=(title,)) for title in PAGES]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    
+    assert len(calls) == 1
+    assert results == {title: [{'Título': title, 'Preço': price}] for title, price in PAGES.items()}
+
+
+def test_packer_skips_pages_above_token_limit():
+    packer = updated_app.LLMPagePacker(max_page_tokens=5)
+    assert packer.extract(page_text('Dom Casmurro'), FIELDS, 'openai') is None
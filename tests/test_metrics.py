@@ -0,0 +1,84 @@
+import updated_app
+
+
+def metric_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_counters_are_rendered_per_label_set_with_help_and_type():
+    metrics = updated_app.PipelineMetrics(buckets=(0.1, 1))
+    metrics.inc('scraper_fetch_total', tier='http')
+    metrics.inc('scraper_fetch_total', tier='http')
+    metrics.inc('scraper_fetch_total', 3, tier='browser')
+    
+    text = metrics.render()
+    assert '# TYPE scraper_fetch_total counter' in text
+    assert '# HELP scraper_fetch_total Páginas obtidas por nível (cache, http, browser)' in text
+    assert metric_lines(text, 'scraper_fetch_total{') == [
+        'scraper_fetch_total{tier="browser"} 3',
+        'scraper_fetch_total{tier="http"} 2',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = updated_app.PipelineMetrics(buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        metrics.observe('scraper_stage_duration_seconds', value, stage='llm')
+    
+    lines = metric_lines(metrics.render(), 'scraper_stage_duration_seconds_')
+    assert lines == [
+        'scraper_stage_duration_seconds_bucket{stage="llm",le="0.1"} 1',
+        'scraper_stage_duration_seconds_bucket{stage="llm",le="1"} 3',
+        'scraper_stage_duration_seconds_bucket{stage="llm",le="+Inf"} 4',
+        'scraper_stage_duration_seconds_sum{stage="llm"} 6.050000',
+        'scraper_stage_duration_seconds_count{stage="llm"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    metrics = updated_app.PipelineMetrics()
+    metrics.inc('scraper_llm_requests_total', model='a"b\\c\nd')
+    assert 'scraper_llm_requests_total{model="a\\"b\\\\c\\nd"} 1' in metrics.render()
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = updated_app.PipelineMetrics(enabled=False)
+    metrics.inc('scraper_fetch_total', tier='http')
+    metrics.observe('scraper_stage_duration_seconds', 1, stage='llm')
+    assert metrics.render() == '\n'
+
+
+def test_stage_timer_records_histogram_and_task_timings(monkeypatch):
+    metrics = updated_app.PipelineMetrics(buckets=(60,))
+    monkeypatch.setattr(updated_app, 'pipeline_metrics', metrics)
+    stats = {}
+    
+    with updated_app.stage_timer('clean', stats):
+        pass
+    with updated_app.stage_timer('clean', stats):
+        pass
+    
+    assert 'clean' in stats['timings']
+    assert 'scraper_stage_duration_seconds_count{stage="clean"} 2' in metrics.render()
+
+
+def test_metrics_endpoint_exports_task_gauges(tmp_path, monkeypatch):
+    metrics = updated_app.PipelineMetrics()
+    store = updated_app.TaskStore(db_path=str(tmp_path / 'tasks.sqlite3'))
+    store._cleanup_thread = object()
+    store.create({'id': 'a', 'status': 'completed', 'created_at': 0})
+    store.create({'id': 'b', 'status': 'pending', 'created_at': 0})
+    monkeypatch.setattr(updated_app, 'pipeline_metrics', metrics)
+    monkeypatch.setattr(updated_app, 'task_store', store)
+    monkeypatch.setattr(updated_app, 'task_scheduler', updated_app.TaskScheduler(workers=1, queue_size=1))
+    
+    response = updated_app.app.test_client().get('/metrics')
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert '# TYPE scraper_tasks_stored gauge' in text
+    assert 'scraper_tasks_stored{status="completed"} 1' in text
+    assert 'scraper_tasks_stored{status="pending"} 1' in text
+    assert 'scraper_tasks_stored{status="error"} 0' in text
+    assert 'scraper_task_queue_length 0' in text
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import updated_app
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = updated_app.PageCache(folder=str(tmp_path / 'pages'), ttl=60, max_bytes=10 ** 6)
+    monkeypatch.setattr(updated_app, 'page_cache', cache)
+    return cache
+
+
+def expire(cache, url):
+    entry = cache.get(url)
+    entry['fetched_at'] = time.time() - cache.ttl - 1
+    cache._write(cache._key(url), entry)
+    return entry
+
+
+def test_normalized_urls_share_the_same_entry(cache):
+    cache.put('HTTPS://Loja.Test:443/p?b=2&a=1&utm_source=x#topo', '<html></html>', 'texto', 'http')
+    
+    entry = cache.get('https://loja.test/p?a=1&b=2')
+    assert entry is not None and entry['text'] == 'texto'
+    assert cache.get('https://loja.test/p?a=1&b=3') is None
+    assert cache.get('https://loja.test:8443/p?a=1&b=2') is None
+    assert updated_app.normalize_url('https://loja.test') == 'https://loja.test/'
+
+
+def test_entries_expire_after_ttl(cache):
+    cache.put('https://loja.test/p', '<html></html>', 'texto', 'http')
+    assert cache.is_fresh(cache.get('https://loja.test/p'))
+    assert not cache.is_fresh(expire(cache, 'https://loja.test/p'))
+
+
+def test_expired_entry_is_revalidated_with_conditional_request(cache, monkeypatch):
+    url = 'https://loja.test/p'
+    cache.put(url, '<html><p>antigo</p></html>', 'antigo', 'http', {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+    expire(cache, url)
+    requests_sent = []
+    
+    def fake_fetch(url, headers=None):
+        requests_sent.append(headers)
+        return FakeResponse(304)
+    
+    monkeypatch.setattr(updated_app, 'fetch_webpage_with_requests', fake_fetch)
+    monkeypatch.setattr(updated_app, 'HTTP_FETCH_ENABLED', True)
+    
+    html_content, text, tier = updated_app.fetch_webpage(url)
+    assert (html_content, text, tier) == ('<html><p>antigo</p></html>', 'antigo', 'cache')
+    assert requests_sent == [{'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}]
+    # O 304 renova a entrada
+    assert cache.is_fresh(cache.get(url))
+
+
+def test_changed_page_is_fetched_again_and_replaces_entry(cache, monkeypatch):
+    url = 'https://loja.test/p'
+    cache.put(url, '<html><p>antigo</p></html>', 'antigo', 'http', {'ETag': '"v1"'})
+    expire(cache, url)
+    monkeypatch.setattr(updated_app, 'HTTP_FETCH_ENABLED', True)
+    monkeypatch.setattr(updated_app, 'fetch_webpage_with_requests', lambda url, headers=None: FakeResponse(200))
+    monkeypatch.setattr(updated_app, '_fetch_webpage_from_network',
+                        lambda url: ('<html><p>novo</p></html>', 'novo', 'http', {'ETag': '"v2"'}))
+    
+    assert updated_app.fetch_webpage(url) == ('<html><p>novo</p></html>', 'novo', 'http')
+    entry = cache.get(url)
+    assert entry['text'] == 'novo' and entry['etag'] == '"v2"' and cache.is_fresh(entry)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = updated_app.PageCache(folder=str(tmp_path / 'pages'), ttl=60, max_bytes=10 ** 6)
+    for name in ('a', 'b', 'c'):
+        cache.put(f'https://loja.test/{name}', 'x' * 1000, 'x', 'http')
+    entry_size = max(cache._index.values())
+    cache.max_bytes = 3 * entry_size + entry_size // 2
+    
+    cache.get('https://loja.test/a')  # 'a' passa a ser a mais recente
+    cache.put('https://loja.test/d', 'x' * 1000, 'x', 'http')
+    
+    assert cache.get('https://loja.test/b') is None
+    for name in ('a', 'c', 'd'):
+        assert cache.get(f'https://loja.test/{name}') is not None
+    assert cache._total_bytes <= cache.max_bytes
+    
+    # O índice é reconstruído a partir do disco e respeita o limite
+    reloaded = updated_app.PageCache(folder=cache.folder, ttl=60, max_bytes=2 * entry_size + entry_size // 2)
+    assert len(reloaded._index) == 2
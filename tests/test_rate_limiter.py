@@ -0,0 +1,108 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import updated_app
+
+
+def make_limiter(**kwargs):
+    options = {'concurrency': 8, 'min_concurrency': 1, 'max_concurrency': 16}
+    options.update(kwargs)
+    return updated_app.AdaptiveRateLimiter(**options)
+
+
+async def call(limiter, tokens=100, used_tokens=None, **release_kwargs):
+    entry = await limiter.acquire(tokens)
+    await limiter.release(entry, tokens=used_tokens, **release_kwargs)
+
+
+def test_throttling_halves_limit_down_to_minimum():
+    limiter = make_limiter()
+    
+    async def scenario():
+        for _ in range(5):
+            await call(limiter, throttled=True)
+    
+    asyncio.run(scenario())
+    assert limiter.limit == 1
+    assert limiter.throttled == 5
+
+
+def test_successes_recover_limit_additively_up_to_maximum():
+    limiter = make_limiter(concurrency=2, max_concurrency=4)
+    
+    async def scenario(count):
+        for _ in range(count):
+            await call(limiter)
+    
+    # +1/limite por sucesso: cerca de +1 a cada janela de 'limite' sucessos
+    asyncio.run(scenario(2))
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    asyncio.run(scenario(100))
+    assert limiter.limit == 4
+
+
+def test_calls_above_concurrency_limit_wait_for_release():
+    limiter = make_limiter(concurrency=2)
+    order = []
+    
+    async def worker(name, hold):
+        entry = await limiter.acquire(10)
+        order.append(('start', name))
+        await asyncio.sleep(hold)
+        order.append(('end', name))
+        await limiter.release(entry)
+    
+    async def scenario():
+        await asyncio.gather(worker('a', 0.05), worker('b', 0.05), worker('c', 0))
+    
+    started = time.monotonic()
+    asyncio.run(scenario())
+    assert order.index(('start', 'c')) > order.index(('end', 'a'))
+    # A vaga é liberada por notify_all, sem esperar o intervalo de 1 s de _wait_time
+    assert time.monotonic() - started < 0.5
+
+
+def test_retry_after_pauses_new_calls():
+    limiter = make_limiter()
+    
+    async def scenario():
+        await call(limiter, throttled=True, retry_after=0.2)
+        started = time.monotonic()
+        await call(limiter)
+        return time.monotonic() - started
+    
+    assert asyncio.run(scenario()) >= 0.15
+
+
+def test_requests_and_tokens_per_minute_are_enforced():
+    limiter = make_limiter(rpm=2)
+    asyncio.run(call(limiter))
+    asyncio.run(call(limiter))
+    assert limiter._wait_time(100) > 55
+    
+    limiter = make_limiter(tpm=1000)
+    asyncio.run(call(limiter, tokens=900))
+    assert limiter._wait_time(50) == 0
+    assert limiter._wait_time(200) > 55
+
+
+def test_actual_token_usage_replaces_estimate():
+    limiter = make_limiter(tpm=1000)
+    # A estimativa (prompt + resposta máxima) é trocada pelos tokens que a resposta informou
+    asyncio.run(call(limiter, tokens=900, used_tokens=300))
+    assert limiter._wait_time(600) == 0
+
+
+def test_retry_info_classifies_provider_errors():
+    def http_error(status, headers=None):
+        return SimpleNamespace(status_code=status, response=SimpleNamespace(status_code=status, headers=headers or {}))
+    
+    assert updated_app._llm_retry_info(http_error(429, {'retry-after': '3'})) == (True, 3.0)
+    assert updated_app._llm_retry_info(http_error(503, {'retry-after-ms': '250'})) == (True, 0.25)
+    assert updated_app._llm_retry_info(http_error(429, {'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'})) == (True, None)
+    assert updated_app._llm_retry_info(http_error(400)) == (False, None)
+    assert updated_app._llm_retry_info(asyncio.TimeoutError()) == (True, None)
+    assert updated_app._llm_retry_info(ValueError('resposta inválida')) == (False, None)
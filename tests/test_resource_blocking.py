@@ -0,0 +1,102 @@
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import trio
+from selenium.webdriver.common.devtools.latest import fetch, network
+
+import updated_app
+
+
+DEVTOOLS = SimpleNamespace(fetch=fetch, network=network)
+
+
+class FakeSession:
+    def __init__(self, paused_ids):
+        self.paused_ids = paused_ids
+        self.commands = []
+        self._send = None
+    
+    def listen(self, event_type, buffer_size=10):
+        self._send, receiver = trio.open_memory_channel(buffer_size)
+        return receiver
+    
+    async def execute(self, cmd):
+        request = next(cmd)
+        self.commands.append(request)
+        if request['method'] == 'Fetch.enable':
+            # O navegador só pausa requisições depois que a interceptação está ativa
+            for request_id in self.paused_ids:
+                self._send.send_nowait(SimpleNamespace(request_id=fetch.RequestId(request_id)))
+
+
+class FakeDriver:
+    def __init__(self, paused_ids=(), fail=False):
+        self.session = FakeSession(list(paused_ids))
+        self.fail = fail
+        self.connections = 0
+        self.closed = 0
+    
+    @asynccontextmanager
+    async def bidi_connection(self):
+        self.connections += 1
+        if self.fail:
+            raise RuntimeError('sem CDP')
+        try:
+            yield SimpleNamespace(session=self.session, devtools=DEVTOOLS)
+        finally:
+            self.closed += 1
+    
+    def methods(self, name):
+        return [command for command in self.session.commands if command['method'] == name]
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_blocker_intercepts_only_images_fonts_and_media():
+    driver = FakeDriver(paused_ids=['img-1', 'font-1'])
+    with updated_app.ResourceTypeBlocker(driver) as blocker:
+        assert blocker.active
+        assert wait_until(lambda: len(driver.methods('Fetch.failRequest')) == 2)
+    
+    patterns = driver.methods('Fetch.enable')[0]['params']['patterns']
+    assert [pattern['resourceType'] for pattern in patterns] == ['Image', 'Font', 'Media']
+    failed = driver.methods('Fetch.failRequest')
+    assert [command['params']['requestId'] for command in failed] == ['img-1', 'font-1']
+    assert {command['params']['errorReason'] for command in failed} == {'BlockedByClient'}
+    assert blocker.blocked == 2
+    # A sessão CDP é fechada ao sair, o que encerra a interceptação antes de o navegador voltar ao pool
+    assert driver.closed == 1
+    assert not blocker._thread.is_alive()
+
+
+def test_blocker_failure_does_not_block_page_load():
+    driver = FakeDriver(fail=True)
+    with updated_app.ResourceTypeBlocker(driver) as blocker:
+        assert not blocker.active
+    assert driver.connections == 1
+    assert not blocker._thread.is_alive()
+
+
+def test_load_page_skips_interception_when_blocking_is_disabled(monkeypatch):
+    monkeypatch.setattr(updated_app, 'apply_resource_blocking', lambda driver, url, enabled: None)
+    monkeypatch.setattr(updated_app, 'wait_for_page_ready', lambda driver, url, max_wait=None: 0)
+    driver = FakeDriver()
+    driver.get = lambda url: None
+    driver.page_source = '<html></html>'
+    
+    assert updated_app._load_page(driver, 'https://loja.test/', None, False) == '<html></html>'
+    assert driver.connections == 0
+    assert updated_app._load_page(driver, 'https://loja.test/', None, True) == '<html></html>'
+    assert driver.connections == 1 and driver.closed == 1
+
+
+def test_url_patterns_only_cover_tracker_hosts():
+    patterns = updated_app.get_blocked_url_patterns('https://loja.test/produto.png')
+    assert '*google-analytics.com*' in patterns
+    assert not any(pattern.startswith('*.') for pattern in patterns)
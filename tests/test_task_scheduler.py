@@ -0,0 +1,61 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import updated_app
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def full_scheduler(release):
+    """Agendador com um worker ocupado e a fila (tamanho 1) cheia."""
+    scheduler = updated_app.TaskScheduler(workers=1, queue_size=1)
+    started = threading.Event()
+    scheduler.submit('rodando', lambda: (started.set(), release.wait()))
+    assert started.wait(2)
+    assert scheduler.submit('aguardando', release.wait) == 1
+    return scheduler
+
+
+def test_submit_raises_queue_full_when_queue_is_at_capacity(release):
+    scheduler = full_scheduler(release)
+    
+    with pytest.raises(queue.Full):
+        scheduler.submit('rejeitada', release.wait)
+    assert scheduler.queued() == 1
+    assert scheduler.position('aguardando') == 1
+    assert scheduler.position('rodando') is None
+    assert scheduler.position('rejeitada') is None
+    
+    release.set()
+    assert wait_until(lambda: scheduler.queued() == 0)
+
+
+def test_scrape_returns_429_and_discards_task_when_queue_is_full(release, tmp_path, monkeypatch):
+    store = updated_app.TaskStore(db_path=str(tmp_path / 'tasks.sqlite3'))
+    store._cleanup_thread = object()
+    monkeypatch.setattr(updated_app, 'task_store', store)
+    monkeypatch.setattr(updated_app, 'task_scheduler', full_scheduler(release))
+    
+    client = updated_app.app.test_client()
+    response = client.post('/api/scrape', data={'url': 'https://loja.test/p', 'fields': 'Nome'})
+    
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '10'
+    body = response.get_json()
+    assert body['queue_size'] == 1 and body['queued'] == 1
+    assert store._db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 0
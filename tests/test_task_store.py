@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+import updated_app
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = updated_app.TaskStore(db_path=str(tmp_path / 'tasks.sqlite3'), ttl=100, stale_timeout=50)
+    store._cleanup_thread = object()  # limpeza só quando o teste chamar cleanup()
+    return store
+
+
+def add_task(store, task_id, status, age, idle=None, **data):
+    now = time.time()
+    store.create({'id': task_id, 'status': status, 'created_at': now - age, **data})
+    store._db.execute("UPDATE tasks SET updated_at = ? WHERE id = ?", (now - (age if idle is None else idle), task_id))
+
+
+def test_cleanup_removes_only_finished_expired_tasks_and_their_files(store, tmp_path):
+    files = {name: tmp_path / name for name in ('done.csv', 'error.json', 'running.csv', 'pending.png')}
+    for path in files.values():
+        path.write_text('x')
+    add_task(store, 'done', 'completed', age=200, csv_file=str(files['done.csv']))
+    add_task(store, 'failed', 'error', age=200, json_file=str(files['error.json']))
+    add_task(store, 'running', 'processing', age=200, idle=1, csv_file=str(files['running.csv']))
+    add_task(store, 'queued', 'pending', age=200, image_path=str(files['pending.png']))
+    add_task(store, 'recent', 'completed', age=10)
+    
+    assert store.cleanup() == 2
+    
+    assert store.get('done') is None and store.get('failed') is None
+    assert not files['done.csv'].exists() and not files['error.json'].exists()
+    assert store.get('running')['status'] == 'processing' and files['running.csv'].exists()
+    assert store.get('queued')['status'] == 'pending' and files['pending.png'].exists()
+    assert store.get('recent') is not None
+
+
+def test_stale_sweep_fails_only_idle_processing_tasks(store):
+    add_task(store, 'stuck', 'processing', age=80, idle=80)
+    add_task(store, 'active', 'processing', age=80, idle=1)
+    add_task(store, 'waiting', 'pending', age=80, idle=80)
+    
+    store.cleanup()
+    
+    assert store.get('stuck')['status'] == 'error'
+    assert store.get('active')['status'] == 'processing'
+    assert store.get('waiting')['status'] == 'pending'
+
+
+def test_partial_rows_writer_flushes_pending_rows_on_close(store, monkeypatch):
+    monkeypatch.setattr(updated_app, 'task_store', store)
+    add_task(store, 'stream', 'processing', age=1)
+    writer = updated_app.PartialRowsWriter('stream', interval=60)
+    
+    writer.add({'nome': 'A'})
+    deadline = time.monotonic() + 2
+    while store.get('stream').get('partial_data') is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.get('stream')['partial_data'] == [{'nome': 'A'}]
+    
+    # Os itens seguintes aguardam o intervalo; close() não pode descartá-los
+    writer.add({'nome': 'B'})
+    writer.add({'nome': 'C'})
+    writer.close()
+    assert store.get('stream')['partial_data'] == [{'nome': 'A'}, {'nome': 'B'}, {'nome': 'C'}]
+    
+    writer.add({'nome': 'D'})
+    assert writer._timer is None
@@ -0,0 +1,71 @@
+import updated_app
+from updated_app import count_tokens, split_text_into_chunks
+
+
+def test_short_text_is_not_split():
+    assert split_text_into_chunks('um parágrafo curto', 100) == ['um parágrafo curto']
+
+
+def test_chunks_respect_budget_and_paragraphs():
+    paragraphs = [f"Parágrafo {number}. " + 'texto ' * 40 for number in range(30)]
+    chunks = split_text_into_chunks('\n\n'.join(paragraphs), 200)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+    assert '\n\n'.join(chunks) == '\n\n'.join(paragraphs)
+
+
+def test_each_piece_is_counted_once(monkeypatch):
+    text = '\n\n'.join('palavra ' * 50 for _ in range(2000))
+    counted = []
+    original = updated_app.count_tokens
+    
+    def counting(value, model_name="gpt-4o-mini"):
+        counted.append(len(value or ''))
+        return original(value, model_name)
+    
+    monkeypatch.setattr(updated_app, 'count_tokens', counting)
+    split_text_into_chunks(text, 1000)
+    assert sum(counted) <= 3 * len(text)
+
+
+PRODUCT_TEXT = 'Livro Dom Casmurro\nPreço: R$ 69,90\n' + 'Descrição do livro. ' * 1500
+RELATED_TEXT = '\n\n'.join(f"Produto relacionado {number}\nPreço: R$ {number},00" for number in range(1, 40))
+
+
+def fake_chat(calls):
+    async def chat(provider, model, messages, temperature, max_tokens, api_base=None, **kwargs):
+        text = messages[-1]['content']
+        calls.append(text)
+        if 'Dom Casmurro' in text:
+            return '{"items": [{"Título": "Dom Casmurro", "Preço": "R$ 69,90"}]}'
+        return '{"items": [' + ', '.join(
+            f'{{"Título": "Produto relacionado {number}", "Preço": "R$ {number},00"}}' for number in range(1, 8)
+        ) + ']}'
+    return chat
+
+
+def test_default_budget_keeps_product_page_in_one_call(monkeypatch):
+    calls = []
+    monkeypatch.setattr(updated_app.llm_clients, 'chat', fake_chat(calls))
+    rows = updated_app.llm_clients.run(updated_app.extract_fields_with_llm_async(
+        PRODUCT_TEXT + '\n\n' + RELATED_TEXT, ['Título', 'Preço'], 'openai', cache_policy='bypass'
+    ))
+    assert len(calls) == 1
+    assert rows == [{'Título': 'Dom Casmurro', 'Preço': 'R$ 69,90'}]
+
+
+def test_chunked_listing_is_capped_to_prompt_limit(monkeypatch):
+    calls = []
+    monkeypatch.setattr(updated_app.llm_clients, 'chat', fake_chat(calls))
+    rows = updated_app.llm_clients.run(updated_app.extract_fields_with_llm_async(
+        RELATED_TEXT + '\n\n' + RELATED_TEXT.replace('relacionado', 'similar'), ['Título', 'Preço'], 'openai',
+        cache_policy='bypass', token_budget=800
+    ))
+    assert len(calls) > 1
+    assert len(rows) == updated_app.EXTRACTION_MAX_ITEMS
+
+
+def test_merge_caps_listing_rows():
+    partial = [[{'Título': f"item {part}-{number}"} for number in range(5)] for part in range(3)]
+    merged = updated_app.merge_extraction_results(partial, ['Título'])
+    assert [row['Título'] for row in merged] == [f"item 0-{number}" for number in range(5)]
@@ -1,18 +1,71 @@
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, request, jsonify, render_template, send_file, Response, stream_with_context
 import os
 import re
 import json
+import math
 import time
 import uuid
+import random
 import threading
 import logging
 import base64
+import html
+import io
+import unicodedata
+import queue
+import atexit
+import concurrent.futures
+import asyncio
+import functools
+import hashlib
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from collections import deque, OrderedDict, Counter
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
 from werkzeug.utils import secure_filename
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+# Clientes HTTP assíncronos para os provedores de LLM (httpx é dependência do pacote openai)
+try:
+    import httpx
+except ImportError:
+    httpx = None
+try:
+    from openai import AsyncOpenAI, APIConnectionError as OpenAIConnectionError
+except ImportError:
+    AsyncOpenAI = None
+    OpenAIConnectionError = None
+
+# Parser HTML rápido para a limpeza de texto (opcional; sem lxml usa-se BeautifulSoup/html.parser)
+try:
+    from lxml import etree as lxml_etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_etree = None
+    lxml_html = None
+
+# Contagem exata de tokens (opcional; sem tiktoken usa-se uma estimativa por caracteres)
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Pré-processamento das imagens enviadas aos modelos de visão (opcional; sem Pillow a imagem é enviada como está)
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Interceptação de requisições por tipo de recurso via CDP (trio vem com o Selenium)
+try:
+    import trio
+except ImportError:
+    trio = None
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -24,93 +77,1096 @@ app = Flask(__name__)
 # Configurações
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+# Pré-processamento de imagens para os modelos de visão
+IMAGE_PREPROCESS_ENABLED = os.environ.get('IMAGE_PREPROCESS_ENABLED', 'true').lower() == 'true'
+IMAGE_MAX_WIDTH = int(os.environ.get('IMAGE_MAX_WIDTH', 1280))    # Imagens mais largas são reduzidas (px)
+IMAGE_TILE_HEIGHT = int(os.environ.get('IMAGE_TILE_HEIGHT', 1280))  # Altura de cada parte de uma captura alta (px)
+IMAGE_TILE_OVERLAP = 160             # Sobreposição entre partes consecutivas, para não cortar itens ao meio (px)
+IMAGE_MAX_TILES = int(os.environ.get('IMAGE_MAX_TILES', 8))        # Acima disso as partes ficam mais altas
+IMAGE_JPEG_QUALITY = 85
+IMAGE_KEEP_ORIGINAL_MAX_BYTES = 1024 * 1024  # PNG/JPEG sem redução e menor que isso é enviado sem recodificar
+
+# Captura de tela da página inteira para os modelos de visão (URL + modelo de visão em /api/scrape)
+SCREENSHOT_CAPTURE_ENABLED = os.environ.get('SCREENSHOT_CAPTURE_ENABLED', 'true').lower() == 'true'
+SCREENSHOT_MAX_HEIGHT = int(os.environ.get('SCREENSHOT_MAX_HEIGHT', 20000))  # Páginas mais altas são cortadas (px)
+
 # Criar diretórios se não existirem
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
 
 # Configurar limite de upload
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Dicionário para armazenar tarefas
-tasks = {}
+# Configurações do pool de navegadores (Selenium)
+BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', 2))        # Navegadores simultâneos
+BROWSER_MAX_PAGES = int(os.environ.get('BROWSER_MAX_PAGES', 50))       # Páginas antes de reciclar o navegador
+BROWSER_ACQUIRE_TIMEOUT = 120                                           # Espera máxima por um navegador livre (s)
+BROWSER_POOL_PREWARM = os.environ.get('BROWSER_POOL_PREWARM', 'false').lower() == 'true'
+
+# User-agent usado pelo navegador e pelo cliente HTTP
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.7049.84 Safari/537.36"
+
+# Bloqueio de recursos no navegador (imagens, fontes, mídia e rastreadores são descartados por clean_text)
+RESOURCE_BLOCKING_ENABLED = os.environ.get('RESOURCE_BLOCKING_ENABLED', 'true').lower() == 'true'
+# Tipos de recurso interceptados via Fetch.enable; o tipo vem do navegador, então o documento principal
+# nunca é bloqueado, mesmo que a URL contenha ".png" ou ".svg"
+BLOCKED_RESOURCE_TYPES = ['Image', 'Font', 'Media']
+# Padrões de URL (Network.setBlockedURLs) apenas para hosts de rastreamento
+BLOCKED_RESOURCE_PATTERNS = [
+    # Analytics e anúncios
+    '*google-analytics.com*', '*googletagmanager.com*', '*googlesyndication.com*', '*doubleclick.net*',
+    '*connect.facebook.net*', '*hotjar.com*', '*clarity.ms*', '*criteo.com*', '*criteo.net*',
+    '*scorecardresearch.com*', '*tiktok.com/i18n/pixel*'
+]
+# Regras por domínio: 'allow' remove padrões da lista padrão, 'deny' adiciona novos padrões
+RESOURCE_BLOCKING_RULES = {
+    'youtube.com': {'deny': ['*googlevideo.com/videoplayback*', '*youtube.com/api/stats*']},
+    'amazon.com.br': {'deny': ['*amazon-adsystem.com*']}
+}
+
+# Backend de limpeza de texto: 'auto' (lxml se instalado), 'lxml' ou 'bs4'
+CLEAN_TEXT_BACKEND = os.environ.get('CLEAN_TEXT_BACKEND', 'auto').lower()
+
+# Detecção do conteúdo principal (remove menus, cabeçalhos, rodapés e blocos repetidos antes do LLM)
+MAIN_CONTENT_ENABLED = os.environ.get('MAIN_CONTENT_ENABLED', 'true').lower() == 'true'
+MAIN_CONTENT_MIN_CHARS = 200          # Abaixo disso o resultado é descartado e o texto completo é usado
+MAIN_CONTENT_MIN_RATIO = 0.1          # Fração mínima do texto completo que deve ser mantida
+MAIN_CONTENT_LINK_DENSITY = 0.5       # Blocos com mais texto em links que isso são considerados navegação
+MAIN_CONTENT_MAX_LINK_CHARS = 30      # ... desde que os links sejam curtos (menus), não títulos de produtos
+MAIN_CONTENT_REPEAT_MIN_PAGES = 3     # Páginas do domínio vistas antes de remover blocos repetidos
+MAIN_CONTENT_REPEAT_RATIO = 0.6       # Fração das páginas do domínio em que o bloco precisa aparecer
+# Classes/ids típicos de boilerplate; só removem blocos em que o texto é majoritariamente de links,
+# para não descartar preços e especificações (ex.: "price-promo", "sidebar-specs")
+MAIN_CONTENT_BOILERPLATE_HINTS = re.compile(
+    r'(^|[-_\s])(nav|navbar|menu|footer|breadcrumbs?|sidebar|related|recommend\w*|similar|relacionad\w*|'
+    r'newsletter|social|share|cookies?|banner|promo)([-_\s]|$)',
+    re.IGNORECASE
+)
+
+# Extração direta de dados estruturados (JSON-LD / microdata schema.org) antes do LLM
+STRUCTURED_DATA_ENABLED = os.environ.get('STRUCTURED_DATA_ENABLED', 'true').lower() == 'true'
+# Tipos schema.org que descrevem o conteúdo principal da página (Organization, WebSite etc. são ignorados)
+STRUCTURED_DATA_MAIN_TYPES = {
+    'product', 'book', 'scholarlyarticle', 'article', 'newsarticle', 'blogposting', 'techarticle',
+    'thesis', 'creativework', 'videoobject', 'movie', 'musicrecording', 'course', 'event', 'recipe'
+}
+# Nomes de campos (normalizados, sem acento) -> propriedades schema.org, em ordem de preferência
+STRUCTURED_DATA_FIELD_MAP = {
+    ('titulo', 'title', 'nome', 'name', 'produto', 'nome do produto', 'titulo do livro', 'titulo do video'): ['name', 'headline'],
+    ('autor', 'autores', 'author', 'authors', 'escritor'): ['author.name', 'author', 'creator.name'],
+    ('preco', 'price', 'valor', 'preco atual'): ['offers.price', 'offers.lowPrice'],
+    ('isbn',): ['isbn', 'gtin13', 'workExample.isbn'],
+    ('editora', 'publisher'): ['publisher.name', 'publisher'],
+    ('numero de paginas', 'paginas', 'pages', 'number of pages'): ['numberOfPages'],
+    ('ano de publicacao', 'ano', 'year'): ['datePublished:year', 'copyrightYear'],
+    ('data de publicacao', 'data', 'date', 'publication date'): ['datePublished', 'uploadDate'],
+    ('descricao', 'description', 'detalhes', 'details'): ['description', 'abstract'],
+    ('marca', 'brand', 'fabricante'): ['brand.name', 'brand', 'manufacturer.name'],
+    ('avaliacao', 'nota', 'rating'): ['aggregateRating.ratingValue'],
+    ('sku', 'codigo'): ['sku', 'productID', 'mpn'],
+    ('idioma', 'language'): ['inLanguage'],
+    ('duracao', 'duration'): ['duration'],
+    ('canal', 'channel'): ['author.name', 'creator.name']
+}
+
+# Templates de extração aprendidos por domínio (wrapper induction; requer lxml)
+EXTRACTION_TEMPLATES_ENABLED = os.environ.get('EXTRACTION_TEMPLATES_ENABLED', 'true').lower() == 'true'
+EXTRACTION_TEMPLATES_FILE = os.path.join(CACHE_FOLDER, 'extraction_templates.json')
+EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS = max(3, int(os.environ.get('EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS', 3)))  # Páginas em que o template precisa concordar com o LLM antes de substituí-lo
+EXTRACTION_TEMPLATE_RECHECK_RATE = float(os.environ.get('EXTRACTION_TEMPLATE_RECHECK_RATE', 0.05))  # Fração das páginas em que um template confirmado volta a ser comparado com o LLM
+EXTRACTION_TEMPLATE_MAX_FAILURES = 3      # Falhas de validação seguidas antes de descartar o template
+EXTRACTION_TEMPLATE_MAX_VALUE_RATIO = 10  # Valor aplicado maior que isso vezes o exemplo aprendido é rejeitado
+
+# Configurações da busca via HTTP simples (antes de recorrer ao Selenium)
+HTTP_FETCH_ENABLED = os.environ.get('HTTP_FETCH_ENABLED', 'true').lower() == 'true'
+HTTP_FETCH_TIMEOUT = 15          # Timeout da requisição HTTP (s)
+HTTP_POOL_MAXSIZE = 20           # Conexões keep-alive mantidas por host
+HTTP_MIN_TEXT_LENGTH = 500       # Menos caracteres visíveis que isso indica página dependente de JavaScript
+FETCH_TIER_MEMORY_TTL = 6 * 3600 # Tempo (s) que o nível escolhido para um domínio é lembrado
+# Nível forçado por domínio: 'http' (nunca usa o navegador) ou 'browser' (sempre usa o navegador)
+FETCH_TIER_OVERRIDES = {
+    'youtube.com': 'browser',
+    'magazineluiza.com.br': 'browser',
+    'arxiv.org': 'http'
+}
+# Marcadores de aplicações SPA que só renderizam o conteúdo com JavaScript
+SPA_MARKERS = [
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>',
+    r'<app-root[^>]*>\s*</app-root>',
+    r'(?:enable|ative|habilite)\s+(?:o\s+)?javascript',
+    r'you need to enable javascript'
+]
+
+# Configurações do agendador de tarefas
+TASK_WORKERS = int(os.environ.get('TASK_WORKERS', 8))                     # Threads de processamento
+TASK_QUEUE_SIZE = int(os.environ.get('TASK_QUEUE_SIZE', 100))             # Tarefas aguardando (acima disso: HTTP 429)
+FETCH_STAGE_CONCURRENCY = int(os.environ.get('FETCH_STAGE_CONCURRENCY', 4))  # Buscas de páginas simultâneas
+LLM_STAGE_CONCURRENCY = int(os.environ.get('LLM_STAGE_CONCURRENCY', 4))      # Chamadas ao LLM simultâneas
+
+# Configurações de jobs em lote
+BATCH_DEFAULT_PARALLELISM = 4   # URLs processadas simultaneamente por job
+BATCH_MAX_PARALLELISM = 16
+BATCH_MAX_URLS = 1000
+
+# Configurações do cache de páginas (HTML bruto + texto limpo)
+PAGE_CACHE_FOLDER = os.path.join(CACHE_FOLDER, 'pages')
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 7 * 24 * 3600))                  # Validade das entradas (s)
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 500 * 1024 * 1024))  # Tamanho máximo em disco
+CACHE_POLICIES = ('use', 'refresh', 'bypass')
+CLEAN_TEXT_VERSION = 2  # Incrementar quando clean_text mudar, para recalcular o texto das entradas em cache
+# Parâmetros de rastreamento ignorados na normalização de URLs
+TRACKING_QUERY_PARAMS = {'gclid', 'fbclid', 'msclkid', 'ref', 'ref_'}
+
+# Configurações dos clientes LLM
+DEFAULT_OLLAMA_API_BASE = "http://localhost:11434"
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))  # Conexões HTTP por provedor/api_base
+LLM_REQUEST_TIMEOUT = 300                                              # Timeout de cada chamada (s)
+
+# Limites por provedor (ou 'provedor:modelo'): requisições e tokens por minuto (0 = sem limite) e concorrência
+# inicial do controle adaptativo (AIMD: +1 a cada janela de sucessos, metade ao receber 429/5xx)
+LLM_RATE_LIMITS = {
+    'openai': {
+        'rpm': int(os.environ.get('OPENAI_RPM', 500)),
+        'tpm': int(os.environ.get('OPENAI_TPM', 200000)),
+        'concurrency': 8
+    },
+    'ollama': {
+        'rpm': int(os.environ.get('OLLAMA_RPM', 0)),
+        'tpm': int(os.environ.get('OLLAMA_TPM', 0)),
+        'concurrency': 2
+    }
+}
+LLM_MIN_CONCURRENCY = 1
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 32))  # Teto do limite adaptativo por provedor/modelo
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 6))           # Novas tentativas após 429/5xx/falha de conexão
+LLM_RETRY_BASE_DELAY = 1.0       # Espera base do backoff exponencial (s)
+LLM_RETRY_MAX_DELAY = 60.0       # Espera máxima entre tentativas (s)
+
+# Configurações da divisão de textos longos (map-reduce)
+# Tokens por prompt (0 desativa a divisão). Desativada por padrão: dividir uma página que cabe no contexto do
+# modelo pode separar o produto de blocos de itens relacionados e transformar a resposta em uma listagem
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get('LLM_PROMPT_TOKEN_BUDGET', 0))
+LLM_CHUNK_CONCURRENCY = 4  # Partes de uma mesma página extraídas simultaneamente
+LLM_MIN_CHUNK_TOKENS = 500  # Abaixo disso o orçamento é pequeno demais para dividir o texto
+CHARS_PER_TOKEN = 4        # Estimativa usada quando tiktoken não está instalado
+
+# Saída estruturada: pedir ao provedor JSON validado por um schema montado a partir dos campos
+# (OpenAI: response_format json_schema; Ollama: format). Modelos que rejeitarem o schema voltam ao texto livre.
+LLM_STRUCTURED_OUTPUT = os.environ.get('LLM_STRUCTURED_OUTPUT', 'true').lower() == 'true'
+
+# Respostas do LLM em streaming: cada item do array JSON é repassado à tarefa assim que fica completo
+LLM_STREAMING_ENABLED = os.environ.get('LLM_STREAMING_ENABLED', 'true').lower() == 'true'
+
+# Agrupamento de páginas curtas em uma única chamada ao LLM (jobs em lote com pack_pages)
+LLM_PACK_DEFAULT = os.environ.get('LLM_PACK_DEFAULT', 'false').lower() == 'true'  # Valor de pack_pages quando não informado
+LLM_PACK_MAX_PAGE_TOKENS = int(os.environ.get('LLM_PACK_MAX_PAGE_TOKENS', 1500))   # Páginas maiores que isso são extraídas sozinhas
+LLM_PACK_TOKEN_BUDGET = int(os.environ.get('LLM_PACK_TOKEN_BUDGET', 6000))         # Soma máxima de tokens de texto por chamada
+LLM_PACK_MAX_PAGES = int(os.environ.get('LLM_PACK_MAX_PAGES', 8))                  # Páginas por chamada
+LLM_PACK_MAX_WAIT = 0.5             # Espera máxima por outras páginas antes de enviar um grupo incompleto (s)
+LLM_PACK_MAX_OUTPUT_TOKENS = 16000  # Limite de tokens gerados em uma chamada agrupada
+
+# Configurações do cache de respostas do LLM
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_DB = os.path.join(CACHE_FOLDER, 'llm_responses.sqlite3')
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 20000))  # Entradas persistidas em disco
+LLM_CACHE_MEMORY_ENTRIES = 1000                                               # Entradas mantidas em memória
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 30 * 24 * 3600))          # Validade das respostas (s)
+
+# Mensagens de sistema enviadas aos modelos
+SYSTEM_MESSAGE_TEXT = "Você é um assistente especializado em extrair informações estruturadas de textos."
+SYSTEM_MESSAGE_VISION = "Você é um assistente especializado em extrair informações estruturadas de imagens de páginas web."
+
+# Instruções fixas da extração. Ficam no início do prompt, idênticas em todas as chamadas, e as partes
+# variáveis (campos, instruções do resumo, texto) vêm depois: assim o cache de prompt da OpenAI e o
+# reaproveitamento do contexto (KV cache) do Ollama alcançam todo o prefixo.
+# Incrementar EXTRACTION_PROMPT_VERSION ao alterar qualquer um dos textos.
+EXTRACTION_PROMPT_VERSION = 2
+EXTRACTION_MAX_ITEMS = 5  # "5 PRIMEIRAS ocorrências" dos prompts; limite do resultado consolidado das partes
+EXTRACTION_PROMPT_PREFIXES = {
+    'text': """Instruções de extração (v{version})
+Analise o texto ao final desta mensagem e extraia as 5 PRIMEIRAS ocorrências das informações listadas em "Campos solicitados".
+
+Se houver múltiplos itens ou produtos, extraia as informações para CADA UM DELES.
+
+Responda APENAS com um array JSON válido onde cada elemento é um objeto cujas chaves são exatamente os campos solicitados.
+Exemplo de formato esperado (para os campos "campo1" e "campo2"):
+[
+  {{"campo1": "valor1 para item1", "campo2": "valor2 para item1"}},
+  {{"campo1": "valor1 para item2", "campo2": "valor2 para item2"}},
+  ...
+]
+
+Se alguma informação não estiver disponível para um item específico, use "Não disponível" como valor.
+Se não encontrar nenhum item, retorne um array com um único objeto contendo os campos solicitados.""",
+    'image': """Instruções de extração (v{version})
+Analise a imagem anexada e extraia as 5 PRIMEIRAS ocorrências das informações listadas em "Campos solicitados".
+
+Se houver múltiplos itens ou produtos, extraia as informações para CADA UM DELES.
+
+Responda APENAS com um array JSON válido onde cada elemento é um objeto cujas chaves são exatamente os campos solicitados.
+Exemplo de formato esperado (para os campos "campo1" e "campo2"):
+[
+  {{"campo1": "valor1 para item1", "campo2": "valor2 para item1"}},
+  {{"campo1": "valor1 para item2", "campo2": "valor2 para item2"}},
+  ...
+]
+
+Se alguma informação não estiver disponível para um item específico, use "Não disponível" como valor.
+Se não encontrar nenhum item, retorne um array com um único objeto contendo os campos solicitados.""",
+    'pages': """Instruções de extração agrupada (v{version})
+Ao final desta mensagem estão várias páginas, cada uma delimitada por "=== PÁGINA <id> ===" e "=== FIM DA PÁGINA <id> ===".
+Analise CADA página separadamente e extraia as 5 PRIMEIRAS ocorrências das informações listadas em "Campos solicitados".
+
+Se uma página tiver múltiplos itens ou produtos, extraia as informações para CADA UM DELES. Nunca misture informações de páginas diferentes.
+
+Responda APENAS com um objeto JSON válido cujas chaves são os IDs das páginas e cujos valores são arrays onde cada elemento é um objeto cujas chaves são exatamente os campos solicitados.
+Exemplo de formato esperado (para as páginas "p1" e "p2" e os campos "campo1" e "campo2"):
+{{
+  "p1": [
+    {{"campo1": "valor1 para item1 da página p1", "campo2": "valor2 para item1 da página p1"}},
+    {{"campo1": "valor1 para item2 da página p1", "campo2": "valor2 para item2 da página p1"}}
+  ],
+  "p2": [
+    {{"campo1": "valor1 para item1 da página p2", "campo2": "valor2 para item1 da página p2"}}
+  ]
+}}
+
+Se alguma informação não estiver disponível para um item específico, use "Não disponível" como valor.
+Se não encontrar nenhum item em uma página, retorne para ela um array com um único objeto contendo os campos solicitados."""
+}
+
+# Tempo que o Ollama mantém o modelo (e o contexto já processado) carregado entre chamadas
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+
+# Configurações de espera por prontidão da página (substitui a espera fixa após driver.get)
+READINESS_POLL_INTERVAL = 0.1  # Intervalo entre verificações (s)
+READINESS_DEFAULT_PROFILE = {
+    'ready_state': 'interactive',  # 'interactive' ou 'complete'
+    'network_idle_ms': 500,        # Tempo sem novas requisições para considerar a rede ociosa (0 desativa)
+    'dom_quiet_ms': 500,           # Tempo sem mutações no DOM para considerar a página estável (0 desativa)
+    'selectors': [],               # Seletores CSS que devem existir antes da extração
+    'max_wait': 10                 # Tempo máximo de espera (s)
+}
+# Perfis por domínio (sobrescrevem o perfil padrão). Ajustar com base em /api/readiness-stats.
+READINESS_PROFILES = {
+    'livrariacultura.com.br': {'selectors': ['h1']},
+    'magazineluiza.com.br': {'selectors': ['h1'], 'dom_quiet_ms': 800},
+    'amazon.com.br': {'selectors': ['#productTitle']},
+    'youtube.com': {'selectors': ['h1.ytd-watch-metadata'], 'network_idle_ms': 0, 'dom_quiet_ms': 1000, 'max_wait': 15},
+    'ieeexplore.ieee.org': {'selectors': ['h1.document-title'], 'max_wait': 15},
+    'arxiv.org': {'network_idle_ms': 0, 'dom_quiet_ms': 0},
+    'bdta.abcd.usp.br': {'network_idle_ms': 300, 'dom_quiet_ms': 300}
+}
+
+# Métricas do pipeline (endpoint /metrics no formato de exposição do Prometheus)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)  # Limites dos histogramas (s)
+METRICS_HELP = {
+    'scraper_stage_duration_seconds': ('histogram', 'Duração de cada etapa do pipeline de extração'),
+    'scraper_llm_request_duration_seconds': ('histogram', 'Duração das chamadas ao LLM por provedor e modelo'),
+    'scraper_llm_requests_total': ('counter', 'Chamadas ao LLM por provedor, modelo e resultado'),
+    'scraper_llm_tokens_total': ('counter', 'Tokens de prompt, de resposta e de prompt em cache (kind=cached) por provedor e modelo'),
+    'scraper_stage_bytes_total': ('counter', 'Bytes processados por etapa (HTML obtido, texto limpo, arquivos exportados)'),
+    'scraper_fetch_total': ('counter', 'Páginas obtidas por nível (cache, http, browser)'),
+    'scraper_tasks_total': ('counter', 'Tarefas finalizadas por status'),
+    'scraper_tasks_stored': ('gauge', 'Tarefas no armazenamento por status'),
+    'scraper_task_queue_length': ('gauge', 'Tarefas aguardando na fila deste processo'),
+    'scraper_llm_retries_total': ('counter', 'Novas tentativas de chamadas ao LLM após 429/5xx/falha de conexão'),
+    'scraper_llm_concurrency_limit': ('gauge', 'Limite adaptativo de chamadas simultâneas por provedor e modelo')
+}
+
+# Armazenamento persistente das tarefas (compartilhado entre processos da aplicação)
+TASKS_DB = os.environ.get('TASKS_DB', os.path.join(RESULTS_FOLDER, 'tasks.sqlite3'))
+TASK_TTL = int(os.environ.get('TASK_TTL', 7 * 24 * 3600))           # Tarefas concluídas são removidas (com seus arquivos) após esse tempo (s)
+TASK_STALE_TIMEOUT = int(os.environ.get('TASK_STALE_TIMEOUT', 2 * 3600))  # Tarefa sem atualização por esse tempo é dada como interrompida (s)
+TASK_CLEANUP_INTERVAL = 3600      # Intervalo entre limpezas (s)
+BATCH_PROGRESS_PERSIST_INTERVAL = 1.0  # Intervalo mínimo entre gravações do progresso de um job em lote (s)
+TASK_STREAM_POLL_INTERVAL = 0.5   # Releitura da tarefa no stream de status (atualizações feitas por outros processos) (s)
+TASK_STREAM_HEARTBEAT = 15        # Comentário enviado ao cliente SSE para manter a conexão aberta (s)
+TASK_STREAM_MAX_DURATION = 600    # Duração máxima de uma conexão SSE; o navegador reconecta automaticamente (s)
+TASK_PARTIAL_ROWS_INTERVAL = 0.25 # Intervalo mínimo entre gravações dos itens parciais de uma tarefa (s)
 
 def allowed_file(filename):
     """Verifica se o arquivo tem uma extensão permitida"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def scrape_webpage_with_selenium(url, headless=True, wait_time=5):
+def create_chrome_driver(headless=True):
     """
-    Faz o scraping de uma página web usando Selenium para simular um navegador real.
+    Cria uma nova instância do Chrome WebDriver com as opções padrão da aplicação.
     
     Args:
-        url (str): URL da página web a ser extraída
         headless (bool): Se True, executa o navegador em modo headless (sem interface gráfica)
-        wait_time (int): Tempo de espera em segundos para carregamento da página
         
     Returns:
-        str: Conteúdo HTML da página
+        webdriver.Chrome: Instância do driver inicializada
+    """
+    # Configurar opções do Chrome
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+
+    # Retornar de driver.get() no DOMContentLoaded; a prontidão real é verificada por wait_for_page_ready()
+    chrome_options.page_load_strategy = 'eager'
+
+    # Forçar idioma preferencial: pt-BR > pt > en-US > en  (Solução para o YouTube)
+    ###chrome_options.add_argument("--lang=pt-BR")
+    ###prefs = {"intl.accept_languages": "pt-BR,pt,en-US,en"}
+    ###chrome_options.add_experimental_option("prefs", prefs)
+
+    
+    # Adicionar user-agent para parecer um navegador real
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    
+    # Inicializar o driver
+    logger.info("Inicializando o Chrome WebDriver...")
+    driver = webdriver.Chrome(options=chrome_options)
+
+
+    # Forçar Accept-Language via DevTools Protocol (CDP) (Solução para o Youtube)
+    ###driver.execute_cdp_cmd(
+    ###    "Network.setExtraHTTPHeaders",
+    ###    {"headers": {"Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7"}}
+    ###)
+
+    return driver
+
+class BrowserPool:
+    """
+    Pool limitado de instâncias do Chrome mantidas aquecidas entre tarefas.
+    
+    Cada navegador é emprestado para uma tarefa por vez, reiniciado (nova aba,
+    cookies e storage limpos) ao ser devolvido e reciclado após um número máximo
+    de páginas ou quando deixa de responder.
+    """
+    
+    def __init__(self, size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES, headless=True):
+        """
+        Args:
+            size (int): Número máximo de navegadores simultâneos
+            max_pages (int): Número de páginas após o qual um navegador é reciclado
+            headless (bool): Se True, os navegadores são executados em modo headless
+        """
+        self.size = size
+        self.max_pages = max_pages
+        self.headless = headless
+        self._idle = queue.LifoQueue()  # LIFO: reutiliza primeiro o navegador mais "quente"
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._pages_served = {}  # id(driver) -> número de páginas atendidas
+        self._closed = False
+    
+    def warm(self, count=None):
+        """
+        Inicializa navegadores antecipadamente para evitar o custo de startup na primeira tarefa.
+        Deve ser chamado antes de o pool começar a atender tarefas.
+        
+        Args:
+            count (int): Quantidade de navegadores a criar (padrão: tamanho do pool)
+        """
+        count = self.size if count is None else min(count, self.size)
+        for _ in range(count - self._idle.qsize()):
+            driver = self._new_driver()
+            self._idle.put(driver)
+        logger.info(f"Pool de navegadores aquecido com {self._idle.qsize()} instâncias")
+    
+    def acquire(self, timeout=BROWSER_ACQUIRE_TIMEOUT):
+        """
+        Empresta um navegador do pool, criando um novo se houver vaga livre.
+        
+        Args:
+            timeout (float): Tempo máximo de espera por um navegador livre, em segundos
+            
+        Returns:
+            webdriver.Chrome: Navegador pronto para uso
+        """
+        if self._closed:
+            raise RuntimeError("Pool de navegadores encerrado")
+        with stage_timer('browser_acquire'):
+            acquired = self._slots.acquire(timeout=timeout)
+        if not acquired:
+            raise TimeoutError(f"Nenhum navegador disponível após {timeout} segundos")
+        
+        try:
+            # Reutilizar um navegador ocioso que ainda esteja respondendo
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._is_alive(driver):
+                    return driver
+                logger.warning("Navegador ocioso não responde. Descartando instância.")
+                self._quit(driver)
+            
+            return self._new_driver()
+        
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def release(self, driver, discard=False):
+        """
+        Devolve um navegador ao pool, reiniciando-o ou reciclando-o conforme necessário.
+        
+        Args:
+            driver (webdriver.Chrome): Navegador emprestado por acquire()
+            discard (bool): Se True, encerra o navegador em vez de devolvê-lo (ex.: após falha)
+        """
+        try:
+            with self._lock:
+                pages = self._pages_served.get(id(driver), 0) + 1
+                self._pages_served[id(driver)] = pages
+            
+            if discard or self._closed or pages >= self.max_pages:
+                if not discard and not self._closed:
+                    logger.info(f"Reciclando navegador após {pages} páginas")
+                self._quit(driver)
+            elif self._reset(driver):
+                self._idle.put(driver)
+            else:
+                self._quit(driver)
+        finally:
+            self._slots.release()
+    
+    @contextmanager
+    def browser(self, timeout=BROWSER_ACQUIRE_TIMEOUT):
+        """
+        Gerenciador de contexto que empresta um navegador e o devolve ao final.
+        O navegador é descartado se ocorrer um erro do WebDriver durante o uso.
+        """
+        driver = self.acquire(timeout=timeout)
+        discard = False
+        try:
+            yield driver
+        except WebDriverException:
+            discard = True
+            raise
+        finally:
+            self.release(driver, discard=discard)
+    
+    def shutdown(self):
+        """Encerra todos os navegadores ociosos e impede novos empréstimos."""
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+    
+    def _reset(self, driver):
+        """
+        Limpa o estado da sessão descartando cookies e storage de todas as origens e abrindo uma aba nova.
+        delete_all_cookies e localStorage.clear() só alcançam a origem da aba atual, então a limpeza é
+        feita via CDP para o navegador inteiro (cookies de terceiros, IndexedDB, caches e service workers).
+        """
+        try:
+            try:
+                driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': '*', 'storageTypes': 'all'})
+            except WebDriverException as e:
+                # Sem CDP, limpar ao menos a origem atual; about:blank e data: não permitem acesso ao storage
+                logger.debug(f"Limpeza via CDP indisponível: {e}")
+                try:
+                    driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+                except WebDriverException:
+                    pass
+                driver.delete_all_cookies()
+            
+            old_handles = list(driver.window_handles)
+            driver.switch_to.new_window('tab')
+            new_handle = driver.current_window_handle
+            for handle in old_handles:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(new_handle)
+            return True
+        
+        except Exception as e:
+            logger.warning(f"Falha ao reiniciar navegador do pool: {e}")
+            return False
+    
+    def _new_driver(self):
+        """Cria um navegador novo e registra seu contador de páginas."""
+        with stage_timer('browser_start'):
+            driver = create_chrome_driver(headless=self.headless)
+        with self._lock:
+            self._pages_served[id(driver)] = 0
+        return driver
+    
+    def _is_alive(self, driver):
+        """Verifica se o navegador ainda responde a comandos."""
+        try:
+            driver.current_window_handle
+            return True
+        except Exception:
+            return False
+    
+    def _quit(self, driver):
+        """Encerra o navegador ignorando erros de processos já finalizados."""
+        with self._lock:
+            self._pages_served.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Erro ao encerrar navegador: {e}")
+
+# Pool global de navegadores (os navegadores são criados sob demanda)
+browser_pool = BrowserPool()
+atexit.register(browser_pool.shutdown)
+
+def get_domain(url):
+    """
+    Obtém o domínio de uma URL sem o prefixo 'www' (ex.: 'www3.livrariacultura.com.br' -> 'livrariacultura.com.br').
+    
+    Args:
+        url (str): URL da página
+        
+    Returns:
+        str: Domínio normalizado em minúsculas
+    """
+    host = (urlparse(url).hostname or '').lower()
+    return re.sub(r'^www\d*\.', '', host)
+
+def get_readiness_profile(url):
+    """
+    Obtém o perfil de prontidão para a URL, combinando o perfil padrão com o perfil do domínio.
+    
+    Args:
+        url (str): URL da página
+        
+    Returns:
+        dict: Perfil de prontidão efetivo
+    """
+    profile = dict(READINESS_DEFAULT_PROFILE)
+    domain = get_domain(url)
+    for profile_domain, overrides in READINESS_PROFILES.items():
+        if domain == profile_domain or domain.endswith('.' + profile_domain):
+            profile.update(overrides)
+            break
+    return profile
+
+class ReadinessStats:
+    """
+    Registra quanto tempo cada espera de prontidão realmente levou, por domínio,
+    para permitir o ajuste dos perfis em READINESS_PROFILES.
+    """
+    
+    def __init__(self, max_samples=200):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._domains = {}
+    
+    def record(self, domain, elapsed, timed_out, reason):
+        """
+        Registra uma espera.
+        
+        Args:
+            domain (str): Domínio da página
+            elapsed (float): Tempo de espera em segundos
+            timed_out (bool): Se a espera atingiu o tempo máximo
+            reason (str): Condição que encerrou a espera
+        """
+        with self._lock:
+            entry = self._domains.setdefault(domain, {
+                'count': 0,
+                'timeouts': 0,
+                'total': 0.0,
+                'max': 0.0,
+                'reasons': {},
+                'samples': deque(maxlen=self.max_samples)
+            })
+            entry['count'] += 1
+            entry['timeouts'] += int(timed_out)
+            entry['total'] += elapsed
+            entry['max'] = max(entry['max'], elapsed)
+            entry['reasons'][reason] = entry['reasons'].get(reason, 0) + 1
+            entry['samples'].append(elapsed)
+    
+    def summary(self):
+        """
+        Returns:
+            dict: Estatísticas por domínio (contagem, média, p50, p95, máximo, timeouts)
+        """
+        with self._lock:
+            result = {}
+            for domain, entry in self._domains.items():
+                samples = sorted(entry['samples'])
+                result[domain] = {
+                    'count': entry['count'],
+                    'timeouts': entry['timeouts'],
+                    'mean': round(entry['total'] / entry['count'], 3),
+                    'p50': round(_percentile(samples, 50), 3),
+                    'p95': round(_percentile(samples, 95), 3),
+                    'max': round(entry['max'], 3),
+                    'reasons': dict(entry['reasons'])
+                }
+            return result
+
+def _percentile(sorted_values, percent):
+    """Calcula o percentil (vizinho mais próximo) de uma lista já ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(percent / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+# Estatísticas globais das esperas de prontidão
+readiness_stats = ReadinessStats()
+
+class PipelineMetrics:
+    """
+    Registro em memória de contadores e histogramas do pipeline, exportados no formato
+    de texto do Prometheus. Cada processo da aplicação mantém as próprias métricas.
+    """
+    
+    def __init__(self, buckets=METRICS_DURATION_BUCKETS, enabled=METRICS_ENABLED):
+        self.buckets = buckets
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}    # (nome, rótulos) -> valor (contadores e gauges)
+        self._histograms = {}  # (nome, rótulos) -> [contagens por limite, soma, total]
+    
+    def inc(self, name, value=1, **labels):
+        """Incrementa um contador."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def set_gauge(self, name, value, **labels):
+        """Define o valor atual de um gauge (exportado junto com os contadores)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = value
+    
+    def observe(self, name, value, **labels):
+        """Registra uma observação em um histograma."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+    
+    def render(self):
+        """
+        Returns:
+            str: Métricas no formato de exposição de texto do Prometheus
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()}
+        
+        lines = []
+        for name in sorted({key[0] for key in counters} | {key[0] for key in histograms}):
+            kind, description = METRICS_HELP.get(name, ('untyped', ''))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+            for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{name}_bucket{self._format_labels(labels + (('le', str(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{self._format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+    
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ''
+        escaped = []
+        for key, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+# Métricas globais do pipeline
+pipeline_metrics = PipelineMetrics()
+
+@contextmanager
+def stage_timer(stage, stats=None):
+    """
+    Mede a duração de uma etapa: registra no histograma scraper_stage_duration_seconds
+    e, se stats for fornecido, acumula em stats['timings'][stage].
+    
+    Args:
+        stage (str): Nome da etapa
+        stats (dict): Estatísticas da tarefa (opcional)
     """
+    start = time.perf_counter()
     try:
-        # Configurar opções do Chrome
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument("--headless=new")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        pipeline_metrics.observe('scraper_stage_duration_seconds', elapsed, stage=stage)
+        if stats is not None:
+            timings = stats.setdefault('timings', {})
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
 
+# Script injetado na página para acompanhar requisições pendentes e mutações no DOM
+_READINESS_INSTALL_SCRIPT = """
+if (!window.__readiness) {
+    var r = window.__readiness = {pending: 0, lastActivity: performance.now(), lastMutation: performance.now()};
+    var touch = function() { r.lastActivity = performance.now(); };
+    try {
+        new MutationObserver(function() { r.lastMutation = performance.now(); })
+            .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    } catch (e) {}
+    if (window.fetch) {
+        var origFetch = window.fetch;
+        window.fetch = function() {
+            r.pending++; touch();
+            return origFetch.apply(this, arguments).finally(function() { r.pending--; touch(); });
+        };
+    }
+    var origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        r.pending++; touch();
+        this.addEventListener('loadend', function() { r.pending--; touch(); });
+        return origSend.apply(this, arguments);
+    };
+}
+"""
 
-        # Forçar idioma preferencial: pt-BR > pt > en-US > en  (Solução para o YouTube)
-        ###chrome_options.add_argument("--lang=pt-BR")
-        ###prefs = {"intl.accept_languages": "pt-BR,pt,en-US,en"}
-        ###chrome_options.add_experimental_option("prefs", prefs)
+# Script que consulta o estado atual da página
+_READINESS_PROBE_SCRIPT = """
+var r = window.__readiness || {pending: 0, lastActivity: 0, lastMutation: 0};
+var now = performance.now();
+var lastResource = 0;
+var entries = performance.getEntriesByType('resource');
+for (var i = 0; i < entries.length; i++) {
+    lastResource = Math.max(lastResource, entries[i].responseEnd || entries[i].startTime);
+}
+var selectors = arguments[0] || [];
+var missing = selectors.filter(function(sel) {
+    try { return !document.querySelector(sel); } catch (e) { return false; }
+});
+return {
+    readyState: document.readyState,
+    pending: r.pending,
+    networkIdleMs: now - Math.max(r.lastActivity, lastResource),
+    domQuietMs: now - r.lastMutation,
+    missingSelectors: missing
+};
+"""
 
+def wait_for_page_ready(driver, url, max_wait=None):
+    """
+    Aguarda até que a página esteja pronta para extração, em vez de uma espera fixa.
+    
+    A página é considerada pronta quando todas as condições do perfil do domínio são atendidas:
+    document.readyState, rede ociosa, DOM sem mutações e presença dos seletores CSS.
+    
+    Args:
+        driver (webdriver.Chrome): Navegador com a página carregada
+        url (str): URL da página (usada para escolher o perfil do domínio)
+        max_wait (float): Tempo máximo de espera em segundos (padrão: valor do perfil)
+        
+    Returns:
+        float: Tempo de espera efetivo em segundos
+    """
+    profile = get_readiness_profile(url)
+    if max_wait is None:
+        max_wait = profile['max_wait']
+    ready_states = ('complete',) if profile['ready_state'] == 'complete' else ('interactive', 'complete')
+    
+    start = time.monotonic()
+    deadline = start + max_wait
+    reason = 'timeout'
+    
+    try:
+        driver.execute_script(_READINESS_INSTALL_SCRIPT)
+    except WebDriverException as e:
+        logger.warning(f"Não foi possível instalar o monitor de prontidão: {e}")
+    
+    while time.monotonic() < deadline:
+        try:
+            state = driver.execute_script(_READINESS_PROBE_SCRIPT, profile['selectors'])
+        except WebDriverException as e:
+            logger.warning(f"Erro ao verificar prontidão da página: {e}")
+            reason = 'probe_error'
+            break
+        
+        if (state['readyState'] in ready_states
+                and not state['missingSelectors']
+                and (not profile['network_idle_ms']
+                     or (state['pending'] == 0 and state['networkIdleMs'] >= profile['network_idle_ms']))
+                and (not profile['dom_quiet_ms'] or state['domQuietMs'] >= profile['dom_quiet_ms'])):
+            reason = 'ready'
+            break
         
-        # Adicionar user-agent para parecer um navegador real
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.7049.84 Safari/537.36")
+        time.sleep(READINESS_POLL_INTERVAL)
+    
+    elapsed = time.monotonic() - start
+    readiness_stats.record(get_domain(url), elapsed, reason == 'timeout', reason)
+    
+    if reason == 'timeout':
+        logger.warning(f"Página não ficou pronta em {max_wait} segundos. Prosseguindo com o conteúdo atual.")
+    else:
+        logger.info(f"Página pronta em {elapsed:.2f} segundos ({reason})")
+    
+    return elapsed
+
+def get_blocked_url_patterns(url):
+    """
+    Monta a lista de padrões de URL bloqueados para a página, aplicando as regras do domínio.
+    
+    Args:
+        url (str): URL da página
         
-        # Inicializar o driver
-        logger.info("Inicializando o Chrome WebDriver...")
-        driver = webdriver.Chrome(options=chrome_options)
+    Returns:
+        list: Padrões de hosts de rastreamento no formato aceito por Network.setBlockedURLs
+    """
+    patterns = list(BLOCKED_RESOURCE_PATTERNS)
+    domain = get_domain(url)
+    for rule_domain, rule in RESOURCE_BLOCKING_RULES.items():
+        if domain == rule_domain or domain.endswith('.' + rule_domain):
+            allowed = set(rule.get('allow', []))
+            patterns = [pattern for pattern in patterns if pattern not in allowed]
+            patterns.extend(rule.get('deny', []))
+            break
+    return patterns
 
+def apply_resource_blocking(driver, url, enabled=True):
+    """
+    Configura o bloqueio de rastreadores da sessão do Chrome via DevTools Protocol (CDP).
+    Imagens, fontes e mídia são bloqueadas pelo tipo de recurso em ResourceTypeBlocker.
+    Como os navegadores do pool são reutilizados, a lista é sempre redefinida (vazia quando desativado).
+    
+    Args:
+        driver (webdriver.Chrome): Navegador que vai acessar a URL
+        url (str): URL da página
+        enabled (bool): Se False, remove qualquer bloqueio anterior
+    """
+    patterns = get_blocked_url_patterns(url) if enabled else []
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    except WebDriverException as e:
+        logger.warning(f"Não foi possível configurar o bloqueio de recursos: {e}")
 
-        # Forçar Accept-Language via DevTools Protocol (CDP) (Solução para o Youtube)
-        ###driver.execute_cdp_cmd(
-        ###    "Network.setExtraHTTPHeaders",
-        ###    {"headers": {"Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7"}}
-        ###)
+class ResourceTypeBlocker:
+    """
+    Bloqueia imagens, fontes e mídia pelo tipo de recurso durante o carregamento de uma página.
+    
+    Abre uma conexão CDP (driver.bidi_connection) em uma thread com loop trio, ativa Fetch.enable
+    apenas para os tipos de BLOCKED_RESOURCE_TYPES e falha cada requisição pausada com BlockedByClient.
+    Ao sair do bloco a escuta é cancelada e a sessão CDP é encerrada, o que desativa a interceptação,
+    de modo que o navegador volta ao pool sem nenhum bloqueio pendente.
+    """
+    
+    START_TIMEOUT = 5            # Espera máxima para a interceptação ficar ativa (s)
+    EVENT_BUFFER_SIZE = 1000     # Eventos descartados pelo Selenium deixariam requisições pausadas
+    
+    def __init__(self, driver, resource_types=None):
+        self.driver = driver
+        self.resource_types = list(BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.blocked = 0
+        self.active = False
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._token = None
+        self._cancel_scope = None
+        self._thread = None
+    
+    def __enter__(self):
+        if trio is None or not self.resource_types:
+            return self
+        self._thread = threading.Thread(target=self._run, name='resource-type-blocker', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(self.START_TIMEOUT) or not self.active:
+            logger.warning("Não foi possível ativar o bloqueio por tipo de recurso; a página será carregada sem ele")
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            self._stopped = True
+            token, scope = self._token, self._cancel_scope
+        if token is not None and scope is not None:
+            try:
+                trio.from_thread.run_sync(scope.cancel, trio_token=token)
+            except trio.RunFinishedError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=self.START_TIMEOUT)
+        if self.blocked:
+            logger.debug(f"{self.blocked} requisições bloqueadas por tipo de recurso")
+        return False
+    
+    def _run(self):
+        try:
+            trio.run(self._listen)
+        except Exception as e:
+            logger.warning(f"Falha na interceptação de recursos via CDP: {e}")
+        finally:
+            self.active = False
+            self._ready.set()
+    
+    async def _listen(self):
+        with trio.CancelScope() as scope:
+            with self._lock:
+                if self._stopped:
+                    return
+                self._token = trio.lowlevel.current_trio_token()
+                self._cancel_scope = scope
+            
+            async with self.driver.bidi_connection() as connection:
+                session, devtools = connection.session, connection.devtools
+                # Assinar os eventos antes de ativar a interceptação, para não perder nenhuma requisição pausada
+                events = session.listen(devtools.fetch.RequestPaused, buffer_size=self.EVENT_BUFFER_SIZE)
+                patterns = [
+                    devtools.fetch.RequestPattern(resource_type=devtools.network.ResourceType(resource_type))
+                    for resource_type in self.resource_types
+                ]
+                await session.execute(devtools.fetch.enable(patterns=patterns))
+                self.active = True
+                self._ready.set()
+                
+                async for event in events:
+                    self.blocked += 1
+                    await session.execute(devtools.fetch.fail_request(
+                        event.request_id, devtools.network.ErrorReason.BLOCKED_BY_CLIENT
+                    ))
 
+def scrape_webpage_with_selenium(url, headless=True, wait_time=None, block_resources=None):
+    """
+    Faz o scraping de uma página web usando Selenium para simular um navegador real.
+    Em modo headless, o navegador é emprestado do pool global em vez de ser criado a cada chamada.
+    
+    Args:
+        url (str): URL da página web a ser extraída
+        headless (bool): Se True, executa o navegador em modo headless (sem interface gráfica)
+        wait_time (int): Tempo máximo de espera em segundos para carregamento da página
+            (padrão: valor do perfil de prontidão do domínio)
+        block_resources (bool): Se True, bloqueia imagens, fontes, mídia e rastreadores
+            (padrão: RESOURCE_BLOCKING_ENABLED). Desativar quando a página precisa ser renderizada por completo.
+        
+    Returns:
+        str: Conteúdo HTML da página
+    """
+    if block_resources is None:
+        block_resources = RESOURCE_BLOCKING_ENABLED
+    
+    try:
+        if headless and browser_pool.headless:
+            with browser_pool.browser() as driver:
+                return _load_page(driver, url, wait_time, block_resources)
         
+        # Navegador visível (depuração): instância dedicada fora do pool
+        driver = create_chrome_driver(headless=headless)
+        try:
+            return _load_page(driver, url, wait_time, block_resources)
+        finally:
+            # Fechar o driver
+            driver.quit()
+    
+    except Exception as e:
+        logger.error(f"Erro ao acessar a URL com Selenium: {e}")
+        return None
+
+def _load_page(driver, url, wait_time, block_resources):
+    """Acessa a URL no navegador informado e retorna o HTML quando a página estiver pronta."""
+    # Configurar o bloqueio de rastreadores antes da navegação
+    apply_resource_blocking(driver, url, enabled=block_resources)
+    
+    # Imagens, fontes e mídia são bloqueadas pelo tipo de recurso apenas durante o carregamento
+    blocker = ResourceTypeBlocker(driver) if block_resources else nullcontext()
+    with blocker:
         # Acessar a URL
         logger.info(f"Acessando a URL: {url}")
-        driver.get(url)
+        with stage_timer('page_load'):
+            driver.get(url)
         
         # Aguardar o carregamento da página
-        logger.info(f"Aguardando {wait_time} segundos para carregamento completo...")
-        time.sleep(wait_time)
+        with stage_timer('readiness_wait'):
+            wait_for_page_ready(driver, url, max_wait=wait_time)
         
         # Obter o conteúdo HTML
-        html_content = driver.page_source
-        
-        # Fechar o driver
-        driver.quit()
-        
-        return html_content
+        return driver.page_source
+
+def scrape_webpage_with_screenshot(url, wait_time=None):
+    """
+    Carrega a página em um navegador do pool e retorna o HTML e uma captura de tela da página inteira,
+    mantida em memória. Os recursos não são bloqueados, para que imagens e fontes apareçam na captura.
     
+    Args:
+        url (str): URL da página web
+        wait_time (int): Tempo máximo de espera em segundos para carregamento da página (opcional)
+        
+    Returns:
+        tuple: (conteúdo_html, captura_png); (conteúdo_html, None) se só a captura falhar e
+               (None, None) se a página não carregar
+    """
+    try:
+        with browser_pool.browser() as driver:
+            html_content = _load_page(driver, url, wait_time, block_resources=False)
+            try:
+                with stage_timer('screenshot'):
+                    screenshot = capture_full_page_screenshot(driver)
+            except Exception as e:
+                # O HTML já carregado continua servindo para a extração pelo texto
+                logger.error(f"Erro ao capturar a tela da página: {e}")
+                screenshot = None
+            return html_content, screenshot
     except Exception as e:
-        logger.error(f"Erro ao acessar a URL com Selenium: {e}")
-        return None
+        logger.error(f"Erro ao capturar a página com Selenium: {e}")
+        return None, None
+
+def capture_full_page_screenshot(driver, max_height=SCREENSHOT_MAX_HEIGHT):
+    """
+    Captura a página inteira, além da área visível, pelo protocolo DevTools do Chrome.
+    
+    Args:
+        driver (webdriver.Chrome): Navegador com a página carregada
+        max_height (int): Altura máxima da captura (px)
+        
+    Returns:
+        bytes: Imagem PNG
+    """
+    metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+    size = metrics.get('cssContentSize') or metrics['contentSize']
+    clip = {
+        'x': 0,
+        'y': 0,
+        'width': math.ceil(size['width']),
+        'height': min(math.ceil(size['height']), max_height),
+        'scale': 1
+    }
+    result = driver.execute_cdp_cmd('Page.captureScreenshot', {
+        'format': 'png',
+        'captureBeyondViewport': True,
+        'clip': clip
+    })
+    return base64.b64decode(result['data'])
 
-def clean_text(html_content):
+def clean_text(html_content, backend=None):
     """
     Limpa o conteúdo HTML removendo elementos não relevantes como cabeçalho, rodapé, propagandas, etc.
     
     Args:
         html_content (str): Conteúdo HTML da página
+        backend (str): 'lxml' ou 'bs4' (padrão: CLEAN_TEXT_BACKEND)
         
     Returns:
         str: Texto limpo e processado
@@ -118,6 +1174,21 @@ def clean_text(html_content):
     if not html_content:
         return ""
     
+    backend = backend or CLEAN_TEXT_BACKEND
+    if backend == 'auto':
+        backend = 'lxml' if lxml_etree is not None else 'bs4'
+    
+    with stage_timer('clean_text'):
+        if backend == 'lxml':
+            try:
+                return _clean_text_lxml(html_content)
+            except Exception as e:
+                logger.warning(f"Falha na limpeza com lxml, usando BeautifulSoup: {e}")
+        
+        return _clean_text_bs4(html_content)
+
+def _clean_text_bs4(html_content):
+    """Backend de referência de clean_text (BeautifulSoup com html.parser)."""
     soup = BeautifulSoup(html_content, 'html.parser')
     
     # Remover elementos não relevantes
@@ -156,28 +1227,1335 @@ def clean_text(html_content):
     
     return cleaned_text.strip()
 
-def is_ollama_vision_model(model_provider):
+# Elementos e classes descartados pelo backend lxml (manter em sincronia com _clean_text_bs4;
+# 'template' porque get_text do BeautifulSoup ignora o conteúdo de <template>)
+_CLEAN_REMOVED_TAGS = frozenset(['script', 'style', 'iframe', 'meta', 'link', 'template'])
+_CLEAN_REMOVED_CLASSES = frozenset(['ads', 'banner', 'advertisement', 'cookie-notice'])
+# Diferenças entre o libxml2 e o html.parser corrigidas antes do parse (ver _prepare_html_for_lxml):
+# comentários (mantidos), seções CDATA, <textarea>/<title> (texto bruto no libxml2) e '\r' fora das tags
+_LXML_PARITY_PATTERN = re.compile(
+    r'(<!--.*?-->)|<!\[CDATA\[(.*?)\]\]>|<(/?)(textarea|title)(?=[\s/>])([^<>]*)>|(<[^<>]*>)|\r',
+    re.IGNORECASE | re.DOTALL
+)
+_CR_PLACEHOLDER = '\ue000'  # '\r' preservado (o libxml2 converte '\r\n' em '\n')
+
+class _VisibleTextCollector:
+    """
+    Alvo do parser lxml que extrai o texto visível em uma única passagem, sem construir a árvore.
+    Cada nó de texto (delimitado por tags ou comentários) é aparado e descartado se vazio,
+    como em BeautifulSoup.get_text(separator='\n', strip=True).
     """
-    Verifica se o modelo é um modelo Ollama com capacidade de visão.
     
-    Args:
-        model_provider (str): Nome do modelo
-        
-    Returns:
-        bool: True se for um modelo Ollama com capacidade de visão, False caso contrário
+    def __init__(self):
+        self.parts = []
+        self._buffer = []
+        self._skip_depth = 0
+    
+    def start(self, tag, attrib):
+        self._flush()
+        if self._skip_depth:
+            self._skip_depth += 1
+        elif tag in _CLEAN_REMOVED_TAGS or not _CLEAN_REMOVED_CLASSES.isdisjoint(attrib.get('class', '').split()):
+            self._skip_depth = 1
+    
+    def end(self, tag):
+        self._flush()
+        if self._skip_depth:
+            self._skip_depth -= 1
+    
+    def data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+    
+    def comment(self, text):
+        self._flush()
+    
+    def close(self):
+        self._flush()
+        return '\n'.join(self.parts)
+    
+    def _flush(self):
+        if self._buffer:
+            text = ''.join(self._buffer).replace(_CR_PLACEHOLDER, '\r').strip()
+            if text:
+                self.parts.append(text)
+            self._buffer = []
+
+def _prepare_html_for_lxml(html_content):
     """
-    ollama_vision_models = [
-        'llama3.2-vision:11b',
-        ##'gemma3:latest',
-	'qwen2.5vl:7b'
-    ]
-    return model_provider in ollama_vision_models
+    Ajusta o HTML para que o libxml2 produza o mesmo texto que o html.parser do BeautifulSoup:
+    o conteúdo de seções CDATA vira texto (separado como um nó próprio), <textarea> e <title>
+    são renomeados para que as tags internas sejam interpretadas, e '\r' do texto é preservado.
+    """
+    def replace(match):
+        comment, cdata, closing, tag, attributes, other_tag = match.groups()
+        if comment is not None or other_tag is not None:
+            return match.group(0)
+        if cdata is not None:
+            escaped = html.escape(cdata, quote=False).replace('\r', _CR_PLACEHOLDER)
+            return f"<!---->{escaped}<!---->"
+        if tag is not None:
+            return f"<{closing}x-{tag}{attributes}>"
+        return _CR_PLACEHOLDER
+    
+    return _LXML_PARITY_PATTERN.sub(replace, html_content)
 
-def process_image_with_ollama_vision(image_path, prompt, model_provider, api_base=None):
+def _clean_text_lxml(html_content):
+    """Backend rápido de clean_text: remoção de elementos e extração do texto em uma passagem (lxml/libxml2)."""
+    parser = lxml_etree.HTMLParser(target=_VisibleTextCollector())
+    parser.feed(_prepare_html_for_lxml(html_content))
+    cleaned_text = parser.close()
+    
+    # Remover linhas em branco extras
+    cleaned_text = re.sub(r'\n\s*\n', '\n\n', cleaned_text)
+    
+    return cleaned_text.strip()
+
+class BoilerplateMemory:
+    """
+    Conta, por domínio, em quantas páginas cada bloco de texto (impressão digital do texto normalizado)
+    já apareceu. Blocos presentes na maioria das páginas de um domínio (menus, rodapés, avisos)
+    são tratados como boilerplate.
     """
-    Processa uma imagem usando um modelo Ollama com capacidade de visão.
     
-    Args:
+    def __init__(self, max_fingerprints=5000):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._domains = {}  # domínio -> {'pages': int, 'counts': Counter}
+    
+    def repeated(self, domain):
+        """
+        Returns:
+            set: Impressões digitais que aparecem em MAIN_CONTENT_REPEAT_RATIO das páginas já vistas do domínio
+        """
+        with self._lock:
+            entry = self._domains.get(domain)
+            if not entry or entry['pages'] < MAIN_CONTENT_REPEAT_MIN_PAGES:
+                return set()
+            threshold = entry['pages'] * MAIN_CONTENT_REPEAT_RATIO
+            return {fingerprint for fingerprint, count in entry['counts'].items() if count >= threshold}
+    
+    def learn(self, domain, fingerprints):
+        """Registra os blocos de uma página do domínio."""
+        with self._lock:
+            entry = self._domains.setdefault(domain, {'pages': 0, 'counts': Counter()})
+            entry['pages'] += 1
+            entry['counts'].update(set(fingerprints))
+            if len(entry['counts']) > self.max_fingerprints:
+                entry['counts'] = Counter(dict(entry['counts'].most_common(self.max_fingerprints // 2)))
+
+# Memória global de blocos repetidos por domínio
+boilerplate_memory = BoilerplateMemory()
+
+_BLOCK_TAGS = frozenset(['div', 'section', 'article', 'aside', 'header', 'footer', 'nav', 'ul', 'ol', 'li',
+                         'table', 'form', 'p', 'dl', 'main'])
+_BOILERPLATE_ROLES = frozenset(['navigation', 'banner', 'contentinfo', 'complementary', 'search'])
+
+def extract_main_content(html_content, url=None, full_text=None):
+    """
+    Mantém apenas o conteúdo principal da página, removendo blocos de boilerplate com base em:
+    tags/roles de navegação, dicas em class/id, densidade de links e blocos repetidos
+    em outras páginas do mesmo domínio.
+    
+    Args:
+        html_content (str): HTML da página
+        url (str): URL da página (para a detecção de blocos repetidos por domínio)
+        full_text (str): Texto completo já limpo por clean_text (evita recalcular)
+        
+    Returns:
+        tuple: (texto_principal, estatísticas) onde estatísticas contém tokens_before, tokens_after,
+               tokens_saved, blocks_removed e applied
+    """
+    if full_text is None:
+        full_text = clean_text(html_content)
+    tokens_before = count_tokens(full_text)
+    stats = {'tokens_before': tokens_before, 'tokens_after': tokens_before, 'tokens_saved': 0,
+             'blocks_removed': 0, 'applied': False}
+    
+    if not MAIN_CONTENT_ENABLED or lxml_html is None or not html_content:
+        return full_text, stats
+    
+    try:
+        doc = lxml_html.document_fromstring(html_content)
+        body = doc.find('body')
+    except Exception as e:
+        logger.warning(f"Falha ao analisar HTML para detecção de conteúdo principal: {e}")
+        return full_text, stats
+    if body is None:
+        return full_text, stats
+    
+    # Remover elementos sem texto visível antes de calcular as métricas
+    lxml_etree.strip_elements(doc, 'script', 'style', 'template', lxml_etree.Comment, with_tail=False)
+    
+    # Passagem de baixo para cima: tamanho do texto, texto em links, número de links e presença de <h1>
+    metrics = {}
+    for element in reversed(list(body.iter(tag=lxml_etree.Element))):
+        text_len = len((element.text or '').strip())
+        link_len = 0
+        links = 0
+        has_h1 = element.tag == 'h1'
+        for child in element:
+            child_metrics = metrics.get(child)
+            if child_metrics:
+                text_len += child_metrics[0]
+                link_len += child_metrics[1]
+                links += child_metrics[2]
+                has_h1 = has_h1 or child_metrics[3]
+            text_len += len((child.tail or '').strip())
+        if element.tag == 'a':
+            link_len = text_len
+            links += 1
+        metrics[element] = (text_len, link_len, links, has_h1)
+    
+    domain = get_domain(url) if url else None
+    repeated = boilerplate_memory.repeated(domain) if domain else set()
+    fingerprints = []
+    to_remove = []
+    
+    # Passagem de cima para baixo: blocos de boilerplate são removidos inteiros
+    stack = [(child, False) for child in reversed(body)]
+    while stack:
+        element, in_main = stack.pop()
+        if not isinstance(element.tag, str):
+            continue
+        text_len, link_len, links, has_h1 = metrics.get(element, (0, 0, 0, False))
+        tag = element.tag
+        
+        fingerprint = None
+        if tag in _BLOCK_TAGS and 20 <= text_len <= 2000:
+            normalized = re.sub(r'\s+', ' ', element.text_content()).strip().lower()
+            fingerprint = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+            fingerprints.append(fingerprint)
+        
+        if not has_h1 and tag not in ('main', 'article'):
+            hints = f"{element.get('class', '')} {element.get('id', '')}"
+            if (tag == 'nav'
+                    or element.get('role', '') in _BOILERPLATE_ROLES
+                    or (tag in ('header', 'footer', 'aside') and not in_main)
+                    or (MAIN_CONTENT_BOILERPLATE_HINTS.search(hints)
+                        and links and link_len > MAIN_CONTENT_LINK_DENSITY * text_len)
+                    or (links >= 3 and text_len and link_len / text_len > MAIN_CONTENT_LINK_DENSITY
+                        and link_len / links < MAIN_CONTENT_MAX_LINK_CHARS)
+                    or (fingerprint is not None and fingerprint in repeated)):
+                to_remove.append(element)
+                continue
+        
+        child_in_main = in_main or tag in ('main', 'article')
+        stack.extend((child, child_in_main) for child in reversed(element))
+    
+    if domain:
+        boilerplate_memory.learn(domain, fingerprints)
+    
+    for element in to_remove:
+        element.drop_tree()
+    
+    main_text = clean_text(lxml_html.tostring(doc, encoding='unicode'))
+    
+    # Proteção contra remoção excessiva: usar o texto completo
+    if len(main_text) < MAIN_CONTENT_MIN_CHARS or len(main_text) < MAIN_CONTENT_MIN_RATIO * len(full_text):
+        logger.info(f"Conteúdo principal muito curto ({len(main_text)} caracteres). Usando texto completo.")
+        return full_text, stats
+    
+    tokens_after = count_tokens(main_text)
+    stats.update({
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+        'blocks_removed': len(to_remove),
+        'applied': True
+    })
+    logger.info(f"Conteúdo principal: {len(to_remove)} blocos removidos, "
+                f"{tokens_before - tokens_after} tokens economizados ({tokens_before} -> {tokens_after})")
+    return main_text, stats
+
+def _normalize_field_name(field):
+    """Normaliza o nome de um campo para comparação: minúsculas, sem acentos e espaços simples."""
+    text = unicodedata.normalize('NFKD', field).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+def _schema_types(item):
+    """Retorna os tipos schema.org de um item em minúsculas (ex.: {'product'})."""
+    types = item.get('@type', [])
+    if isinstance(types, str):
+        types = [types]
+    return {str(t).rsplit('/', 1)[-1].lower() for t in types}
+
+def _iter_json_ld_items(data):
+    """Percorre os objetos de um bloco JSON-LD (listas, @graph e ItemList) e gera os itens com @type."""
+    if isinstance(data, list):
+        for element in data:
+            yield from _iter_json_ld_items(element)
+    elif isinstance(data, dict):
+        if '@graph' in data:
+            yield from _iter_json_ld_items(data['@graph'])
+        if 'itemListElement' in data:
+            for element in data['itemListElement'] if isinstance(data['itemListElement'], list) else [data['itemListElement']]:
+                yield from _iter_json_ld_items(element.get('item', element) if isinstance(element, dict) else element)
+        if '@type' in data:
+            yield data
+
+def _parse_microdata(html_content):
+    """
+    Extrai itens microdata (itemscope/itemprop) de nível superior como dicionários no formato do JSON-LD.
+    Requer lxml; sem ele retorna uma lista vazia.
+    """
+    if lxml_html is None or 'itemscope' not in html_content:
+        return []
+    try:
+        doc = lxml_html.document_fromstring(html_content)
+    except Exception:
+        return []
+    
+    def read_item(scope):
+        item = {'@type': [t.rsplit('/', 1)[-1] for t in scope.get('itemtype', '').split()]}
+        stack = list(scope)
+        while stack:
+            element = stack.pop(0)
+            if not isinstance(element.tag, str):
+                continue
+            prop = element.get('itemprop')
+            if prop:
+                if element.get('itemscope') is not None:
+                    value = read_item(element)
+                else:
+                    value = (element.get('content') or element.get('datetime') or element.get('href')
+                             or element.get('src') or element.text_content().strip())
+                for name in prop.split():
+                    item.setdefault(name, value)
+            if element.get('itemscope') is None:
+                stack[0:0] = list(element)
+        return item
+    
+    return [read_item(scope) for scope in doc.xpath('//*[@itemscope and not(@itemprop)]')]
+
+def _lookup_property(item, path):
+    """
+    Obtém o valor de uma propriedade schema.org pelo caminho ('offers.price', 'author.name').
+    Listas são achatadas (autores múltiplos viram 'A, B') e o sufixo ':year' extrai o ano.
+    """
+    path, _, modifier = path.partition(':')
+    values = [item]
+    for key in path.split('.'):
+        next_values = []
+        for value in values:
+            if isinstance(value, list):
+                value_list = value
+            else:
+                value_list = [value]
+            for element in value_list:
+                if isinstance(element, dict) and key in element:
+                    next_values.append(element[key])
+        values = next_values
+    
+    flat = []
+    for value in values:
+        for element in (value if isinstance(value, list) else [value]):
+            if isinstance(element, (str, int, float)) and str(element).strip():
+                flat.append(str(element).strip())
+    if not flat:
+        return None
+    
+    result = ', '.join(dict.fromkeys(flat))
+    if modifier == 'year':
+        match = re.search(r'\d{4}', result)
+        return match.group(0) if match else None
+    if path.startswith('offers.') and re.match(r'^\d+(\.\d+)?$', result):
+        currency = _lookup_property(item, 'offers.priceCurrency')
+        if currency == 'BRL':
+            return f"R$ {float(result):,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+        return f"{result} {currency}" if currency else result
+    return html.unescape(result)
+
+def extract_structured_data(html_content):
+    """
+    Extrai os itens schema.org principais (JSON-LD e microdata) da página.
+    
+    Args:
+        html_content (str): HTML da página
+        
+    Returns:
+        list: Itens principais; vários itens do mesmo tipo indicam uma página de listagem,
+              itens de tipos diferentes (ex.: Book e Product) são combinados em um só
+    """
+    items = []
+    for match in re.finditer(
+        r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+        html_content, re.IGNORECASE | re.DOTALL
+    ):
+        try:
+            data = json.loads(match.group(1).strip())
+        except ValueError:
+            continue
+        items.extend(_iter_json_ld_items(data))
+    items.extend(_parse_microdata(html_content))
+    
+    main_items = [item for item in items if _schema_types(item) & STRUCTURED_DATA_MAIN_TYPES]
+    if not main_items:
+        return []
+    
+    # Agrupar por tipo: um grupo com vários itens é uma listagem
+    groups = {}
+    for item in main_items:
+        groups.setdefault(frozenset(_schema_types(item)), []).append(item)
+    largest = max(groups.values(), key=len)
+    if len(largest) > 1:
+        return largest
+    
+    merged = {}
+    for item in main_items:
+        for key, value in item.items():
+            merged.setdefault(key, value)
+    return [merged]
+
+def extract_fields_from_structured_data(html_content, fields):
+    """
+    Preenche os campos solicitados a partir dos dados estruturados da página.
+    
+    Args:
+        html_content (str): HTML da página
+        fields (list): Campos solicitados
+        
+    Returns:
+        tuple: (linhas, campos_faltantes) onde linhas é uma lista de dicionários (vazia se a página
+               não tiver dados estruturados) e campos_faltantes lista os campos que o LLM deve preencher
+    """
+    if not STRUCTURED_DATA_ENABLED or not html_content:
+        return [], list(fields)
+    
+    items = extract_structured_data(html_content)
+    if not items:
+        return [], list(fields)
+    
+    # Propriedades candidatas para cada campo solicitado
+    candidates = {}
+    for field in fields:
+        normalized = _normalize_field_name(field)
+        for names, properties in STRUCTURED_DATA_FIELD_MAP.items():
+            if normalized in names:
+                candidates[field] = properties
+                break
+    
+    rows = []
+    missing = set()
+    for item in items:
+        row = {}
+        for field in fields:
+            value = None
+            for prop in candidates.get(field, []):
+                value = _lookup_property(item, prop)
+                if value:
+                    break
+            if value:
+                row[field] = value
+            else:
+                missing.add(field)
+        rows.append(row)
+    
+    if not any(rows):
+        return [], list(fields)
+    return rows, [field for field in fields if field in missing]
+
+def create_http_session():
+    """
+    Cria uma sessão HTTP com pool de conexões keep-alive e compressão habilitada.
+    
+    Returns:
+        requests.Session: Sessão configurada
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_MAXSIZE, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': 'gzip, deflate'
+    })
+    return session
+
+# Sessão HTTP compartilhada (requests.Session é seguro para uso concorrente com HTTPAdapter)
+http_session = create_http_session()
+
+def fetch_webpage_with_requests(url, timeout=HTTP_FETCH_TIMEOUT, headers=None):
+    """
+    Obtém o HTML de uma página via HTTP simples, sem executar JavaScript.
+    
+    Args:
+        url (str): URL da página web
+        timeout (float): Timeout da requisição em segundos
+        headers (dict): Cabeçalhos adicionais (ex.: If-None-Match para revalidação)
+        
+    Returns:
+        requests.Response: Resposta com status 200 (HTML) ou 304, ou None em caso de falha
+    """
+    try:
+        response = http_session.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304:
+            return response
+        content_type = response.headers.get('Content-Type', '')
+        if response.status_code != 200 or 'html' not in content_type.lower():
+            logger.info(f"Busca HTTP sem sucesso ({response.status_code}, {content_type or 'sem Content-Type'}): {url}")
+            return None
+        return response
+    
+    except requests.RequestException as e:
+        logger.info(f"Erro na busca HTTP de {url}: {e}")
+        return None
+
+def page_needs_javascript(html_content, text):
+    """
+    Heurística que indica se a página obtida via HTTP precisa de um navegador para renderizar o conteúdo.
+    
+    Args:
+        html_content (str): HTML obtido via HTTP
+        text (str): Texto visível após clean_text
+        
+    Returns:
+        str: Motivo pelo qual a página precisa de JavaScript, ou None se o HTML já é suficiente
+    """
+    if len(text) < HTTP_MIN_TEXT_LENGTH:
+        return f"pouco texto visível ({len(text)} caracteres)"
+    for marker in SPA_MARKERS:
+        if re.search(marker, html_content, re.IGNORECASE):
+            return f"marcador de SPA encontrado ({marker})"
+    return None
+
+class FetchTierMemory:
+    """
+    Lembra, por domínio, qual nível de busca funcionou ('http' ou 'browser'),
+    para que as próximas URLs do domínio não repitam a tentativa que falhou.
+    """
+    
+    def __init__(self, ttl=FETCH_TIER_MEMORY_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tiers = {}  # domínio -> (nível, timestamp)
+    
+    def get(self, domain):
+        """
+        Returns:
+            tuple: (nível, forçado) onde nível é 'http', 'browser' ou None se desconhecido/expirado e
+                   forçado indica que o nível vem de FETCH_TIER_OVERRIDES (e não do que foi aprendido)
+        """
+        # Overrides valem também para subdomínios (ex.: m.exemplo.com), como READINESS_PROFILES
+        for override_domain, tier in FETCH_TIER_OVERRIDES.items():
+            if domain == override_domain or domain.endswith('.' + override_domain):
+                return tier, True
+        with self._lock:
+            entry = self._tiers.get(domain)
+            if entry and time.time() - entry[1] < self.ttl:
+                return entry[0], False
+            return None, False
+    
+    def remember(self, domain, tier):
+        """Registra o nível que funcionou para o domínio."""
+        with self._lock:
+            self._tiers[domain] = (tier, time.time())
+
+# Memória global dos níveis de busca por domínio
+fetch_tier_memory = FetchTierMemory()
+
+def normalize_url(url):
+    """
+    Normaliza uma URL para uso como chave de cache: esquema e host em minúsculas, sem porta padrão,
+    sem fragmento, com parâmetros de consulta ordenados e sem parâmetros de rastreamento.
+    
+    Args:
+        url (str): URL original
+        
+    Returns:
+        str: URL normalizada
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and not ((scheme == 'http' and parts.port == 80) or (scheme == 'https' and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_QUERY_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+class PageCache:
+    """
+    Cache em disco de páginas obtidas, endereçado pelo hash da URL normalizada.
+    
+    Cada entrada guarda o HTML bruto, o texto limpo, o momento da busca e os validadores
+    HTTP (ETag/Last-Modified). Entradas expiram após o TTL e as menos usadas recentemente
+    são removidas quando o tamanho total ultrapassa o limite.
+    """
+    
+    def __init__(self, folder=PAGE_CACHE_FOLDER, ttl=PAGE_CACHE_TTL, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.folder = folder
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # chave -> tamanho em bytes, da menos para a mais usada
+        self._total_bytes = 0
+        os.makedirs(folder, exist_ok=True)
+        self._load_index()
+    
+    def get(self, url):
+        """
+        Args:
+            url (str): URL da página
+            
+        Returns:
+            dict: Entrada do cache (url, html, text, fetched_at, etag, last_modified, tier) ou None
+        """
+        key = self._key(url)
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        try:
+            os.utime(path, None)  # Registrar o acesso para a ordem LRU entre reinícios
+        except OSError:
+            pass
+        return entry
+    
+    def is_fresh(self, entry):
+        """Returns: bool: True se a entrada ainda está dentro do TTL."""
+        return time.time() - entry.get('fetched_at', 0) < self.ttl
+    
+    def put(self, url, html_content, text, tier, headers=None):
+        """
+        Armazena uma página no cache, removendo entradas antigas se necessário.
+        
+        Args:
+            url (str): URL da página
+            html_content (str): HTML bruto
+            text (str): Texto limpo por clean_text
+            tier (str): Nível de busca que obteve a página ('http' ou 'browser')
+            headers (dict): Cabeçalhos da resposta HTTP (para ETag/Last-Modified)
+        """
+        headers = headers or {}
+        entry = {
+            'url': url,
+            'normalized_url': normalize_url(url),
+            'html': html_content,
+            'text': text,
+            'clean_text_version': CLEAN_TEXT_VERSION,
+            'fetched_at': time.time(),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'tier': tier
+        }
+        self._write(self._key(url), entry)
+    
+    def touch(self, url, entry):
+        """Renova o momento da busca de uma entrada revalidada (HTTP 304)."""
+        entry['fetched_at'] = time.time()
+        self._write(self._key(url), entry)
+    
+    def _write(self, key, entry):
+        """Grava a entrada de forma atômica e aplica o limite de tamanho."""
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.error(f"Erro ao gravar entrada no cache de páginas: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        
+        with self._lock:
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            self._evict_locked()
+    
+    def _evict_locked(self):
+        """Remove as entradas menos usadas até o cache caber no limite (chamar com o lock)."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+    
+    def _load_index(self):
+        """Reconstrói o índice LRU a partir dos arquivos em disco (ordenados pelo último acesso)."""
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-len('.json')], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict_locked()
+    
+    def _key(self, url):
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+# Cache global de páginas
+page_cache = PageCache()
+
+def _revalidate_cached_page(url, entry):
+    """
+    Revalida uma entrada expirada com uma requisição condicional (If-None-Match / If-Modified-Since).
+    
+    Returns:
+        bool: True se o servidor confirmou que a página não mudou (HTTP 304)
+    """
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    if not headers or not HTTP_FETCH_ENABLED:
+        return False
+    
+    response = fetch_webpage_with_requests(url, headers=headers)
+    if response is not None and response.status_code == 304:
+        page_cache.touch(url, entry)
+        return True
+    return False
+
+def fetch_webpage(url, cache_policy='use'):
+    """
+    Obtém e limpa uma página, consultando primeiro o cache em disco, depois HTTP simples,
+    e recorrendo ao Selenium apenas quando a página precisa de JavaScript.
+    
+    Args:
+        url (str): URL da página web
+        cache_policy (str): 'use' (usa o cache se válido), 'refresh' (busca de novo e atualiza o cache)
+            ou 'bypass' (ignora o cache para leitura e escrita)
+        
+    Returns:
+        tuple: (conteúdo_html, texto_limpo, nível) onde nível é 'cache', 'http' ou 'browser';
+               (None, None, None) em caso de falha
+    """
+    if cache_policy == 'use':
+        entry = page_cache.get(url)
+        if entry and (page_cache.is_fresh(entry) or _revalidate_cached_page(url, entry)):
+            logger.info(f"Página obtida do cache: {url}")
+            text = entry.get('text')
+            if entry.get('clean_text_version') != CLEAN_TEXT_VERSION or text is None:
+                text = clean_text(entry['html'])
+            return entry['html'], text, 'cache'
+    
+    html_content, text, tier, headers = _fetch_webpage_from_network(url)
+    if html_content and cache_policy != 'bypass':
+        page_cache.put(url, html_content, text, tier, headers)
+    return html_content, text, tier
+
+def _fetch_webpage_from_network(url):
+    """
+    Busca a página pela rede: HTTP simples primeiro e Selenium quando necessário.
+    
+    Returns:
+        tuple: (conteúdo_html, texto_limpo, nível, cabeçalhos_http); (None, None, None, None) em caso de falha
+    """
+    domain = get_domain(url)
+    tier, forced = fetch_tier_memory.get(domain)
+    
+    if HTTP_FETCH_ENABLED and tier != 'browser':
+        response = fetch_webpage_with_requests(url)
+        if response is not None and response.status_code == 200:
+            html_content = response.text
+            text = clean_text(html_content)
+            # Um 'http' aprendido não dispensa a verificação: outras páginas do domínio podem ser SPA.
+            # Só o override explícito aceita a resposta HTTP como está
+            reason = None if forced and tier == 'http' else page_needs_javascript(html_content, text)
+            if reason is None:
+                logger.info(f"Página obtida via HTTP simples: {url}")
+                fetch_tier_memory.remember(domain, 'http')
+                return html_content, text, 'http', response.headers
+            logger.info(f"Página requer navegador ({reason}): {url}")
+        elif forced and tier == 'http':
+            logger.warning(f"Busca HTTP falhou para domínio configurado como 'http'. Usando navegador: {url}")
+    
+    html_content = scrape_webpage_with_selenium(url)
+    if not html_content:
+        return None, None, None, None
+    
+    fetch_tier_memory.remember(domain, 'browser')
+    return html_content, clean_text(html_content), 'browser', {}
+
+def is_vision_model(model_provider):
+    """
+    Args:
+        model_provider (str): Provedor ou nome do modelo
+        
+    Returns:
+        bool: True para 'openai-vision' e para modelos Ollama com capacidade de visão
+    """
+    return model_provider == "openai-vision" or is_ollama_vision_model(model_provider)
+
+def is_ollama_vision_model(model_provider):
+    """
+    Verifica se o modelo é um modelo Ollama com capacidade de visão.
+    
+    Args:
+        model_provider (str): Nome do modelo
+        
+    Returns:
+        bool: True se for um modelo Ollama com capacidade de visão, False caso contrário
+    """
+    ollama_vision_models = [
+        'llama3.2-vision:11b',
+        ##'gemma3:latest',
+	'qwen2.5vl:7b'
+    ]
+    return model_provider in ollama_vision_models
+
+def record_llm_call(provider, model, elapsed, prompt_tokens, completion_tokens, usage=None, ok=True, cached_tokens=None):
+    """
+    Registra uma chamada ao LLM nas métricas globais e, se usage for fornecido, nos contadores da tarefa.
+    
+    Args:
+        provider (str): 'openai' ou 'ollama'
+        model (str): Nome do modelo
+        elapsed (float): Duração da chamada (s)
+        prompt_tokens (int): Tokens do prompt (None se a chamada falhou)
+        completion_tokens (int): Tokens da resposta (None se a chamada falhou)
+        usage (dict): Contadores da tarefa (opcional)
+        ok (bool): Se a chamada foi bem-sucedida
+        cached_tokens (int): Tokens do prompt atendidos pelo cache de prompt do provedor (se informado)
+    """
+    pipeline_metrics.observe('scraper_llm_request_duration_seconds', elapsed, provider=provider, model=model)
+    pipeline_metrics.inc('scraper_llm_requests_total', provider=provider, model=model, outcome='ok' if ok else 'error')
+    if ok:
+        pipeline_metrics.inc('scraper_llm_tokens_total', prompt_tokens, provider=provider, model=model, kind='prompt')
+        pipeline_metrics.inc('scraper_llm_tokens_total', completion_tokens, provider=provider, model=model, kind='completion')
+        if cached_tokens is not None:
+            pipeline_metrics.inc('scraper_llm_tokens_total', cached_tokens, provider=provider, model=model, kind='cached')
+    if usage is not None:
+        usage['calls'] = usage.get('calls', 0) + 1
+        if ok:
+            usage['prompt_tokens'] = usage.get('prompt_tokens', 0) + prompt_tokens
+            usage['completion_tokens'] = usage.get('completion_tokens', 0) + completion_tokens
+            if cached_tokens is not None:
+                usage['cached_tokens'] = usage.get('cached_tokens', 0) + cached_tokens
+        else:
+            usage['errors'] = usage.get('errors', 0) + 1
+
+class AdaptiveRateLimiter:
+    """
+    Limitador de um provedor/modelo, usado dentro do loop da camada de clientes LLM.
+    
+    Respeita requisições e tokens por minuto (janela deslizante de 60 s) e um limite de
+    chamadas simultâneas ajustado por AIMD: cresce 1 a cada 'limite' sucessos e cai pela
+    metade a cada 429/5xx/falha de conexão. Um Retry-After recebido pausa novas chamadas
+    até o prazo indicado. Chamadas acima dos limites aguardam em vez de falhar.
+    """
+    
+    def __init__(self, rpm=0, tpm=0, concurrency=4, min_concurrency=LLM_MIN_CONCURRENCY,
+                 max_concurrency=LLM_MAX_CONCURRENCY):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.limit = float(min(max(concurrency, min_concurrency), self.max_concurrency))
+        self.in_flight = 0
+        self.throttled = 0
+        self._window = deque()  # [instante, tokens] das chamadas do último minuto
+        self._paused_until = 0.0
+        self._condition = None  # asyncio.Condition, criada no loop da camada
+    
+    async def acquire(self, tokens):
+        """
+        Aguarda uma vaga respeitando concorrência, RPM, TPM e pausas de Retry-After.
+        
+        Args:
+            tokens (int): Estimativa de tokens da chamada (prompt + resposta máxima)
+            
+        Returns:
+            list: Registro da chamada na janela, a devolver em release()
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            while True:
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+            entry = [time.monotonic(), tokens]
+            self._window.append(entry)
+            return entry
+    
+    async def release(self, entry, tokens=None, throttled=False, retry_after=None):
+        """
+        Libera a vaga e ajusta o limite adaptativo.
+        
+        Args:
+            entry (list): Registro retornado por acquire()
+            tokens (int): Tokens efetivamente usados (substitui a estimativa na janela)
+            throttled (bool): Se o provedor sinalizou sobrecarga (429/5xx/falha de conexão)
+            retry_after (float): Pausa pedida pelo provedor (s)
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if tokens is not None:
+                entry[1] = tokens
+            if throttled:
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                self.throttled += 1
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+    
+    def _wait_time(self, tokens):
+        """Tempo a aguardar antes de tentar de novo (0 = pode executar agora)."""
+        now = time.monotonic()
+        while self._window and now - self._window[0][0] >= 60:
+            self._window.popleft()
+        
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= int(self.limit):
+            return 1.0  # Acordado antes por release()
+        if self.rpm and len(self._window) >= self.rpm:
+            return self._window[0][0] + 60 - now
+        if self.tpm and self._window and sum(entry[1] for entry in self._window) + tokens > self.tpm:
+            return self._window[0][0] + 60 - now
+        return 0
+
+def _llm_retry_info(error):
+    """
+    Classifica uma falha de chamada ao LLM.
+    
+    Returns:
+        tuple: (pode_tentar_de_novo, retry_after_em_segundos_ou_None)
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    
+    retry_after = None
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            retry_after = float(headers['retry-after-ms']) / 1000
+        elif headers.get('retry-after'):
+            retry_after = float(headers['retry-after'])
+    except (TypeError, ValueError):
+        retry_after = None  # Formato de data HTTP: usar o backoff exponencial
+    
+    if status is not None:
+        return status in (408, 409, 425, 429) or status >= 500, retry_after
+    
+    connection_errors = (asyncio.TimeoutError,)
+    if httpx is not None:
+        connection_errors += (httpx.TransportError,)
+    if OpenAIConnectionError is not None:
+        connection_errors += (OpenAIConnectionError,)
+    return isinstance(error, connection_errors), retry_after
+
+class LLMClientManager:
+    """
+    Camada assíncrona de clientes LLM de longa duração.
+    
+    Mantém um event loop em uma thread dedicada e um cliente HTTP (com pool de conexões keep-alive)
+    por provedor/api_base. Chamadas de várias tarefas são executadas concorrentemente nesse loop,
+    sem uma thread por requisição em andamento.
+    """
+    
+    def __init__(self, max_connections=LLM_MAX_CONNECTIONS, timeout=LLM_REQUEST_TIMEOUT):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        self._clients = {}  # (provedor, api_base) -> cliente; acessado apenas pela thread do loop
+        self._limiters = {}  # (provedor, modelo) -> AdaptiveRateLimiter; acessado apenas pela thread do loop
+        self._schema_unsupported = set()  # (provedor, modelo) que rejeitaram a saída estruturada
+    
+    def run(self, coro, timeout=None):
+        """
+        Executa uma corrotina no loop da camada e aguarda o resultado (para chamadores síncronos).
+        Não deve ser chamado de dentro do próprio loop.
+        
+        Args:
+            coro: Corrotina a executar
+            timeout (float): Tempo máximo de espera em segundos (opcional)
+            
+        Returns:
+            Resultado da corrotina
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+    
+    def openai_client(self):
+        """Returns: AsyncOpenAI: Cliente OpenAI compartilhado."""
+        key = ('openai', None)
+        if key not in self._clients:
+            if AsyncOpenAI is None or httpx is None:
+                raise ImportError("Pacote 'openai' não instalado")
+            self._clients[key] = AsyncOpenAI(
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                timeout=self.timeout,
+                max_retries=0,  # Novas tentativas ficam a cargo de call_with_limits
+                http_client=httpx.AsyncClient(limits=self._limits(), timeout=self.timeout)
+            )
+        return self._clients[key]
+    
+    def ollama_client(self, api_base=None):
+        """Returns: httpx.AsyncClient: Cliente HTTP compartilhado para a API do Ollama em api_base."""
+        api_base = (api_base or DEFAULT_OLLAMA_API_BASE).rstrip('/')
+        key = ('ollama', api_base)
+        if key not in self._clients:
+            if httpx is None:
+                raise ImportError("Pacote 'httpx' não instalado")
+            self._clients[key] = httpx.AsyncClient(base_url=api_base, limits=self._limits(), timeout=self.timeout)
+        return self._clients[key]
+    
+    async def chat(self, provider, model, messages, temperature=None, max_tokens=None, api_base=None, usage=None,
+                   response_schema=None, prompt_cache_key=None, on_delta=None):
+        """
+        Envia uma conversa ao modelo e retorna o texto da resposta.
+        
+        Args:
+            provider (str): 'openai' ou 'ollama'
+            model (str): Nome do modelo
+            messages (list): Mensagens no formato de chat
+            temperature (float): Temperatura (opcional)
+            max_tokens (int): Limite de tokens gerados (opcional)
+            api_base (str): URL base da API do Ollama (opcional)
+            usage (dict): Se fornecido, acumula 'calls', 'prompt_tokens', 'completion_tokens' e
+                'cached_tokens' (tokens do prompt atendidos pelo cache de prompt da OpenAI)
+            response_schema (dict): JSON schema da resposta (saída estruturada); ignorado para modelos
+                que já o rejeitaram
+            prompt_cache_key (str): Identificador do prefixo comum das chamadas, usado pela OpenAI para
+                direcioná-las ao mesmo cache de prompt (opcional)
+            on_delta (callable): Se fornecido, a resposta é recebida em streaming e cada trecho é repassado
+                a on_delta assim que chega; on_delta(None) é chamado no início de cada tentativa
+            
+        Returns:
+            str: Conteúdo da resposta do modelo
+        """
+        start = time.perf_counter()
+        if (provider, model) in self._schema_unsupported:
+            response_schema = None
+        cached_tokens = None
+        
+        async def send():
+            nonlocal cached_tokens
+            if provider == 'openai':
+                params = {'model': model, 'messages': messages}
+                if temperature is not None:
+                    params['temperature'] = temperature
+                if max_tokens is not None:
+                    params['max_tokens'] = max_tokens
+                if prompt_cache_key is not None:
+                    params['prompt_cache_key'] = prompt_cache_key
+                if response_schema is not None:
+                    params['response_format'] = {
+                        'type': 'json_schema',
+                        'json_schema': {'name': 'extracao', 'schema': response_schema, 'strict': True}
+                    }
+                if on_delta is None:
+                    response = await self.openai_client().chat.completions.create(**params)
+                    content = response.choices[0].message.content
+                    usage_info = response.usage
+                else:
+                    # Streaming: o uso de tokens chega no último trecho
+                    on_delta(None)
+                    parts = []
+                    usage_info = None
+                    stream = await self.openai_client().chat.completions.create(
+                        **params, stream=True, stream_options={'include_usage': True}
+                    )
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            on_delta(delta)
+                        if chunk.usage:
+                            usage_info = chunk.usage
+                    content = ''.join(parts)
+                reported = usage_info and (usage_info.prompt_tokens, usage_info.completion_tokens)
+                details = usage_info and getattr(usage_info, 'prompt_tokens_details', None)
+                cached_tokens = (getattr(details, 'cached_tokens', None) or 0) if usage_info else None
+            else:
+                options = {}
+                if temperature is not None:
+                    options['temperature'] = temperature
+                if max_tokens is not None:
+                    options['num_predict'] = max_tokens
+                body = {'model': model, 'messages': messages, 'stream': on_delta is not None, 'options': options,
+                        'keep_alive': OLLAMA_KEEP_ALIVE}
+                if response_schema is not None:
+                    body['format'] = response_schema
+                if on_delta is None:
+                    response = await self.ollama_client(api_base).post("/api/chat", json=body)
+                    response.raise_for_status()
+                    data = response.json()
+                    content = data['message']['content']
+                else:
+                    # Streaming: uma linha JSON por trecho; a última (done) traz as contagens de tokens
+                    on_delta(None)
+                    parts = []
+                    data = {}
+                    async with self.ollama_client(api_base).stream("POST", "/api/chat", json=body) as response:
+                        if response.status_code >= 400:
+                            await response.aread()
+                            response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.strip():
+                                continue
+                            data = json.loads(line)
+                            delta = data.get('message', {}).get('content')
+                            if delta:
+                                parts.append(delta)
+                                on_delta(delta)
+                    content = ''.join(parts)
+                reported = 'prompt_eval_count' in data and (data['prompt_eval_count'], data.get('eval_count', 0))
+            
+            # Sem contagem informada pelo provedor: estimar pelo texto
+            if not reported:
+                reported = (count_tokens(prompt_text, model), count_tokens(content or '', model))
+            return content, reported
+        
+        prompt_text = ' '.join(m['content'] if isinstance(m['content'], str) else
+                               ' '.join(part.get('text', '') for part in m['content']) for m in messages)
+        estimated_tokens = count_tokens(prompt_text, model) + (max_tokens or 0)
+        try:
+            try:
+                content, reported = await self.call_with_limits(provider, model, estimated_tokens, send)
+            except Exception as e:
+                status = getattr(e, 'status_code', None) or getattr(getattr(e, 'response', None), 'status_code', None)
+                if response_schema is None or status not in (400, 422):
+                    raise
+                # Só erros sobre o schema desativam a saída estruturada (não ex.: contexto excedido)
+                try:
+                    error_text = f"{e} {e.response.text}"
+                except Exception:
+                    error_text = str(e)
+                if not re.search(r'response_format|json_schema|format', error_text, re.IGNORECASE):
+                    raise
+                # Modelo/versão sem suporte a saída estruturada: repetir em texto livre e lembrar
+                logger.warning(f"{provider}/{model} rejeitou a saída estruturada ({e}). Usando texto livre.")
+                self._schema_unsupported.add((provider, model))
+                response_schema = None
+                content, reported = await self.call_with_limits(provider, model, estimated_tokens, send)
+        except Exception:
+            record_llm_call(provider, model, time.perf_counter() - start, None, None, usage, ok=False)
+            raise
+        
+        record_llm_call(provider, model, time.perf_counter() - start, reported[0], reported[1], usage,
+                        cached_tokens=cached_tokens)
+        return content
+    
+    async def call_with_limits(self, provider, model, estimated_tokens, send):
+        """
+        Executa uma chamada ao provedor respeitando o limitador do provedor/modelo e repetindo-a
+        com backoff exponencial com jitter (ou o Retry-After informado) em 429/5xx e falhas de conexão.
+        
+        Args:
+            provider (str): 'openai' ou 'ollama'
+            model (str): Nome do modelo
+            estimated_tokens (int): Estimativa de tokens da chamada (para o limite de TPM)
+            send (callable): Corrotina sem argumentos que faz a chamada e retorna (resultado, (tokens_prompt, tokens_resposta))
+            
+        Returns:
+            tuple: Valor retornado por send()
+        """
+        limiter = self.limiter(provider, model)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            entry = await limiter.acquire(estimated_tokens)
+            try:
+                result = await send()
+            except Exception as e:
+                retryable, retry_after = _llm_retry_info(e)
+                await limiter.release(entry, throttled=retryable, retry_after=retry_after)
+                pipeline_metrics.set_gauge('scraper_llm_concurrency_limit', int(limiter.limit), provider=provider, model=model)
+                if not retryable or attempt == LLM_MAX_RETRIES:
+                    raise
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, 1)
+                else:
+                    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                pipeline_metrics.inc('scraper_llm_retries_total', provider=provider, model=model)
+                logger.warning(f"Falha temporária do LLM ({provider}/{model}): {e}. Nova tentativa {attempt + 1}/"
+                               f"{LLM_MAX_RETRIES} em {delay:.1f}s (limite de concorrência: {int(limiter.limit)})")
+                await asyncio.sleep(delay)
+                continue
+            
+            await limiter.release(entry, tokens=sum(result[1]))
+            pipeline_metrics.set_gauge('scraper_llm_concurrency_limit', int(limiter.limit), provider=provider, model=model)
+            return result
+    
+    def limiter(self, provider, model):
+        """Returns: AdaptiveRateLimiter: Limitador do provedor/modelo (criado na primeira chamada)."""
+        key = (provider, model)
+        if key not in self._limiters:
+            config = dict(LLM_RATE_LIMITS.get(provider, {}))
+            config.update(LLM_RATE_LIMITS.get(f"{provider}:{model}", {}))
+            self._limiters[key] = AdaptiveRateLimiter(
+                rpm=config.get('rpm', 0),
+                tpm=config.get('tpm', 0),
+                concurrency=config.get('concurrency', 4)
+            )
+        return self._limiters[key]
+    
+    def shutdown(self):
+        """Fecha os clientes HTTP e encerra o loop."""
+        if self._loop is None:
+            return
+        try:
+            self.run(self._close_clients(), timeout=5)
+        except Exception as e:
+            logger.warning(f"Erro ao fechar clientes LLM: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+    
+    async def _close_clients(self):
+        """Fecha os clientes HTTP abertos."""
+        for client in self._clients.values():
+            if isinstance(client, httpx.AsyncClient):
+                await client.aclose()
+            else:
+                await client.close()
+        self._clients.clear()
+    
+    def _limits(self):
+        """Limites do pool de conexões de cada cliente."""
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+    
+    def _ensure_loop(self):
+        """Inicia o event loop em uma thread dedicada na primeira chamada."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-client-loop")
+                thread.daemon = True
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+# Camada global de clientes LLM
+llm_clients = LLMClientManager()
+atexit.register(llm_clients.shutdown)
+
+def detect_image_mime(data):
+    """
+    Identifica o tipo da imagem pelos primeiros bytes.
+    
+    Args:
+        data (bytes): Conteúdo da imagem
+        
+    Returns:
+        str: Tipo MIME (image/jpeg quando o formato não é reconhecido)
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+def _image_tile_boxes(height, tile_height, overlap, max_tiles):
+    """
+    Calcula as faixas verticais (topo, base) das partes de uma imagem alta, com sobreposição.
+    Com mais de max_tiles partes, a altura de cada parte aumenta para caber em max_tiles.
+    """
+    if height <= tile_height * 1.5:
+        return [(0, height)]  # Pouco mais alta que uma parte: dividir só acrescentaria chamadas
+    count = math.ceil((height - overlap) / (tile_height - overlap))
+    if count > max_tiles:
+        count = max_tiles
+        tile_height = math.ceil((height + overlap * (count - 1)) / count)
+    step = tile_height - overlap
+    boxes = []
+    for index in range(count):
+        top = min(index * step, height - tile_height)
+        boxes.append((top, top + tile_height))
+    return boxes
+
+def prepare_image(image_source, max_width=IMAGE_MAX_WIDTH, tile_height=IMAGE_TILE_HEIGHT, overlap=IMAGE_TILE_OVERLAP,
+                  max_tiles=IMAGE_MAX_TILES):
+    """
+    Prepara uma imagem para os modelos de visão: reduz a largura para max_width (acima disso os
+    provedores reduzem a imagem de qualquer forma), recodifica em JPEG e divide capturas de tela
+    altas em partes sobrepostas, extraídas em paralelo.
+    
+    Args:
+        image_source (str ou bytes): Caminho para o arquivo de imagem ou o seu conteúdo
+        max_width (int): Largura máxima (px)
+        tile_height (int): Altura de cada parte (px)
+        overlap (int): Sobreposição entre partes (px)
+        max_tiles (int): Número máximo de partes
+        
+    Returns:
+        list: Partes da imagem, de cima para baixo, como dicionários {'data': bytes, 'mime': str}
+    """
+    if isinstance(image_source, bytes):
+        data = image_source
+    else:
+        with open(image_source, "rb") as image_file:
+            data = image_file.read()
+    original = {'data': data, 'mime': detect_image_mime(data)}
+    if Image is None or not IMAGE_PREPROCESS_ENABLED:
+        return [original]
+    
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.seek(0)  # GIF/WebP animados: apenas o primeiro quadro
+            width, height = image.size
+            resized = width > max_width
+            if resized:
+                image = image.resize((max_width, max(1, round(height * max_width / width))), Image.LANCZOS)
+                width, height = image.size
+            boxes = _image_tile_boxes(height, tile_height, overlap, max_tiles)
+            if (not resized and len(boxes) == 1 and original['mime'] in ('image/png', 'image/jpeg')
+                    and len(data) <= IMAGE_KEEP_ORIGINAL_MAX_BYTES):
+                return [original]
+            
+            # JPEG não tem transparência: compor sobre fundo branco
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            
+            tiles = []
+            for top, bottom in boxes:
+                buffer = io.BytesIO()
+                image.crop((0, top, width, bottom)).save(buffer, format='JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True)
+                tiles.append({'data': buffer.getvalue(), 'mime': 'image/jpeg'})
+    except Exception as e:
+        logger.warning(f"Falha ao pré-processar a imagem: {e}. Enviando o arquivo original.")
+        return [original]
+    
+    logger.info(f"Imagem preparada: {len(data) // 1024} KB -> {len(tiles)} parte(s) de {width}px de largura, "
+                f"{sum(len(tile['data']) for tile in tiles) // 1024} KB")
+    return tiles
+
+def process_image_with_ollama_vision(image_path, prompt, model_provider, api_base=None):
+    """
+    Processa uma imagem usando um modelo Ollama com capacidade de visão.
+    
+    Args:
         image_path (str): Caminho para o arquivo de imagem
         prompt (str): Prompt para o modelo
         model_provider (str): Nome do modelo Ollama
@@ -186,73 +2564,520 @@ def process_image_with_ollama_vision(image_path, prompt, model_provider, api_bas
     Returns:
         str: Resposta do modelo
     """
+    return llm_clients.run(process_image_with_ollama_vision_async(image_path, prompt, model_provider, api_base))
+
+async def process_image_with_ollama_vision_async(image_path, prompt, model_provider, api_base=None, usage=None, image=None):
+    """
+    Versão assíncrona de process_image_with_ollama_vision (usa o cliente Ollama compartilhado).
+    Se usage for fornecido, acumula as contagens de tokens da chamada. Se image for fornecida
+    (uma parte retornada por prepare_image), ela é enviada no lugar do arquivo.
+    """
+    start = time.perf_counter()
     try:
-        # Definir a URL base padrão se não fornecida
-        if api_base is None:
-            api_base = "http://localhost:11434"
+        # Preparar a imagem (sem divisão em partes: a resposta é o texto de uma única chamada) e codificar em base64
+        if image is None:
+            image = (await asyncio.to_thread(prepare_image, image_path, max_tiles=1))[0]
+        image_data = base64.b64encode(image['data']).decode('utf-8')
+        
+        # Preparar o payload para a API do Ollama
+        payload = {
+            "model": model_provider,
+            "prompt": prompt,
+            "stream": False,
+            "images": [image_data],
+            "keep_alive": OLLAMA_KEEP_ALIVE
+        }
+        
+        # Fazer a requisição para a API do Ollama (com limite de taxa e novas tentativas)
+        async def send():
+            response = await llm_clients.ollama_client(api_base).post("/api/generate", json=payload)
+            if response.status_code in (408, 429) or response.status_code >= 500:
+                response.raise_for_status()
+            result = response.json() if response.status_code == 200 else None
+            reported = result and (result.get('prompt_eval_count') or count_tokens(prompt, model_provider),
+                                   result.get('eval_count') or count_tokens(result.get("response", ""), model_provider))
+            return response, reported or (0, 0)
+        
+        response, reported = await llm_clients.call_with_limits(
+            'ollama', model_provider, count_tokens(prompt, model_provider), send
+        )
+        
+        # Verificar se a requisição foi bem-sucedida
+        if response.status_code == 200:
+            record_llm_call('ollama', model_provider, time.perf_counter() - start, reported[0], reported[1], usage)
+            return response.json().get("response", "")
+        else:
+            logger.error(f"Erro na API do Ollama: {response.status_code} - {response.text}")
+            record_llm_call('ollama', model_provider, time.perf_counter() - start, None, None, usage, ok=False)
+            return f"Erro na API do Ollama: {response.status_code}"
+    
+    except Exception as e:
+        logger.error(f"Erro ao processar imagem com Ollama Vision: {e}")
+        record_llm_call('ollama', model_provider, time.perf_counter() - start, None, None, usage, ok=False)
+        return f"Erro ao processar imagem: {str(e)}"
+
+class LLMResponseCache:
+    """
+    Cache persistente das respostas já interpretadas do LLM.
+    
+    A chave é o hash de (modelo, mensagem de sistema, prompt completo, temperatura, max_tokens
+    e, para modelos de visão, o conteúdo da imagem). As entradas ficam em SQLite, com uma camada
+    LRU em memória para que acertos repetidos não toquem o disco.
+    """
+    
+    def __init__(self, db_path=LLM_CACHE_DB, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 memory_entries=LLM_CACHE_MEMORY_ENTRIES, ttl=LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # chave -> (json, created_at)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)")
+        self._db.commit()
+    
+    @staticmethod
+    def make_key(model, system_message, prompt, temperature, max_tokens, image_digest=None):
+        """
+        Calcula a chave de cache de uma chamada ao LLM.
+        
+        Returns:
+            str: Hash SHA-256 dos parâmetros que determinam a resposta
+        """
+        payload = json.dumps(
+            [model, system_message, prompt, temperature, max_tokens, image_digest],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        """
+        Args:
+            key (str): Chave calculada por make_key()
+            
+        Returns:
+            list: Cópia da resposta interpretada ou None se não estiver em cache
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[0])
+            
+            row = self._db.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                self.misses += 1
+                return None
+            
+            self._db.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember_locked(key, row[0], row[1])
+            self.hits += 1
+            return json.loads(row[0])
+    
+    def put(self, key, model, response):
+        """
+        Armazena uma resposta interpretada.
+        
+        Args:
+            key (str): Chave calculada por make_key()
+            model (str): Nome do modelo (informativo)
+            response (list): Lista de dicionários retornada pelo LLM
+        """
+        now = time.time()
+        serialized = json.dumps(response, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, serialized, now, now)
+            )
+            count = self._db.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._db.execute(
+                    "DELETE FROM llm_responses WHERE key IN "
+                    "(SELECT key FROM llm_responses ORDER BY last_access LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+            self._db.commit()
+            self._remember_locked(key, serialized, now)
+    
+    def stats(self):
+        """Returns: dict: Contadores de acertos, falhas, remoções e tamanho do cache."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'memory_entries': len(self._memory)
+            }
+    
+    def _remember_locked(self, key, serialized, created_at):
+        """Guarda a entrada na camada em memória, descartando a menos usada (chamar com o lock)."""
+        self._memory[key] = (serialized, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+# Cache global de respostas do LLM
+llm_response_cache = LLMResponseCache()
+
+@functools.lru_cache(maxsize=None)
+def _get_token_encoding(model_name):
+    """Obtém (e memoriza) o codificador tiktoken do modelo, com fallback para o200k_base."""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text, model_name="gpt-4o-mini"):
+    """
+    Conta os tokens de um texto.
+    
+    Args:
+        text (str): Texto a ser contado
+        model_name (str): Modelo usado para escolher o codificador
+        
+    Returns:
+        int: Número de tokens (estimado por caracteres se tiktoken não estiver instalado)
+    """
+    if not text:
+        return 0
+    if tiktoken is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(_get_token_encoding(model_name).encode(text, disallowed_special=()))
+
+def split_text_into_chunks(text, max_tokens, model_name="gpt-4o-mini"):
+    """
+    Divide o texto em partes de no máximo max_tokens, respeitando fronteiras estruturais:
+    parágrafos primeiro, depois linhas, frases e, por fim, palavras.
+    
+    Args:
+        text (str): Texto limpo da página
+        max_tokens (int): Tamanho máximo de cada parte em tokens
+        model_name (str): Modelo usado para a contagem de tokens
         
-        # Remover o prefixo "http://" ou "https://" para o endpoint
-        api_endpoint = api_base.replace("http://", "").replace("https://", "")
+    Returns:
+        list: Partes do texto, na ordem original
+    """
+    max_tokens = max(1, max_tokens)
+    separators = ['\n\n', '\n', '. ', ' ']
+    separator_tokens = {separator: count_tokens(separator, model_name) for separator in separators}
+    
+    # Cada trecho é contado uma única vez; o tamanho de uma parte é a soma dos seus trechos
+    def split(segment, separators, segment_tokens):
+        if segment_tokens <= max_tokens:
+            return [segment]
+        if not separators:
+            # Sem fronteira disponível: cortar pelo tamanho proporcional em caracteres
+            size = max(1, len(segment) * max_tokens // segment_tokens)
+            return [segment[i:i + size] for i in range(0, len(segment), size)]
         
-        # Ler a imagem e codificar em base64
-        with open(image_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
+        separator, rest = separators[0], separators[1:]
+        chunks = []
+        current, current_tokens = [], 0
+        for piece in segment.split(separator):
+            piece_tokens = count_tokens(piece, model_name)
+            if current and current_tokens + separator_tokens[separator] + piece_tokens <= max_tokens:
+                current.append(piece)
+                current_tokens += separator_tokens[separator] + piece_tokens
+                continue
+            if current:
+                chunks.append(separator.join(current))
+            if piece_tokens <= max_tokens:
+                current, current_tokens = [piece], piece_tokens
+            else:
+                chunks.extend(split(piece, rest, piece_tokens))
+                current, current_tokens = [], 0
+        if current:
+            chunks.append(separator.join(current))
+        return [chunk for chunk in chunks if chunk]
+    
+    return split(text, separators, count_tokens(text, model_name))
+
+def build_extraction_schema(fields, keys=('items',)):
+    """
+    Monta o JSON schema da resposta de extração: {"items": [{campo: texto, ...}, ...]}.
+    A raiz é um objeto porque a OpenAI não aceita um array como raiz do schema.
+    
+    Args:
+        fields (list): Campos a extrair (incluindo 'Resumo', se adicionado)
+        keys (tuple): Chaves da raiz, cada uma com um array de itens (ex.: os IDs das páginas
+            de uma chamada agrupada)
         
-        # Preparar o payload para a API do Ollama
-        payload = {
-            "model": model_provider,
-            "prompt": prompt,
-            "stream": False,
-            "images": [image_data]
+    Returns:
+        dict: JSON schema
+    """
+    items_schema = {
+        'type': 'array',
+        'items': {
+            'type': 'object',
+            'properties': {field: {'type': 'string'} for field in fields},
+            'required': list(fields),
+            'additionalProperties': False
         }
+    }
+    return {
+        'type': 'object',
+        'properties': {key: items_schema for key in keys},
+        'required': list(keys),
+        'additionalProperties': False
+    }
+
+class IncrementalJSONArrayParser:
+    """
+    Parser incremental do array de objetos retornado pelo LLM (bruto ou dentro de {"items": [...]}).
+    
+    Cada chamada a feed() acrescenta texto e devolve os objetos que ficaram completos; um array
+    truncado (resposta cortada por max_tokens, JSON malformado no final) mantém os itens já fechados.
+    """
+    
+    def __init__(self):
+        self.items = []
+        self.closed = False  # True quando o ']' final do array foi lido
+        self._buffer = ''
+        self._pos = None     # Posição do próximo item no buffer (após o '[')
+        self._decoder = json.JSONDecoder()
+    
+    def feed(self, chunk):
+        """
+        Args:
+            chunk (str): Próximo trecho da resposta
+            
+        Returns:
+            list: Objetos completados por este trecho
+        """
+        self._buffer += chunk
+        if self._pos is None:
+            start = self._buffer.find('[')
+            if start < 0:
+                return []
+            self._pos = start + 1
         
-        # Fazer a requisição para a API do Ollama
-        response = requests.post(
-            f"{api_base}/api/generate",
-            json=payload,
-            headers={"Content-Type": "application/json"}
-        )
+        new_items = []
+        pos = self._pos
+        while not self.closed:
+            while pos < len(self._buffer) and self._buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(self._buffer):
+                break
+            if self._buffer[pos] == ']':
+                self.closed = True
+                pos += 1
+                break
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                break  # Item ainda incompleto
+            if isinstance(value, dict):
+                new_items.append(value)
+            pos = end
+        self._pos = pos
+        self.items.extend(new_items)
+        return new_items
+
+def make_row_streamer(on_row, fields_to_extract):
+    """
+    Cria o callback on_delta de LLMClientManager.chat que repassa a on_row cada item da resposta
+    assim que o seu objeto JSON fica completo, com os campos ausentes preenchidos.
+    
+    Uma nova tentativa da chamada (on_delta(None)) reinicia o parser, mas os itens já repassados
+    não são repetidos.
+    
+    Args:
+        on_row (callable): Recebe cada item (dict) completado
+        fields_to_extract (list): Campos esperados em cada item
         
-        # Verificar se a requisição foi bem-sucedida
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("response", "")
-        else:
-            logger.error(f"Erro na API do Ollama: {response.status_code} - {response.text}")
-            return f"Erro na API do Ollama: {response.status_code}"
+    Returns:
+        callable: Callback on_delta
+    """
+    state = {'parser': IncrementalJSONArrayParser(), 'emitted': 0}
     
-    except Exception as e:
-        logger.error(f"Erro ao processar imagem com Ollama Vision: {e}")
-        return f"Erro ao processar imagem: {str(e)}"
+    def on_delta(delta):
+        if delta is None:
+            state['parser'] = IncrementalJSONArrayParser()
+            return
+        parser = state['parser']
+        parser.feed(delta)
+        while state['emitted'] < len(parser.items):
+            item = dict(parser.items[state['emitted']])
+            state['emitted'] += 1
+            for field in fields_to_extract:
+                item.setdefault(field, "Não disponível")
+            try:
+                on_row(item)
+            except Exception as e:
+                logger.warning(f"Erro ao publicar item parcial: {e}")
+    
+    return on_delta
+
+def _normalize_llm_items(value):
+    """Converte um valor JSON da resposta em lista de itens ({"items": [...]}, objeto único ou array)."""
+    if isinstance(value, dict) and isinstance(value.get('items'), list):
+        value = value['items']
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    return None
 
-def extract_fields_with_llm(text, fields, model_provider="openai", api_base=None, image_path=None):
+def parse_llm_json(text):
     """
-    Extrai campos específicos do texto ou imagem usando um modelo LLM.
-    Adiciona um campo 'Resumo' automaticamente se 'Descrição' ou similar for solicitado.
+    Interpreta a resposta do LLM como uma lista de objetos, tolerando texto em volta do JSON,
+    blocos de código markdown, a raiz {"items": [...]} da saída estruturada e arrays truncados.
     
     Args:
-        text (str): Texto processado da página web ou None se usando imagem
-        fields (list): Lista de campos a serem extraídos
-        model_provider (str): Provedor do modelo LLM ("openai", "openai-vision" ou "ollama")
-        api_base (str): URL base da API do modelo LLM (opcional)
-        image_path (str): Caminho para a imagem a ser processada (opcional)
+        text (str): Resposta do modelo
         
     Returns:
-        list: Lista de dicionários com os campos extraídos para cada resultado encontrado
+        tuple: (itens, completo) onde itens é uma lista de dicionários (None se nada pôde ser
+               aproveitado) e completo indica se o JSON estava íntegro
     """
-    import json
-    import re
+    text = (text or '').strip()
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+    normalize = _normalize_llm_items
     
-    # Verificar se um campo de descrição foi solicitado
-    description_field = None
+    # JSON íntegro: a resposta inteira
+    try:
+        return normalize(json.loads(text)), True
+    except ValueError:
+        pass
+    
+    # Array com texto em volta, truncado ou malformado: aproveitar os objetos completos do array;
+    # só está completo se o ']' final foi lido
+    array_start = text.find('[')
+    if array_start >= 0:
+        parser = IncrementalJSONArrayParser()
+        parser.feed(text)
+        if parser.items or (parser.closed and '{' not in text[:array_start]):
+            return parser.items, parser.closed
+    
+    # Objeto único dentro do texto; se houver um '[' antes dele, o objeto pode ser só o início
+    # de um array cortado e não é considerado completo
+    object_start = text.find('{')
+    if object_start >= 0:
+        try:
+            items = normalize(json.JSONDecoder().raw_decode(text, object_start)[0])
+        except ValueError:
+            items = None
+        if items is not None:
+            return items, not 0 <= array_start < object_start
+    
+    # Último recurso: pares "campo": "valor" completos de um objeto cortado
+    pairs = re.findall(r'"([^"\\\n]+)"\s*:\s*"((?:[^"\\]|\\.)*)"', text)
+    if pairs:
+        item = {}
+        for key, value in pairs:
+            try:
+                item.setdefault(key, json.loads(f'"{value}"'))
+            except ValueError:
+                item.setdefault(key, value)
+        return [item], False
+    return None, False
+
+def _is_error_row(item):
+    """Indica se a linha foi gerada por uma falha de chamada ou de interpretação (todos os valores 'Erro...')."""
+    values = [str(value) for value in item.values()]
+    return bool(values) and all(value.startswith('Erro') for value in values)
+
+def merge_extraction_results(partial_results, fields):
+    """
+    Junta os arrays JSON extraídos de cada parte de uma página.
+    
+    Se cada parte retornou no máximo um item (página de um único produto dividida em partes),
+    os itens são combinados campo a campo, mantendo o primeiro valor disponível. Caso contrário
+    (páginas de listagem), os itens são concatenados na ordem das partes, duplicados são removidos e
+    apenas os EXTRACTION_MAX_ITEMS primeiros são mantidos, como pede o prompt de cada parte.
+    
+    Args:
+        partial_results (list): Lista de listas de dicionários, uma por parte
+        fields (list): Campos extraídos
+        
+    Returns:
+        list: Lista de dicionários consolidada
+    """
+    unavailable = "Não disponível"
+    successful = [[item for item in items if not _is_error_row(item)] for items in partial_results]
+    if not any(successful):
+        # Todas as partes falharam: manter o erro da primeira parte
+        return partial_results[0] if partial_results else [{field: "Erro na extração" for field in fields}]
+    
+    # Descartar itens sem nenhum valor disponível
+    useful = [
+        [item for item in items if any(item.get(field, unavailable) != unavailable for field in fields)]
+        for items in successful
+    ]
+    
+    if all(len(items) <= 1 for items in useful):
+        merged_item = {field: unavailable for field in fields}
+        for items in useful:
+            for item in items:
+                for key, value in item.items():
+                    if merged_item.get(key, unavailable) == unavailable:
+                        merged_item[key] = value
+        return [merged_item]
+    
+    merged = []
+    seen = set()
+    for items in useful:
+        for item in items:
+            signature = tuple(re.sub(r'\s+', ' ', str(item.get(field, ''))).strip().lower() for field in fields)
+            if signature not in seen:
+                seen.add(signature)
+                merged.append(item)
+    return merged[:EXTRACTION_MAX_ITEMS]
+
+def find_description_field(fields):
+    """
+    Retorna o campo de descrição solicitado (que gera o campo 'Resumo' automático) ou None.
+    
+    Args:
+        fields (list): Campos solicitados
+        
+    Returns:
+        str: Nome original do campo de descrição, ou None
+    """
     fields_lower = [f.lower() for f in fields]
     description_keywords = ['descrição', 'descricao', 'description', 'detalhes', 'details']
     for keyword in description_keywords:
         if keyword in fields_lower:
             # Encontrar o nome original do campo
-            original_index = fields_lower.index(keyword)
-            description_field = fields[original_index]
-            break
+            return fields[fields_lower.index(keyword)]
+    return None
+
+def build_extraction_prompt(fields, uses_image=False):
+    """
+    Monta as instruções de extração (sem o texto da página): o prefixo fixo de
+    EXTRACTION_PROMPT_PREFIXES seguido dos campos e das instruções do resumo.
+    Adiciona o campo 'Resumo' automaticamente se 'Descrição' ou similar for solicitado.
+    
+    Args:
+        fields (list): Lista de campos a serem extraídos
+        uses_image (bool): Se True, as instruções se referem a uma imagem em vez de um texto
+        
+    Returns:
+        tuple: (campos_a_extrair, prompt_base)
+    """
+    # Verificar se um campo de descrição foi solicitado
+    description_field = find_description_field(fields)
     
     # Adicionar campo Resumo se Descrição foi solicitada
     fields_to_extract = list(fields) # Criar cópia para não modificar a original
@@ -262,73 +3087,247 @@ def extract_fields_with_llm(text, fields, model_provider="openai", api_base=None
         add_summary_instruction = True
         logger.info("Campo de descrição encontrado. Adicionando campo 'Resumo' à extração.")
     
-    # Verificar se estamos usando um modelo de visão com uma imagem
-    is_vision_model = model_provider == "openai-vision" or is_ollama_vision_model(model_provider)
+    # Construir o prompt: instruções fixas primeiro, partes variáveis por último
+    prompt_base = extraction_prompt_prefix('image' if uses_image else 'text')
+    prompt_base += f"\n\nCampos solicitados: {', '.join(fields_to_extract)}"
     
-    # Construir o prompt para o LLM
-    prompt_base = f"""
-    ###Analise {'esta imagem' if is_vision_model and image_path else 'o texto abaixo'} e extraia TODAS as ocorrências das seguintes informações: 
-    Analise {'esta imagem' if is_vision_model and image_path else 'o texto abaixo'} e extraia as 5 PRIMEIRAS ocorrências das seguintes informações:
-    {', '.join(fields_to_extract)}
-    
-    Se houver múltiplos itens ou produtos, extraia as informações para CADA UM DELES.
-    
-    Responda APENAS com um array JSON válido onde cada elemento é um objeto com as chaves correspondentes aos campos solicitados.
-    Exemplo de formato esperado:
-    [
-      {{
-        "{fields_to_extract[0]}": "valor1 para item1",
-        "{fields_to_extract[1]}": "valor2 para item1",			##Usado na versao vision_select
-        ...
-      }},
-      {{
-        "{fields_to_extract[0]}": "valor1 para item2",
-        "{fields_to_extract[1]}": "valor2 para item2",			##Usado na versao vision_select
-        ...
-      }},
-      ...
-    ]
+    # Adicionar instrução para gerar resumo se necessário
+    if add_summary_instruction:
+        prompt_base += summary_instructions(description_field)
     
-    Se alguma informação não estiver disponível para um item específico, use "Não disponível" como valor.
-    Se não encontrar nenhum item, retorne um array com um único objeto contendo os campos solicitados.
+    return fields_to_extract, prompt_base
+
+def extraction_prompt_prefix(kind):
+    """
+    Args:
+        kind (str): 'text', 'image' ou 'pages' (chamada agrupada)
+        
+    Returns:
+        str: Instruções fixas do tipo de extração, na versão EXTRACTION_PROMPT_VERSION
+    """
+    return EXTRACTION_PROMPT_PREFIXES[kind].format(version=EXTRACTION_PROMPT_VERSION)
+
+def summary_instructions(description_field):
+    """Instruções do campo 'Resumo' gerado a partir do campo de descrição."""
+    return (f"\n\nIMPORTANTE: Retorne TODAS as informações contidas no campo '{description_field}', não trunque ou modifique de forma alguma estas informações."
+            f"\n\nIMPORTANTE: Para o campo 'Resumo', gere um resumo conciso do campo '{description_field}' com no máximo 30 palavras.")
+
+def build_packed_extraction_prompt(fields, page_ids, texts):
     """
+    Monta o prompt de uma chamada agrupada: várias páginas curtas delimitadas por seus IDs,
+    com a resposta esperada em um objeto JSON indexado pelo ID de cada página.
     
-    # Adicionar instrução para gerar resumo se necessário
-    if add_summary_instruction:
-        prompt_base += f"\n\nIMPORTANTE: Retorne TODAS as informações contidas no campo '{description_field}', não trunque ou modifique de forma alguma estas informações."
+    Args:
+        fields (list): Lista de campos a serem extraídos
+        page_ids (list): IDs das páginas no prompt
+        texts (list): Texto de cada página, na ordem de page_ids
+        
+    Returns:
+        tuple: (campos_a_extrair, prompt)
+    """
+    description_field = find_description_field(fields)
+    fields_to_extract = list(fields)
+    if description_field and 'Resumo' not in fields_to_extract:
+        fields_to_extract.append('Resumo')
+    
+    prompt = extraction_prompt_prefix('pages')
+    prompt += f"\n\nCampos solicitados: {', '.join(fields_to_extract)}"
+    if description_field and 'Resumo' not in fields:
+        prompt += summary_instructions(description_field)
+    prompt += f"\n\nIDs das páginas: {', '.join(page_ids)}"
+    
+    for page_id, text in zip(page_ids, texts):
+        prompt += f"\n\n=== PÁGINA {page_id} ===\n{text}\n=== FIM DA PÁGINA {page_id} ==="
+    return fields_to_extract, prompt
 
-    if add_summary_instruction:
-        prompt_base += f"\n\nIMPORTANTE: Para o campo 'Resumo', gere um resumo conciso do campo '{description_field}' com no máximo 30 palavras."
+def parse_packed_llm_json(text, page_ids):
+    """
+    Separa a resposta de uma chamada agrupada nos itens de cada página. Com JSON truncado,
+    aproveita os objetos completos de cada página (ver IncrementalJSONArrayParser).
+    
+    Args:
+        text (str): Resposta do modelo
+        page_ids (list): IDs das páginas enviadas
+        
+    Returns:
+        dict: ID da página -> (itens, completo); páginas ausentes da resposta não aparecem
+    """
+    text = (text or '').strip()
+    text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+    
+    data = None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        start = text.find('{')
+        if start >= 0:
+            try:
+                data = json.JSONDecoder().raw_decode(text, start)[0]
+            except ValueError:
+                pass
+    
+    results = {}
+    if isinstance(data, dict):
+        for page_id in page_ids:
+            items = _normalize_llm_items(data.get(page_id))
+            if items:
+                results[page_id] = (items, True)
+        return results
+    
+    # JSON incompleto: ler o array de cada página a partir da sua chave
+    for page_id in page_ids:
+        match = re.search(r'"%s"\s*:\s*(?=\[)' % re.escape(page_id), text)
+        if match:
+            parser = IncrementalJSONArrayParser()
+            parser.feed(text[match.end():])
+            if parser.items:
+                results[page_id] = (parser.items, parser.closed)
+    return results
+
+def llm_call_params(model_provider, uses_image=False):
+    """
+    Parâmetros da chamada de extração para o provedor (também compõem a chave do cache de respostas).
+    
+    Args:
+        model_provider (str): Provedor do modelo LLM
+        uses_image (bool): Se a chamada envia uma imagem
+        
+    Returns:
+        tuple: (is_openai, nome_do_modelo, mensagem_de_sistema, temperatura, max_tokens)
+    """
+    is_openai = model_provider.lower() in ["openai", "openai-vision"]
+    model_name = ("gpt-4o" if uses_image else "gpt-4o-mini") if is_openai else model_provider
+    system_message = SYSTEM_MESSAGE_VISION if uses_image else SYSTEM_MESSAGE_TEXT
+    temperature = 0.1 if is_openai else 0.0
+    max_tokens = 2000
+    return is_openai, model_name, system_message, temperature, max_tokens
+
+def extract_fields_with_llm(text, fields, model_provider="openai", api_base=None, image_path=None, cache_policy='use', usage=None,
+                            image_bytes=None, on_row=None):
+    """
+    Extrai campos específicos do texto ou imagem usando um modelo LLM.
+    Adiciona um campo 'Resumo' automaticamente se 'Descrição' ou similar for solicitado.
+    
+    Args:
+        text (str): Texto processado da página web ou None se usando imagem
+        fields (list): Lista de campos a serem extraídos
+        model_provider (str): Provedor do modelo LLM ("openai", "openai-vision" ou "ollama")
+        api_base (str): URL base da API do modelo LLM (opcional)
+        image_path (str): Caminho para a imagem a ser processada (opcional)
+        cache_policy (str): Política do cache de respostas ('use', 'refresh' ou 'bypass')
+        usage (dict): Se fornecido, acumula chamadas, acertos de cache e tokens de prompt/resposta
+        image_bytes (bytes): Conteúdo da imagem em memória, no lugar de image_path (opcional)
+        on_row (callable): Se fornecido (e LLM_STREAMING_ENABLED), a resposta é recebida em streaming e
+            cada item é repassado a on_row assim que fica completo, antes do resultado final (opcional)
+        
+    Returns:
+        list: Lista de dicionários com os campos extraídos para cada resultado encontrado
+    """
+    return llm_clients.run(extract_fields_with_llm_async(text, fields, model_provider, api_base, image_path, cache_policy,
+                                                         usage=usage, image_bytes=image_bytes, on_row=on_row))
+
+async def extract_fields_with_llm_async(text, fields, model_provider="openai", api_base=None, image_path=None, cache_policy='use',
+                                       token_budget=LLM_PROMPT_TOKEN_BUDGET, usage=None, image=None, image_bytes=None,
+                                       on_row=None):
+    """
+    Versão assíncrona de extract_fields_with_llm, executada no loop da camada de clientes LLM.
+    Permite disparar várias extrações concorrentes (ex.: com asyncio.gather) sem uma thread por chamada.
+    
+    Textos que excedem token_budget são divididos em partes extraídas em paralelo e consolidadas
+    por merge_extraction_results (token_budget=None ou 0 desativa a divisão). Da mesma forma, a imagem
+    é preparada por prepare_image e capturas altas são extraídas por partes (image recebe cada parte).
+    A imagem pode vir de um arquivo (image_path) ou da memória (image_bytes, ex.: captura de tela).
+    
+    Com on_row, os itens de cada parte são repassados à medida que o modelo os completa; eles são
+    preliminares, e o valor de retorno (consolidado) é o resultado definitivo.
+    """
+    # Verificar se estamos usando um modelo de visão com uma imagem
+    uses_image = bool(is_vision_model(model_provider) and (image_path or image_bytes or image))
+    
+    # Construir o prompt para o LLM
+    fields_to_extract, prompt_base = build_extraction_prompt(fields, uses_image)
     
     # Adicionar texto se não for modelo de visão
-    if not (is_vision_model and image_path):
+    if not uses_image:
         prompt = prompt_base + f"\n\nTexto:\n{text}"
     else:
         prompt = prompt_base
     
+    # Parâmetros da chamada (também compõem a chave do cache de respostas)
+    is_openai, model_name, system_message, temperature, max_tokens = llm_call_params(model_provider, uses_image)
+    # Saída estruturada: JSON schema montado a partir dos campos solicitados
+    response_schema = build_extraction_schema(fields_to_extract) if LLM_STRUCTURED_OUTPUT else None
+    
+    # Dividir textos longos em partes que caibam no orçamento de tokens e extrair cada parte em paralelo
+    if text and not uses_image and token_budget:
+        text_budget = token_budget - count_tokens(prompt_base, model_name) - count_tokens(system_message, model_name)
+        if text_budget < LLM_MIN_CHUNK_TOKENS:
+            logger.warning(f"Orçamento de {token_budget} tokens deixa só {text_budget} para o texto; texto enviado sem divisão")
+            chunks = [text]
+        else:
+            # A contagem de tokens de páginas grandes não deve ocupar o loop compartilhado dos clientes LLM
+            chunks = await asyncio.to_thread(split_text_into_chunks, text, text_budget, model_name)
+        if len(chunks) > 1:
+            logger.info(f"Texto dividido em {len(chunks)} partes (orçamento de {token_budget} tokens por prompt)")
+            semaphore = asyncio.Semaphore(LLM_CHUNK_CONCURRENCY)
+            
+            async def extract_chunk(chunk):
+                async with semaphore:
+                    return await extract_fields_with_llm_async(
+                        chunk, fields, model_provider, api_base, None, cache_policy, token_budget=None, usage=usage,
+                        on_row=on_row
+                    )
+            
+            partial_results = await asyncio.gather(*[extract_chunk(chunk) for chunk in chunks])
+            return merge_extraction_results(partial_results, fields_to_extract)
+    
+    # Reduzir e recodificar a imagem; capturas altas são divididas em partes extraídas em paralelo
+    if uses_image and image is None:
+        tiles = await asyncio.to_thread(prepare_image, image_bytes if image_bytes is not None else image_path)
+        if len(tiles) > 1:
+            logger.info(f"Imagem dividida em {len(tiles)} partes sobrepostas")
+            semaphore = asyncio.Semaphore(LLM_CHUNK_CONCURRENCY)
+            
+            async def extract_tile(tile):
+                async with semaphore:
+                    return await extract_fields_with_llm_async(
+                        None, fields, model_provider, api_base, image_path, cache_policy, token_budget=None, usage=usage,
+                        image=tile, on_row=on_row
+                    )
+            
+            partial_results = await asyncio.gather(*[extract_tile(tile) for tile in tiles])
+            return merge_extraction_results(partial_results, fields_to_extract)
+        image = tiles[0]
+    
+    # Consultar o cache de respostas
+    cache_key = None
+    if LLM_CACHE_ENABLED and cache_policy != 'bypass':
+        image_digest = hashlib.sha256(image['data']).hexdigest() if uses_image else None
+        cache_key = llm_response_cache.make_key(model_name, system_message, prompt, temperature, max_tokens, image_digest)
+        if cache_policy == 'use':
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Resposta do LLM obtida do cache ({model_name})")
+                if usage is not None:
+                    usage['cache_hits'] = usage.get('cache_hits', 0) + 1
+                return cached
+    
+    # Streaming: cada objeto completo do array é repassado a on_row enquanto a resposta chega
+    on_delta = make_row_streamer(on_row, fields_to_extract) if on_row and LLM_STREAMING_ENABLED else None
+    
     try:
         # Usar OpenAI (GPT-4o Mini ou GPT-4o Vision)
-        if model_provider.lower() in ["openai", "openai-vision"]:
-            ###import os
-            ###from openai import OpenAI
-            from openai import Client
-            
-            # Usar a chave de API da variável de ambiente
-            ###client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY")
-            client = Client(api_key=os.environ.get("OPENAI_API_KEY")
-            )
-            
+        if is_openai:
             # Preparar as mensagens
-            if is_vision_model and image_path:
-                # Ler a imagem e codificar em base64
-                with open(image_path, "rb") as image_file:
-                    image_data = base64.b64encode(image_file.read()).decode('utf-8')
+            if uses_image:
+                # Codificar a imagem preparada em base64
+                image_data = base64.b64encode(image['data']).decode('utf-8')
                 
                 # Criar mensagem com conteúdo de imagem
                 messages = [
                     {
                         "role": "system", 
-                        "content": "Você é um assistente especializado em extrair informações estruturadas de imagens de páginas web."
+                        "content": system_message
                     },
                     {
                         "role": "user",
@@ -337,167 +3336,631 @@ def extract_fields_with_llm(text, fields, model_provider="openai", api_base=None
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_data}"
+                                    "url": f"data:{image['mime']};base64,{image_data}"
                                 }
                             }
                         ]
                     }
                 ]
-                
-                # Chamar a API da OpenAI com o modelo GPT-4o Vision
-                response = client.chat.completions.create(
-                    model="gpt-4o",  # Modelo com capacidade de visão
-                    messages=messages,
-                    temperature=0.1,
-                    max_tokens=2000
-                )
             else:
                 # Mensagens para modelo de texto
                 messages = [
                     {
                         "role": "system", 
-                        "content": "Você é um assistente especializado em extrair informações estruturadas de textos."
+                        "content": system_message
                     },
                     {
                         "role": "user", 
                         "content": prompt
                     }
                 ]
-                
-                # Chamar a API da OpenAI com o modelo GPT-4o Mini
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=messages,
-                    temperature=0.1,
-                    max_tokens=2000
+            
+            # Chamar a API da OpenAI (GPT-4o Vision ou GPT-4o Mini) pelo cliente compartilhado
+            result = await llm_clients.chat('openai', model_name, messages, temperature, max_tokens,
+                                           usage=usage, response_schema=response_schema,
+                                           prompt_cache_key=f"extracao-v{EXTRACTION_PROMPT_VERSION}",
+                                           on_delta=on_delta)
+        
+        # Usar Ollama
+        else:
+            # Verificar se o modelo Ollama tem capacidade de visão e se temos uma imagem
+            if uses_image:
+                # Usar a função específica para processar imagens com Ollama Vision
+                result = await process_image_with_ollama_vision_async(
+                    image_path=image_path,
+                    prompt=prompt,
+                    model_provider=model_provider,
+                    api_base=api_base,
+                    usage=usage,
+                    image=image
                 )
+            else:
+                # Usar Ollama para processamento de texto
+                try:
+                    # Preparar as mensagens
+                    messages = [
+                        {
+                            "role": "system", 
+                            "content": system_message
+                        },
+                        {
+                            "role": "user", 
+                            "content": prompt
+                        }
+                    ]
+                    
+                    # Chamar a API de chat do Ollama pelo cliente compartilhado
+                    result = await llm_clients.chat('ollama', model_name, messages, temperature, max_tokens, api_base,
+                                                   usage=usage, response_schema=response_schema, on_delta=on_delta)
+                
+                except Exception as e:
+                    logger.error(f"Erro ao usar Ollama: {e}")
+                    return [{field: f"Erro na API Ollama: {str(e)}" for field in fields_to_extract}]
+        
+        # Interpretar o JSON da resposta, aproveitando itens completos de respostas truncadas
+        extracted_data_list, complete = parse_llm_json(result)
+        if extracted_data_list is None:
+            logger.error(f"Erro ao decodificar JSON da resposta do LLM: {result}")
+            # Criar uma lista com um único dicionário com valores padrão
+            return [{field: "Erro na extração" for field in fields_to_extract}]
+        if not complete:
+            logger.warning(f"Resposta do LLM com JSON incompleto; {len(extracted_data_list)} itens aproveitados")
+        
+        # Verificar se todos os campos solicitados estão presentes em cada item
+        for item in extracted_data_list:
+            for field in fields_to_extract:
+                if field not in item:
+                    item[field] = "Não disponível"
+        
+        # Armazenar a resposta interpretada no cache (respostas incompletas não são guardadas)
+        if cache_key is not None and complete:
+            llm_response_cache.put(cache_key, model_name, extracted_data_list)
+        
+        return extracted_data_list
+    
+    except Exception as e:
+        logger.error(f"Erro ao chamar a API do LLM: {e}")
+        return [{field: "Erro na API" for field in fields_to_extract}]
+
+async def extract_packed_pages_async(texts, fields, model_provider="openai", api_base=None, cache_policy='use', usages=None):
+    """
+    Extrai os campos de várias páginas curtas em uma única chamada ao LLM.
+    
+    As respostas são guardadas no cache com a mesma chave de uma extração individual da página.
+    Páginas ausentes da resposta (ou sozinhas no grupo) seguem por extract_fields_with_llm_async.
+    
+    Args:
+        texts (list): Texto de cada página
+        fields (list): Lista de campos a serem extraídos
+        model_provider (str): Provedor do modelo LLM
+        api_base (str): URL base da API do modelo LLM (opcional)
+        cache_policy (str): Política do cache de respostas ('use', 'refresh' ou 'bypass')
+        usages (list): Contadores de uso de cada página (opcional)
+        
+    Returns:
+        list: Resultado de cada página, na ordem de texts
+    """
+    usages = usages or [None] * len(texts)
+    _, prompt_base = build_extraction_prompt(fields)
+    is_openai, model_name, system_message, temperature, max_tokens = llm_call_params(model_provider)
+    results = [None] * len(texts)
+    
+    # Consultar o cache de cada página
+    cache_keys = [None] * len(texts)
+    if LLM_CACHE_ENABLED and cache_policy != 'bypass':
+        for index, text in enumerate(texts):
+            cache_keys[index] = llm_response_cache.make_key(model_name, system_message, prompt_base + f"\n\nTexto:\n{text}",
+                                                            temperature, max_tokens, None)
+            if cache_policy == 'use':
+                results[index] = llm_response_cache.get(cache_keys[index])
+                if results[index] is not None and usages[index] is not None:
+                    usages[index]['cache_hits'] = usages[index].get('cache_hits', 0) + 1
+    
+    pending = [index for index, result in enumerate(results) if result is None]
+    if len(pending) > 1:
+        page_ids = [f"p{number + 1}" for number in range(len(pending))]
+        fields_to_extract, prompt = build_packed_extraction_prompt(fields, page_ids, [texts[index] for index in pending])
+        response_schema = build_extraction_schema(fields_to_extract, page_ids) if LLM_STRUCTURED_OUTPUT else None
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+        pack_usage = {}
+        try:
+            content = await llm_clients.chat('openai' if is_openai else 'ollama', model_name, messages, temperature,
+                                             min(max_tokens * len(pending), LLM_PACK_MAX_OUTPUT_TOKENS), api_base,
+                                             usage=pack_usage, response_schema=response_schema,
+                                             prompt_cache_key=f"extracao-agrupada-v{EXTRACTION_PROMPT_VERSION}")
+        except Exception as e:
+            logger.error(f"Erro ao chamar a API do LLM: {e}")
+            content = None
+            for index in pending:
+                results[index] = [{field: "Erro na API" for field in fields_to_extract}]
+        
+        # Dividir os tokens da chamada entre as páginas do grupo
+        for number, index in enumerate(pending):
+            usage = usages[index]
+            if usage is None:
+                continue
+            usage['calls'] = usage.get('calls', 0) + 1
+            usage['packed_pages'] = len(pending)
+            for counter in ('prompt_tokens', 'completion_tokens', 'cached_tokens', 'errors'):
+                total = pack_usage.get(counter, 0)
+                share = total // len(pending) + (1 if number < total % len(pending) else 0)
+                if share:
+                    usage[counter] = usage.get(counter, 0) + share
+        
+        if content is not None:
+            parsed = parse_packed_llm_json(content, page_ids)
+            for page_id, index in zip(page_ids, pending):
+                if page_id not in parsed:
+                    continue
+                items, complete = parsed[page_id]
+                for item in items:
+                    for field in fields_to_extract:
+                        if field not in item:
+                            item[field] = "Não disponível"
+                results[index] = items
+                if cache_keys[index] is not None and complete:
+                    llm_response_cache.put(cache_keys[index], model_name, items)
+            
+            logger.info(f"{len(parsed)} de {len(pending)} páginas extraídas em uma única chamada ao LLM ({model_name})")
+            if len(parsed) < len(pending):
+                logger.warning(f"{len(pending) - len(parsed)} páginas ausentes da resposta agrupada; extraindo individualmente")
+    
+    # Páginas sem resultado seguem pela extração individual
+    missing = [index for index, result in enumerate(results) if result is None]
+    individual = await asyncio.gather(*[
+        extract_fields_with_llm_async(texts[index], fields, model_provider, api_base, None, cache_policy, usage=usages[index])
+        for index in missing
+    ])
+    for index, result in zip(missing, individual):
+        results[index] = result
+    return results
+
+class LLMPagePacker:
+    """
+    Agrupa as extrações de páginas curtas de um job em lote em chamadas únicas ao LLM.
+    
+    Cada thread do job chama extract() e aguarda o resultado da sua página. Páginas com os mesmos
+    campos e modelo são acumuladas até max_pages páginas, token_budget tokens de texto ou max_wait
+    segundos desde a primeira página do grupo; então extract_packed_pages_async extrai todas de uma vez.
+    """
+    
+    def __init__(self, max_pages=LLM_PACK_MAX_PAGES, token_budget=LLM_PACK_TOKEN_BUDGET, max_wait=LLM_PACK_MAX_WAIT,
+                 max_page_tokens=LLM_PACK_MAX_PAGE_TOKENS):
+        self.max_pages = max_pages
+        self.token_budget = token_budget
+        self.max_wait = max_wait
+        self.max_page_tokens = max_page_tokens
+        self._lock = threading.Lock()
+        self._groups = {}  # (modelo, api_base, campos, política de cache) -> grupo aguardando envio
+    
+    def extract(self, text, fields, model_provider, api_base=None, cache_policy='use', usage=None):
+        """
+        Extrai os campos de uma página, agrupada com outras páginas curtas.
+        
+        Args:
+            text (str): Texto processado da página
+            fields (list): Lista de campos a serem extraídos
+            model_provider (str): Provedor do modelo LLM
+            api_base (str): URL base da API do modelo LLM (opcional)
+            cache_policy (str): Política do cache de respostas ('use', 'refresh' ou 'bypass')
+            usage (dict): Contadores de uso da página (opcional)
+            
+        Returns:
+            list: Campos extraídos, ou None se a página não é curta o bastante para ser agrupada
+        """
+        if not text:
+            return None
+        _, model_name, _, _, _ = llm_call_params(model_provider)
+        tokens = count_tokens(text, model_name)
+        if tokens > self.max_page_tokens:
+            return None
+        
+        page = {'text': text, 'tokens': tokens, 'usage': usage, 'result': None, 'done': threading.Event()}
+        key = (model_provider, api_base, tuple(fields), cache_policy)
+        ready = []
+        with self._lock:
+            group = self._groups.get(key)
+            if group is not None and group['tokens'] + tokens > self.token_budget:
+                ready.append(self._take(key))
+                group = None
+            if group is None:
+                group = {'pages': [], 'tokens': 0}
+                group['timer'] = threading.Timer(self.max_wait, self._flush, (key, group))
+                group['timer'].daemon = True
+                group['timer'].start()
+                self._groups[key] = group
+            group['pages'].append(page)
+            group['tokens'] += tokens
+            if len(group['pages']) >= self.max_pages:
+                ready.append(self._take(key))
+        
+        for pages in ready:
+            self._send(key, pages)
+        page['done'].wait()
+        return page['result']
+    
+    def _take(self, key):
+        """Remove o grupo da chave (com o lock adquirido) e retorna suas páginas."""
+        group = self._groups.pop(key)
+        group['timer'].cancel()
+        return group['pages']
+    
+    def _flush(self, key, group):
+        """Envia um grupo incompleto após max_wait segundos."""
+        with self._lock:
+            if self._groups.get(key) is not group:
+                return  # Já enviado por ter enchido
+            pages = self._take(key)
+        self._send(key, pages)
+    
+    def _send(self, key, pages):
+        """Extrai as páginas de um grupo e entrega o resultado de cada uma."""
+        model_provider, api_base, fields, cache_policy = key
+        results = [[{field: "Erro na API" for field in fields}] for _ in pages]
+        try:
+            with llm_stage_limiter:
+                results = llm_clients.run(extract_packed_pages_async(
+                    [page['text'] for page in pages], list(fields), model_provider, api_base, cache_policy,
+                    [page['usage'] for page in pages]
+                ))
+        except Exception as e:
+            logger.error(f"Erro na extração agrupada de {len(pages)} páginas: {e}")
+        finally:
+            for page, result in zip(pages, results):
+                page['result'] = result
+                page['done'].set()
+
+async def extract_text_and_image_async(text, image_bytes, fields, model_provider, api_base=None, cache_policy='use',
+                                       usage=None, vision_usage=None, on_row=None):
+    """
+    Extrai os campos do texto e da captura de tela de uma mesma página ao mesmo tempo.
+    Os itens parciais (on_row) vêm apenas da extração do texto.
+    
+    Returns:
+        tuple: (itens_do_texto, itens_da_imagem)
+    """
+    text_rows, vision_rows = await asyncio.gather(
+        extract_fields_with_llm_async(text, fields, model_provider, api_base, None, cache_policy, usage=usage,
+                                      on_row=on_row),
+        extract_fields_with_llm_async(None, fields, model_provider, api_base, None, cache_policy, usage=vision_usage,
+                                      image_bytes=image_bytes)
+    )
+    return text_rows, vision_rows
+
+def merge_text_and_vision_rows(text_rows, vision_rows, fields):
+    """
+    Combina a extração do texto da página com a extração da captura de tela da mesma página.
+    O texto tem prioridade; a imagem preenche os campos "Não disponível" de cada item quando as duas
+    extrações encontraram o mesmo número de itens, e substitui o texto quando a extração do texto falhou.
+    
+    Args:
+        text_rows (list): Itens extraídos do texto
+        vision_rows (list): Itens extraídos da captura de tela
+        fields (list): Campos solicitados
+        
+    Returns:
+        tuple: (itens, campos_preenchidos_pela_imagem)
+    """
+    unavailable = "Não disponível"
+    text_ok = bool(text_rows) and not all(_is_error_row(row) for row in text_rows)
+    vision_ok = bool(vision_rows) and not all(_is_error_row(row) for row in vision_rows)
+    if not text_ok:
+        return (vision_rows, list(fields)) if vision_ok else (text_rows, [])
+    if not vision_ok or len(text_rows) != len(vision_rows):
+        return text_rows, []
+    
+    filled = []
+    merged = []
+    for text_row, vision_row in zip(text_rows, vision_rows):
+        row = dict(text_row)
+        for key, value in vision_row.items():
+            if row.get(key, unavailable) == unavailable and value != unavailable:
+                row[key] = value
+                if key not in filled:
+                    filled.append(key)
+        merged.append(row)
+    return merged, filled
+
+def merge_prefilled_and_llm_rows(prefilled_row, llm_rows, fields):
+    """
+    Combina o item preenchido sem o LLM (dados estruturados, template do domínio) com a resposta
+    do LLM para os campos faltantes. Os valores já preenchidos têm prioridade; o LLM completa os
+    demais (incluindo 'Resumo').
+    
+    Se o LLM encontrou vários itens (listagem com um único bloco JSON-LD), os itens do LLM são
+    mantidos e os valores preenchidos só completam o item que coincide com eles em algum campo.
+    
+    Args:
+        prefilled_row (dict): Campos já preenchidos
+        llm_rows (list): Resposta de extract_fields_with_llm (pode ser None ou conter erros)
+        fields (list): Campos solicitados, na ordem original
+        
+    Returns:
+        list: Lista com um único item, ou os itens do LLM no caso de uma listagem
+    """
+    valid_rows = [row for row in llm_rows or [] if isinstance(row, dict) and not _is_error_row(row)]
+    if len(valid_rows) > 1:
+        merged_rows = []
+        matched = False
+        for row in valid_rows:
+            merged = {field: row.get(field, "Não disponível") for field in fields}
+            merged.update((key, value) for key, value in row.items() if key not in fields)
+            if not matched and any(_normalize_value(row[key]) == _normalize_value(value)
+                                   for key, value in prefilled_row.items() if value and row.get(key)):
+                for field, value in prefilled_row.items():
+                    merged[field] = value or merged.get(field, "Não disponível")
+                matched = True
+            merged_rows.append(merged)
+        return merged_rows
+    
+    llm_row = valid_rows[0] if valid_rows else {}
+    if llm_rows is None or (llm_rows and not llm_row):
+        logger.warning("Falha do LLM nos campos faltantes; mantendo apenas os dados estruturados")
+    
+    merged = {}
+    for field in list(fields) + [key for key in llm_row if key not in fields]:
+        merged[field] = prefilled_row.get(field) or llm_row.get(field, "Não disponível")
+    return [merged]
+
+def _normalize_value(value):
+    """Normaliza um valor extraído para comparação (espaços simples, sem diferença de maiúsculas)."""
+    return re.sub(r'\s+', ' ', str(value)).strip().casefold()
+
+def _relative_element_path(ancestor, element):
+    """Caminho posicional (ex.: '/div[2]/span[1]') de element a partir de ancestor."""
+    steps = []
+    while element is not ancestor:
+        parent = element.getparent()
+        same_tag = [sibling for sibling in parent if sibling.tag == element.tag]
+        steps.append(f"{element.tag}[{same_tag.index(element) + 1}]")
+        element = parent
+    return '/' + '/'.join(reversed(steps))
+
+def _candidate_element_paths(tree, element):
+    """
+    Gera expressões XPath que localizam o elemento, das mais estáveis entre páginas
+    (id, itemprop, class) para as mais frágeis (caminho absoluto).
+    """
+    tag = element.tag
+    paths = []
+    for attribute in ('id', 'itemprop', 'class'):
+        value = element.get(attribute)
+        # ids com números longos costumam ser gerados por página
+        if value and '"' not in value and not (attribute == 'id' and re.search(r'\d{3,}', value)):
+            paths.append(f'//{tag}[@{attribute}="{value}"]')
+    for ancestor in element.iterancestors():
+        ancestor_id = ancestor.get('id')
+        if ancestor_id and '"' not in ancestor_id and not re.search(r'\d{3,}', ancestor_id):
+            paths.append(f'//*[@id="{ancestor_id}"]' + _relative_element_path(ancestor, element))
+            break
+    paths.append(tree.getpath(element))
+    return paths
+
+def _select_single_text(doc, path):
+    """Retorna o texto normalizado do único elemento selecionado pelo caminho, ou None."""
+    try:
+        matches = doc.xpath(path)
+    except lxml_etree.XPathError:
+        return None
+    if len(matches) != 1 or not isinstance(getattr(matches[0], 'tag', None), str):
+        return None
+    text = re.sub(r'\s+', ' ', matches[0].text_content()).strip()
+    return text or None
+
+class ExtractionTemplateStore:
+    """
+    Templates de extração aprendidos por domínio (wrapper induction).
+    
+    Depois que o LLM extrai os campos de uma página com um único item, os elementos do DOM
+    cujo texto coincide com cada valor são localizados e seus caminhos são guardados como
+    template do domínio (para aquele conjunto de campos). Nas páginas seguintes o template é
+    aplicado em modo sombra: o LLM continua sendo chamado e, se os valores coincidirem em
+    EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS páginas, o template passa a substituir o LLM.
+    Se a validação falhar, a página volta para o LLM e o template é reaprendido.
+    Mesmo confirmado, o template é reverificado em uma amostra das páginas
+    (EXTRACTION_TEMPLATE_RECHECK_RATE): o LLM roda de novo e, se os valores divergirem
+    (o layout mudou mas os caminhos ainda existem), o template é reaprendido do zero.
+    """
+    
+    def __init__(self, path=EXTRACTION_TEMPLATES_FILE, enabled=EXTRACTION_TEMPLATES_ENABLED):
+        self.path = path
+        self.enabled = enabled and lxml_html is not None
+        self._lock = threading.Lock()
+        self._templates = {}  # domínio|campos -> template
+        if self.enabled:
+            self._load()
+    
+    def apply(self, url, html_content, fields):
+        """
+        Aplica o template do domínio à página.
+        
+        Args:
+            url (str): URL da página
+            html_content (str): HTML da página
+            fields (list): Campos solicitados
             
-            # Extrair o conteúdo da resposta
-            result = response.choices[0].message.content
+        Returns:
+            tuple: (valores, status) onde valores é um dicionário campo -> valor (vazio se o template
+                   não existir ou falhar a validação) e status é 'none', 'shadow', 'recheck', 'applied'
+                   ou 'failed'. Em 'shadow' e 'recheck' os valores devem ser comparados com o LLM via learn()
+        """
+        if not self.enabled or not url:
+            return {}, 'none'
+        key = self._key(url, fields)
+        with self._lock:
+            template = self._templates.get(key)
+            template = dict(template) if template else None
+        if not template:
+            return {}, 'none'
         
-        # Usar Ollama
-        elif model_provider.lower() not in ["openai", "openai-vision"]:
-            # Verificar se o modelo Ollama tem capacidade de visão e se temos uma imagem
-            if is_vision_model and image_path:
-                # Usar a função específica para processar imagens com Ollama Vision
-                result = process_image_with_ollama_vision(
-                    image_path=image_path,
-                    prompt=prompt,
-                    model_provider=model_provider,
-                    api_base=api_base
-                )
-            else:
-                # Usar Ollama para processamento de texto
-                try:
-                    # Tentar primeiro com a biblioteca litellm
-                    try:
-                        from litellm import completion
-                        
-                        # Definir a URL base padrão se não fornecida
-                        if api_base is None:
-                            api_base = "http://localhost:11434"
-                        
-                        # Preparar as mensagens
-                        messages = [
-                            {
-                                "role": "system", 
-                                "content": "Você é um assistente especializado em extrair informações estruturadas de textos."
-                            },
-                            {
-                                "role": "user", 
-                                "content": prompt
-                            }
-                        ]
-                        
-                        # Chamar a API usando litellm
-                        response = completion(
-                            model="ollama/" + model_provider,
-                            messages=messages,
-                            api_base=api_base,
-                            temperature=0.0,
-                            stream=False,
-                            max_tokens=2000
-                        )
-                        
-                        # Extrair o conteúdo da resposta
-                        result = response.choices[0].message.content
-                    
-                    except (ImportError, Exception) as e:
-                        logger.error(f"Erro ao usar litellm: {e}")
-                        # Tentar com a biblioteca ollama diretamente
-                        import ollama
-                        
-                        # Definir o host do Ollama se fornecido
-                        if api_base is not None and api_base != "http://localhost:11434":
-                            ollama.host = api_base
-                        
-                        # Preparar as mensagens
-                        messages = [
-                            {
-                                "role": "system", 
-                                "content": "Você é um assistente especializado em extrair informações estruturadas de textos."
-                            },
-                            {
-                                "role": "user", 
-                                "content": prompt
-                            }
-                        ]
-                        
-                        # Chamar a API do Ollama diretamente
-                        response = ollama.chat(
-                            model=model_provider,
-                            messages=messages,
-
-    			    # Mova 'temperature' para dentro do dicionário 'options'
-                            options={
-                            "temperature": 0.0,
-                            "num_predict":2000
-                            }
-                            ##temperature=0.0,
-                            ##num_predict=2000
-                        )
-                        
-                        # Extrair o conteúdo da resposta
-                        result = response['message']['content']
-                
-                except Exception as e:
-                    logger.error(f"Erro ao usar Ollama: {e}")
-                    return [{field: f"Erro na API Ollama: {str(e)}" for field in fields_to_extract}]
+        values = self._evaluate(template, html_content)
+        if values is None:
+            with self._lock:
+                current = self._templates.get(key)
+                if current is not None:
+                    current['failures'] = current.get('failures', 0) + 1
+                    if current['failures'] >= EXTRACTION_TEMPLATE_MAX_FAILURES:
+                        logger.info(f"Template de extração de {get_domain(url)} descartado após falhas seguidas")
+                        del self._templates[key]
+            return {}, 'failed'
         
-        else:
-            return [{field: f"Provedor de modelo não suportado: {model_provider}" for field in fields_to_extract}]
+        if template.get('confirmations', 0) < EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS:
+            return values, 'shadow'
+        if random.random() < EXTRACTION_TEMPLATE_RECHECK_RATE:
+            return values, 'recheck'
+        with self._lock:
+            current = self._templates.get(key)
+            if current is not None:
+                current['hits'] = current.get('hits', 0) + 1
+                current['failures'] = 0
+        return values, 'applied'
+    
+    def learn(self, url, html_content, fields, row, shadow_values=None):
+        """
+        Aprende (ou confirma) o template do domínio a partir do item extraído pelo LLM.
+        
+        Args:
+            url (str): URL da página
+            html_content (str): HTML da página
+            fields (list): Campos solicitados
+            row (dict): Item final extraído para a página
+            shadow_values (dict): Valores que o template atual produziu nesta página (modo sombra
+                ou reverificação)
+        """
+        if not self.enabled or not url or not html_content:
+            return
+        key = self._key(url, fields)
+        
+        # O template existente concordou com o LLM: conta uma confirmação
+        if shadow_values and all(
+            _normalize_value(shadow_values.get(field, '')) == _normalize_value(row.get(field, '')) for field in fields
+        ):
+            with self._lock:
+                current = self._templates.get(key)
+                if current is not None:
+                    current['confirmations'] = current.get('confirmations', 0) + 1
+                    current['failures'] = 0
+                    snapshot = dict(self._templates)
+            if current is not None:
+                logger.info(f"Template de extração de {get_domain(url)} confirmado ({current['confirmations']} páginas)")
+                self._save(snapshot)
+                return
+        
+        # O template divergiu do LLM: é descartado mesmo que não seja possível reaprendê-lo nesta página
+        if shadow_values:
+            with self._lock:
+                current = self._templates.pop(key, None)
+                snapshot = dict(self._templates)
+            if current is not None and current.get('confirmations', 0) >= EXTRACTION_TEMPLATE_MIN_CONFIRMATIONS:
+                logger.warning(f"Template de extração de {get_domain(url)} divergiu do LLM na reverificação; reaprendendo")
         
-        # Tentar extrair o JSON da resposta
+        template = self._induce(html_content, fields, row)
+        if template is None:
+            if shadow_values:
+                self._save(snapshot)
+            return
+        with self._lock:
+            self._templates[key] = template
+            snapshot = dict(self._templates)
+        logger.info(f"Template de extração aprendido para {get_domain(url)}: {len(template['paths'])} campos")
+        self._save(snapshot)
+    
+    def stats(self):
+        """Resumo dos templates por domínio (para diagnóstico)."""
+        with self._lock:
+            return {
+                key: {'fields': len(t['paths']), 'confirmations': t.get('confirmations', 0),
+                      'hits': t.get('hits', 0), 'failures': t.get('failures', 0)}
+                for key, t in self._templates.items()
+            }
+    
+    def _induce(self, html_content, fields, row):
+        """Localiza no DOM o elemento de cada valor e escolhe o caminho que o identifica de forma única."""
         try:
-            # Procurar por padrões de array JSON na resposta
-            json_match = re.search(r'(\[.*\])', result, re.DOTALL)
-            if json_match:
-                result = json_match.group(1)
-            
-            # Tentar carregar como JSON
-            extracted_data_list = json.loads(result)
-            
-            # Verificar se o resultado é uma lista
-            if not isinstance(extracted_data_list, list):
-                logger.warning("O resultado não é uma lista, convertendo para lista com um único item")
-                extracted_data_list = [extracted_data_list]
-            
-            # Verificar se todos os campos solicitados estão presentes em cada item
-            for item in extracted_data_list:
-                for field in fields_to_extract:
-                    if field not in item:
-                        item[field] = "Não disponível"
+            tree = lxml_html.document_fromstring(html_content).getroottree()
+        except Exception:
+            return None
+        doc = tree.getroot()
+        
+        paths = {}
+        samples = {}
+        for field in fields:
+            value = str(row.get(field, '')).strip()
+            if not value or value.startswith('Erro'):
+                return None
+            if value == "Não disponível":
+                paths[field] = None
+                continue
             
-            return extracted_data_list
+            target = re.sub(r'\s+', ' ', value)
+            matches = doc.xpath('//body//*[normalize-space(.)=$v]', v=target)
+            # Manter apenas os elementos mais internos (ancestrais têm o mesmo texto)
+            match_set = set(matches)
+            innermost = [element for element in matches
+                         if not any(descendant in match_set for descendant in element.iterdescendants())]
+            chosen = None
+            for element in innermost:
+                for path in _candidate_element_paths(tree, element):
+                    if _select_single_text(doc, path) == target:
+                        chosen = path
+                        break
+                if chosen:
+                    break
+            if chosen is None:
+                # Algum valor não aparece literalmente na página: o template não é confiável
+                return None
+            paths[field] = chosen
+            samples[field] = len(target)
         
-        except json.JSONDecodeError:
-            logger.error(f"Erro ao decodificar JSON da resposta do LLM: {result}")
-            # Criar uma lista com um único dicionário com valores padrão
-            return [{field: "Erro na extração" for field in fields_to_extract}]
+        return {'paths': paths, 'samples': samples, 'confirmations': 0, 'hits': 0, 'failures': 0,
+                'learned_at': time.time()}
     
-    except Exception as e:
-        logger.error(f"Erro ao chamar a API do LLM: {e}")
-        return [{field: "Erro na API" for field in fields_to_extract}]
+    def _evaluate(self, template, html_content):
+        """Aplica os caminhos do template; retorna None se algum campo falhar na validação."""
+        try:
+            doc = lxml_html.document_fromstring(html_content)
+        except Exception:
+            return None
+        values = {}
+        for field, path in template['paths'].items():
+            if path is None:
+                values[field] = "Não disponível"
+                continue
+            value = _select_single_text(doc, path)
+            if value is None or len(value) > max(200, template['samples'].get(field, 0) * EXTRACTION_TEMPLATE_MAX_VALUE_RATIO):
+                return None
+            values[field] = value
+        return values
+    
+    def _key(self, url, fields):
+        return get_domain(url) + '|' + '|'.join(sorted(_normalize_value(field) for field in fields))
+    
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._templates = json.load(f)
+        except (OSError, ValueError):
+            self._templates = {}
+    
+    def _save(self, snapshot):
+        """Grava os templates de forma atômica."""
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Erro ao gravar templates de extração: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+# Templates de extração globais
+extraction_templates = ExtractionTemplateStore()
 
 def generate_csv(data, output_file):
     """
@@ -621,7 +4084,8 @@ def create_mock_html():
     </html>
     """
 
-def process_url(url, fields, model_provider, api_base=None, use_mock=False, image_path=None):
+def process_url(url, fields, model_provider, api_base=None, use_mock=False, image_path=None, cache_policy='use', stats=None, on_stage=None,
+                llm_packer=None, capture_screenshot=False, on_row=None):
     """
     Processa uma URL ou imagem e extrai campos específicos.
     
@@ -632,6 +4096,14 @@ def process_url(url, fields, model_provider, api_base=None, use_mock=False, imag
         api_base (str): URL base da API do modelo LLM (opcional)
         use_mock (bool): Se True, usa dados de exemplo em vez de acessar a URL
         image_path (str): Caminho para a imagem a ser processada (opcional)
+        cache_policy (str): Política do cache de páginas ('use', 'refresh' ou 'bypass')
+        stats (dict): Se fornecido, recebe as estatísticas do processamento (ex.: tokens economizados)
+        on_stage (callable): Se fornecido, é chamado com o nome de cada etapa ('fetching', 'cleaning', 'llm')
+        llm_packer (LLMPagePacker): Se fornecido, páginas curtas são extraídas em chamadas agrupadas
+        capture_screenshot (bool): Se True (URL com modelo de visão), a página é carregada no navegador uma
+            única vez para obter o HTML e uma captura de tela, e as extrações do texto e da imagem rodam em paralelo
+        on_row (callable): Se fornecido, recebe cada item preliminar assim que o LLM o completa (streaming);
+            o resultado definitivo continua sendo o valor de retorno
         
     Returns:
         tuple: (dados_extraídos, texto_processado, contagem_resultados)
@@ -641,30 +4113,160 @@ def process_url(url, fields, model_provider, api_base=None, use_mock=False, imag
         logger.error("Nem URL nem imagem fornecida para processamento")
         return [{"Erro": "URL ou imagem não fornecida"}], "URL ou imagem não fornecida", 0
     
+    if on_stage is None:
+        on_stage = lambda stage: None
+    screenshot = None
+    
     # Processar URL ou usar dados de exemplo
     if url or use_mock:
         # Obter conteúdo HTML
         if use_mock:
             logger.info("Usando dados de exemplo para teste")
             html_content = create_mock_html()
+            
+            # Limpar e processar o texto
+            logger.info("Limpando e processando o texto")
+            with stage_timer('clean', stats):
+                text = clean_text(html_content)
+        elif capture_screenshot:
+            # Obter HTML e captura de tela em um único carregamento no navegador
+            logger.info(f"Acessando URL com captura de tela: {url}")
+            on_stage('fetching')
+            with fetch_stage_limiter, stage_timer('fetch', stats):
+                html_content, screenshot = scrape_webpage_with_screenshot(url)
+                text = clean_text(html_content) if html_content else None
+                tier = 'browser'
+                if not html_content:
+                    # Navegador falhou: seguir só pelo texto, pelo caminho normal de busca
+                    logger.warning("Falha ao carregar a página para a captura de tela; usando a busca normal")
+                    html_content, text, tier = fetch_webpage(url, cache_policy)
+                elif cache_policy != 'bypass':
+                    page_cache.put(url, html_content, text, tier, {})
+            if screenshot is not None:
+                pipeline_metrics.inc('scraper_stage_bytes_total', len(screenshot), stage='screenshot')
+                if stats is not None:
+                    stats['vision'] = {'screenshot_bytes': len(screenshot)}
         else:
+            # Obter HTML e texto limpo (HTTP simples ou Selenium, conforme a página)
             logger.info(f"Acessando URL: {url}")
-            html_content = scrape_webpage_with_selenium(url)
-            
-            if not html_content:
-                logger.error("Falha ao obter conteúdo HTML da página")
-                return [{"Erro": "Falha ao obter conteúdo HTML da página"}], "Falha ao obter conteúdo HTML da página", 0
+            on_stage('fetching')
+            with fetch_stage_limiter, stage_timer('fetch', stats):
+                html_content, text, tier = fetch_webpage(url, cache_policy)
+        
+        if not html_content:
+            logger.error("Falha ao obter conteúdo HTML da página")
+            return [{"Erro": "Falha ao obter conteúdo HTML da página"}], "Falha ao obter conteúdo HTML da página", 0
         
-        # Limpar e processar o texto
-        logger.info("Limpando e processando o texto")
-        text = clean_text(html_content)
+        if not use_mock:
+            pipeline_metrics.inc('scraper_fetch_total', tier=tier)
+            if stats is not None:
+                stats['fetch_tier'] = tier
+        
+        html_bytes = len(html_content.encode('utf-8'))
+        pipeline_metrics.inc('scraper_stage_bytes_total', html_bytes, stage='fetch')
+        
+        # Manter apenas o conteúdo principal para reduzir o prompt
+        on_stage('cleaning')
+        with stage_timer('main_content', stats):
+            text, content_stats = extract_main_content(html_content, url, full_text=text)
+        text_bytes = len(text.encode('utf-8'))
+        pipeline_metrics.inc('scraper_stage_bytes_total', text_bytes, stage='clean')
+        if stats is not None:
+            stats['content'] = content_stats
+            stats['bytes'] = {'html': html_bytes, 'text': text_bytes}
     else:
         # Se estamos usando apenas imagem, não temos texto para processar
         text = None
     
-    # Extrair campos com LLM
-    logger.info(f"Extraindo campos com modelo LLM: {model_provider}")
-    extracted_data = extract_fields_with_llm(text, fields, model_provider, api_base, image_path)
+    # Preencher o que for possível sem o LLM: dados estruturados (JSON-LD / microdata) e templates do domínio
+    prefilled, listing_rows = {}, []
+    template_values, template_status = {}, 'none'
+    if text is not None and not image_path:
+        with stage_timer('prefill', stats):
+            structured_rows, missing_fields = extract_fields_from_structured_data(html_content, fields)
+            if len(structured_rows) == 1:
+                prefilled.update(structured_rows[0])
+            elif structured_rows and not missing_fields and not find_description_field(fields):
+                listing_rows = structured_rows
+            # Listagem incompleta: não há como associar as respostas do LLM a cada item, então é ignorada
+            
+            if not listing_rows and not use_mock:
+                template_values, template_status = extraction_templates.apply(url, html_content, fields)
+                if template_status == 'applied':
+                    for field, value in template_values.items():
+                        prefilled.setdefault(field, value)
+        
+        if stats is not None:
+            structured_used = listing_rows or structured_rows[:1]
+            stats['structured_data'] = {
+                'items': len(structured_used),
+                'fields_filled': [f for f in fields if structured_used and all(f in row for row in structured_used)]
+            }
+            stats['template'] = {'status': template_status}
+    
+    # O 'Resumo' automático sempre depende do LLM, que precisa receber o campo de descrição
+    llm_fields = [f for f in fields if f not in prefilled]
+    description_field = find_description_field(fields)
+    if prefilled and description_field and description_field not in llm_fields:
+        llm_fields.append(description_field)
+    
+    if listing_rows:
+        logger.info("Todos os campos preenchidos pelos dados estruturados da página; LLM não chamado")
+        extracted_data = listing_rows
+    elif prefilled and not llm_fields:
+        logger.info("Todos os campos preenchidos sem o LLM (dados estruturados / template do domínio)")
+        extracted_data = merge_prefilled_and_llm_rows(prefilled, [], fields)
+    else:
+        # Extrair campos com LLM (apenas os que faltam, se parte já foi preenchida)
+        logger.info(f"Extraindo campos com modelo LLM: {model_provider}")
+        on_stage('llm')
+        usage = {'model': model_provider}
+        extracted_data = None
+        # Os itens parciais já recebem os campos preenchidos sem o LLM; a partir do segundo item
+        # (listagem) eles só são completados no resultado final, no item correspondente
+        partial_count = [0]
+        
+        def merge_partial_row(row):
+            partial_count[0] += 1
+            on_row(merge_prefilled_and_llm_rows(prefilled if partial_count[0] == 1 else {}, [row], fields)[0])
+        
+        llm_on_row = merge_partial_row if on_row is not None and prefilled else on_row
+        if llm_packer is not None and not image_path:
+            # O tempo inclui a espera pelas demais páginas do grupo
+            with stage_timer('llm', stats):
+                extracted_data = llm_packer.extract(text, llm_fields, model_provider, api_base, cache_policy, usage)
+        if extracted_data is None and screenshot is not None:
+            # Texto e captura de tela extraídos em paralelo; a imagem completa o que o texto não trouxe
+            vision_usage = {'model': model_provider}
+            with llm_stage_limiter, stage_timer('llm', stats):
+                extracted_data, vision_data = llm_clients.run(extract_text_and_image_async(
+                    text, screenshot, llm_fields, model_provider, api_base, cache_policy, usage, vision_usage,
+                    on_row=llm_on_row
+                ))
+            extracted_data, filled = merge_text_and_vision_rows(extracted_data, vision_data, llm_fields)
+            if stats is not None:
+                stats['vision'].update({'llm': vision_usage, 'items': len(vision_data), 'fields_filled': filled})
+        if extracted_data is None:
+            with llm_stage_limiter, stage_timer('llm', stats):
+                extracted_data = extract_fields_with_llm(text, llm_fields, model_provider, api_base, image_path, cache_policy, usage,
+                                                         on_row=llm_on_row)
+        if stats is not None:
+            stats['llm'] = usage
+        if prefilled:
+            extracted_data = merge_prefilled_and_llm_rows(prefilled, extracted_data, fields)
+        
+        # Aprender (ou confirmar) o template do domínio com o resultado de páginas de um único item.
+        # Com o template aplicado, o LLM só completou os demais campos (ex.: 'Resumo'): o item não
+        # confirma nem substitui o template
+        if (text is not None and not image_path and not use_mock and template_status != 'applied'
+                and isinstance(extracted_data, list) and len(extracted_data) == 1
+                and not _is_error_row(extracted_data[0])):
+            with stage_timer('template_learn', stats):
+                extraction_templates.learn(url, html_content, fields, extracted_data[0],
+                                           template_values if template_status in ('shadow', 'recheck') else None)
+    
+    if stats is not None:
+        stats['llm_skipped'] = bool(listing_rows) or bool(prefilled) and not llm_fields
     
     # Verificar se a extração foi bem-sucedida
     if not extracted_data:
@@ -676,7 +4278,221 @@ def process_url(url, fields, model_provider, api_base=None, use_mock=False, imag
     
     return extracted_data, text, result_count
 
-def process_task(task_id, url=None, fields=None, model_provider="openai", api_base=None, use_mock=False, image_path=None):
+class TaskStore:
+    """
+    Armazenamento persistente das tarefas em SQLite (modo WAL).
+    
+    Cada tarefa é um documento JSON com colunas indexadas de status e created_at. As atualizações
+    são transações BEGIN IMMEDIATE, de modo que vários processos da aplicação (ex.: atrás de um
+    balanceador de carga) podem compartilhar o mesmo arquivo. Tarefas antigas e seus arquivos em
+    RESULTS_FOLDER são removidos após TASK_TTL por uma thread de limpeza.
+    """
+    
+    def __init__(self, db_path=TASKS_DB, ttl=TASK_TTL, stale_timeout=TASK_STALE_TIMEOUT,
+                 cleanup_interval=TASK_CLEANUP_INTERVAL):
+        self.ttl = ttl
+        self.stale_timeout = stale_timeout
+        self.cleanup_interval = cleanup_interval
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._cleanup_thread = None
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id TEXT PRIMARY KEY, type TEXT, status TEXT, created_at REAL, updated_at REAL, data TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)")
+    
+    def create(self, task):
+        """
+        Registra uma nova tarefa.
+        
+        Args:
+            task (dict): Tarefa com ao menos 'id', 'status' e 'created_at'
+        """
+        self._start_cleanup()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO tasks (id, type, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (task['id'], task.get('type', 'single'), task['status'], task['created_at'], time.time(),
+                 json.dumps(task, ensure_ascii=False))
+            )
+    
+    def get(self, task_id):
+        """
+        Args:
+            task_id (str): ID da tarefa
+            
+        Returns:
+            dict: Tarefa ou None se não existir
+        """
+        with self._lock:
+            row = self._db.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def update(self, task_id, **changes):
+        """
+        Atualiza campos da tarefa de forma atômica (também entre processos).
+        
+        Args:
+            task_id (str): ID da tarefa
+            **changes: Campos a alterar
+            
+        Returns:
+            dict: Tarefa atualizada ou None se não existir
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+                if row is None:
+                    self._db.execute("ROLLBACK")
+                    return None
+                task = json.loads(row[0])
+                task.update(changes)
+                self._db.execute(
+                    "UPDATE tasks SET status = ?, updated_at = ?, data = ? WHERE id = ?",
+                    (task['status'], time.time(), json.dumps(task, ensure_ascii=False), task_id)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        with self._changed:
+            self._changed.notify_all()
+        return task
+    
+    def wait_for_change(self, timeout):
+        """
+        Bloqueia até que alguma tarefa seja atualizada neste processo ou até o timeout.
+        Atualizações feitas por outros processos são percebidas relendo a tarefa após o timeout.
+        """
+        with self._changed:
+            self._changed.wait(timeout)
+    
+    def delete(self, task_id):
+        """Remove a tarefa (sem apagar arquivos)."""
+        with self._lock:
+            self._db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+    
+    def count_by_status(self):
+        """Returns: dict: Número de tarefas por status."""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+    
+    def cleanup(self):
+        """
+        Remove tarefas concluídas (ou com erro) criadas há mais de TASK_TTL, junto com seus arquivos,
+        e marca como erro as tarefas em processamento sem atualização há mais de TASK_STALE_TIMEOUT
+        (ex.: processo reiniciado no meio do processamento). Tarefas pendentes não são tocadas: elas
+        só são atualizadas quando um worker do TaskScheduler as inicia.
+        
+        Returns:
+            int: Número de tarefas removidas
+        """
+        now = time.time()
+        with self._lock:
+            stale = self._db.execute(
+                "SELECT id FROM tasks WHERE status = 'processing' AND updated_at < ?",
+                (now - self.stale_timeout,)
+            ).fetchall()
+            expired = self._db.execute(
+                "SELECT id, data FROM tasks WHERE status IN ('completed', 'error') AND created_at < ?",
+                (now - self.ttl,)
+            ).fetchall()
+            if expired:
+                self._db.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id, _ in expired])
+        
+        for (task_id,) in stale:
+            self.update(task_id, status='error', message='Tarefa interrompida antes de terminar')
+        
+        for task_id, data in expired:
+            task = json.loads(data)
+            paths = [task.get(key) for key in ('text_file', 'csv_file', 'json_file', 'image_path')]
+            for path in paths:
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        if stale or expired:
+            logger.info(f"Limpeza de tarefas: {len(expired)} removidas, {len(stale)} marcadas como interrompidas")
+        return len(expired)
+    
+    def _start_cleanup(self):
+        """Inicia a thread de limpeza periódica na primeira tarefa criada."""
+        with self._lock:
+            if self._cleanup_thread is not None:
+                return
+            self._cleanup_thread = threading.Thread(target=self._cleanup_loop, name="task-cleanup", daemon=True)
+            self._cleanup_thread.start()
+    
+    def _cleanup_loop(self):
+        while True:
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.error(f"Erro na limpeza de tarefas: {e}")
+            time.sleep(self.cleanup_interval)
+
+# Armazenamento global de tarefas
+task_store = TaskStore()
+
+class PartialRowsWriter:
+    """
+    Grava os itens preliminares de uma tarefa (partial_data) à medida que o LLM os completa.
+    
+    add() é chamado no loop dos clientes LLM e não faz I/O: a gravação no TaskStore roda em uma
+    thread, no máximo a cada interval segundos, e os itens que chegarem nesse intervalo são
+    gravados ao fim dele.
+    """
+    
+    def __init__(self, task_id, interval=TASK_PARTIAL_ROWS_INTERVAL):
+        self.task_id = task_id
+        self.interval = interval
+        self.rows = []
+        self._lock = threading.Lock()        # Estado (itens, timer)
+        self._write_lock = threading.Lock()  # Uma gravação por vez, na ordem dos itens
+        self._timer = None
+        self._written = 0
+        self._last_write = 0.0
+        self._closed = False
+    
+    def add(self, row):
+        with self._lock:
+            self.rows.append(row)
+            if self._closed or self._timer is not None:
+                return
+            delay = max(0.0, self._last_write + self.interval - time.monotonic())
+            self._timer = threading.Timer(delay, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def _flush(self, final=False):
+        with self._write_lock:
+            with self._lock:
+                self._timer = None
+                if (self._closed and not final) or len(self.rows) == self._written:
+                    return
+                rows = list(self.rows)
+                self._written = len(rows)
+                self._last_write = time.monotonic()
+            task_store.update(self.task_id, partial_data=rows)
+    
+    def close(self):
+        """Cancela o timer e grava os itens ainda pendentes (antes do resultado final)."""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._flush(final=True)
+
+def process_task(task_id, url=None, fields=None, model_provider="openai", api_base=None, use_mock=False, image_path=None, cache_policy='use',
+                 capture_screenshot=False):
     """
     Processa uma tarefa de extração de informações.
     
@@ -688,41 +4504,269 @@ def process_task(task_id, url=None, fields=None, model_provider="openai", api_ba
         api_base (str): URL base da API do modelo LLM (opcional)
         use_mock (bool): Se True, usa dados de exemplo em vez de acessar a URL
         image_path (str): Caminho para a imagem a ser processada (opcional)
+        cache_policy (str): Política do cache de páginas ('use', 'refresh' ou 'bypass')
+        capture_screenshot (bool): Se True, extrai também de uma captura de tela da URL (modelos de visão)
     """
+    started = time.perf_counter()
+    stats = {}
     try:
-        # Atualizar status da tarefa
-        tasks[task_id]['status'] = 'processing'
+        # Atualizar status da tarefa (o tempo na fila é contado desde a criação)
+        task = task_store.update(task_id, status='processing')
+        stats['timings'] = {'queue': round(max(0.0, time.time() - task['created_at']), 4)} if task else {}
+        pipeline_metrics.observe('scraper_stage_duration_seconds', stats['timings'].get('queue', 0.0), stage='queue')
         
-        # Processar URL ou imagem
-        extracted_data, text, result_count = process_url(url, fields, model_provider, api_base, use_mock, image_path)
+        # Processar URL ou imagem, registrando cada etapa para o stream de status
+        on_stage = lambda stage: task_store.update(task_id, stage=stage)
+        
+        # Itens preliminares do LLM em streaming: o primeiro é gravado na hora, os seguintes
+        # no máximo a cada TASK_PARTIAL_ROWS_INTERVAL segundos
+        partial_writer = PartialRowsWriter(task_id)
+        try:
+            extracted_data, text, result_count = process_url(url, fields, model_provider, api_base, use_mock, image_path, cache_policy, stats, on_stage,
+                                                             capture_screenshot=capture_screenshot, on_row=partial_writer.add)
+        finally:
+            partial_writer.close()
+        on_stage('exporting')
         
-        # Salvar texto processado
-        text_file = os.path.join(RESULTS_FOLDER, f"{task_id}_text.txt")
-        with open(text_file, 'w', encoding='utf-8-sig') as f:
-            f.write(text if text else "Processamento baseado em imagem, sem texto disponível.")
+        with stage_timer('export', stats):
+            # Salvar texto processado
+            text_file = os.path.join(RESULTS_FOLDER, f"{task_id}_text.txt")
+            with open(text_file, 'w', encoding='utf-8-sig') as f:
+                f.write(text if text else "Processamento baseado em imagem, sem texto disponível.")
+            
+            # Gerar CSV
+            csv_file = os.path.join(RESULTS_FOLDER, f"{task_id}_data.csv")
+            generate_csv(extracted_data, csv_file)
+            
+            # Gerar JSON
+            json_file = os.path.join(RESULTS_FOLDER, f"{task_id}_data.json")
+            generate_json(extracted_data, json_file)
         
-        # Gerar CSV
-        csv_file = os.path.join(RESULTS_FOLDER, f"{task_id}_data.csv")
-        generate_csv(extracted_data, csv_file)
+        export_bytes = sum(os.path.getsize(path) for path in (text_file, csv_file, json_file) if os.path.exists(path))
+        pipeline_metrics.inc('scraper_stage_bytes_total', export_bytes, stage='export')
+        stats.setdefault('bytes', {})['export'] = export_bytes
         
-        # Gerar JSON
-        json_file = os.path.join(RESULTS_FOLDER, f"{task_id}_data.json")
-        generate_json(extracted_data, json_file)
+        total = time.perf_counter() - started
+        stats['timings']['total'] = round(total, 4)
+        pipeline_metrics.observe('scraper_stage_duration_seconds', total, stage='total')
+        pipeline_metrics.inc('scraper_tasks_total', status='completed')
         
         # Atualizar status da tarefa
-        tasks[task_id]['status'] = 'completed'
-        tasks[task_id]['extracted_data'] = extracted_data
-        tasks[task_id]['text_file'] = text_file
-        tasks[task_id]['csv_file'] = csv_file
-        tasks[task_id]['json_file'] = json_file
-        tasks[task_id]['result_count'] = result_count
+        task_store.update(
+            task_id,
+            status='completed',
+            stage='done',
+            extracted_data=extracted_data,
+            partial_data=None,
+            text_file=text_file,
+            csv_file=csv_file,
+            json_file=json_file,
+            result_count=result_count,
+            stats=stats
+        )
         
         logger.info(f"Tarefa {task_id} concluída com sucesso. {result_count} resultados encontrados.")
     
     except Exception as e:
         logger.error(f"Erro ao processar tarefa {task_id}: {e}")
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['message'] = str(e)
+        pipeline_metrics.inc('scraper_tasks_total', status='error')
+        task_store.update(task_id, status='error', stage='error', message=str(e), stats=stats, partial_data=None)
+
+def parse_url_list(content):
+    """
+    Extrai as URLs de um texto no formato de URLs_Datasets_TCC.txt (títulos, datas e linhas em branco
+    são ignorados) ou de uma lista separada por quebras de linha ou vírgulas.
+    
+    Args:
+        content (str): Conteúdo do arquivo ou campo de texto
+        
+    Returns:
+        list: URLs únicas, na ordem em que aparecem
+    """
+    urls = []
+    seen = set()
+    for token in re.split(r'[\s,]+', content or ''):
+        token = token.strip()
+        if re.match(r'^https?://', token, re.IGNORECASE) and token not in seen:
+            seen.add(token)
+            urls.append(token)
+    return urls
+
+def process_batch(job_id, urls, fields, model_provider="openai", api_base=None, parallelism=BATCH_DEFAULT_PARALLELISM, cache_policy='use',
+                  pack_pages=False):
+    """
+    Processa um job em lote: cada URL passa por busca -> limpeza -> LLM via process_url.
+    Como as etapas de busca e de LLM têm limites de concorrência próprios, a busca de uma URL
+    ocorre enquanto outra está no LLM. Ao final, os resultados são exportados em um único CSV/JSON.
+    
+    Args:
+        job_id (str): ID do job (registrado em task_store)
+        urls (list): URLs a processar
+        fields (list): Lista de campos a serem extraídos
+        model_provider (str): Provedor do modelo LLM
+        api_base (str): URL base da API do modelo LLM (opcional)
+        parallelism (int): Número de URLs processadas simultaneamente
+        cache_policy (str): Política de cache ('use', 'refresh' ou 'bypass')
+        pack_pages (bool): Se True, páginas curtas são extraídas em grupos, várias por chamada ao LLM
+    """
+    job = task_store.get(job_id)
+    items = job['items']
+    progress = {'completed': 0, 'failed': 0}
+    try:
+        task_store.update(job_id, status='processing', stage='processing')
+        results = [None] * len(urls)
+        last_persist = 0.0
+        # Só páginas em processamento simultâneo são agrupadas: o grupo tem no máximo parallelism
+        # páginas (fecha sem esperar max_wait) e sem paralelismo não há o que agrupar
+        llm_packer = None
+        if pack_pages and min(parallelism, len(urls)) >= 2:
+            llm_packer = LLMPagePacker(max_pages=min(LLM_PACK_MAX_PAGES, parallelism, len(urls)))
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix=f"batch-{job_id[:8]}") as executor:
+            futures = {
+                executor.submit(process_url, url, fields, model_provider, api_base, False, None, cache_policy,
+                                llm_packer=llm_packer): index
+                for index, url in enumerate(urls)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                item = items[index]
+                try:
+                    extracted_data, _, result_count = future.result()
+                    if result_count == 0 and extracted_data and 'Erro' in extracted_data[0]:
+                        item['status'] = 'error'
+                        item['message'] = extracted_data[0]['Erro']
+                        progress['failed'] += 1
+                    else:
+                        item['status'] = 'completed'
+                        item['result_count'] = result_count
+                        results[index] = extracted_data
+                except Exception as e:
+                    logger.error(f"Erro ao processar {urls[index]} no job {job_id}: {e}")
+                    item['status'] = 'error'
+                    item['message'] = str(e)
+                    progress['failed'] += 1
+                progress['completed'] += 1
+                
+                # Gravar o progresso com intervalo mínimo (cada gravação reescreve a lista de itens)
+                if time.time() - last_persist >= BATCH_PROGRESS_PERSIST_INTERVAL:
+                    task_store.update(job_id, items=items, **progress)
+                    last_persist = time.time()
+        
+        # Juntar os resultados de todas as URLs, identificando a origem de cada linha
+        task_store.update(job_id, stage='exporting', items=items, **progress)
+        merged = []
+        for url, extracted_data in zip(urls, results):
+            for row in extracted_data or []:
+                merged.append({'URL': url, **row})
+        
+        # Gerar CSV e JSON consolidados
+        csv_file = os.path.join(RESULTS_FOLDER, f"{job_id}_data.csv")
+        generate_csv(merged, csv_file)
+        json_file = os.path.join(RESULTS_FOLDER, f"{job_id}_data.json")
+        generate_json(merged, json_file)
+        
+        task_store.update(
+            job_id,
+            status='completed',
+            stage='done',
+            items=items,
+            extracted_data=merged,
+            csv_file=csv_file,
+            json_file=json_file,
+            result_count=len(merged),
+            **progress
+        )
+        
+        pipeline_metrics.inc('scraper_tasks_total', status='batch_completed')
+        logger.info(f"Job {job_id} concluído: {len(urls)} URLs, {progress['failed']} falhas, {len(merged)} resultados.")
+    
+    except Exception as e:
+        logger.error(f"Erro ao processar job {job_id}: {e}")
+        pipeline_metrics.inc('scraper_tasks_total', status='batch_error')
+        task_store.update(job_id, status='error', stage='error', message=str(e), items=items, **progress)
+
+class TaskScheduler:
+    """
+    Pool fixo de threads de processamento alimentado por uma fila limitada.
+    
+    Substitui a criação de uma thread por requisição: quando a fila está cheia,
+    submit() lança queue.Full e a rota responde com HTTP 429.
+    """
+    
+    def __init__(self, workers=TASK_WORKERS, queue_size=TASK_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = OrderedDict()  # task_id -> None, na ordem de chegada
+        self._lock = threading.Lock()
+        self._threads = []
+    
+    def submit(self, task_id, target, *args):
+        """
+        Enfileira uma tarefa.
+        
+        Args:
+            task_id (str): ID da tarefa
+            target (callable): Função a executar
+            *args: Argumentos da função
+            
+        Returns:
+            int: Posição da tarefa na fila (1 = próxima a ser executada)
+            
+        Raises:
+            queue.Full: Se a fila atingiu TASK_QUEUE_SIZE
+        """
+        self._start()
+        with self._lock:
+            self._queue.put_nowait((task_id, target, args))
+            self._pending[task_id] = None
+            return len(self._pending)
+    
+    def position(self, task_id):
+        """
+        Returns:
+            int: Posição da tarefa na fila ou None se ela não estiver aguardando
+        """
+        with self._lock:
+            for index, pending_id in enumerate(self._pending):
+                if pending_id == task_id:
+                    return index + 1
+            return None
+    
+    def queued(self):
+        """Returns: int: Número de tarefas aguardando na fila."""
+        with self._lock:
+            return len(self._pending)
+    
+    def _start(self):
+        """Inicia as threads de processamento na primeira submissão."""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"task-worker-{index}")
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+    
+    def _worker(self):
+        """Loop de cada thread: retira tarefas da fila e as executa."""
+        while True:
+            task_id, target, args = self._queue.get()
+            with self._lock:
+                self._pending.pop(task_id, None)
+            try:
+                target(*args)
+            except Exception as e:
+                logger.error(f"Erro não tratado na tarefa {task_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+# Agendador global e limites de concorrência por etapa (busca e LLM têm perfis de recursos distintos)
+task_scheduler = TaskScheduler()
+fetch_stage_limiter = threading.BoundedSemaphore(FETCH_STAGE_CONCURRENCY)
+llm_stage_limiter = threading.BoundedSemaphore(LLM_STAGE_CONCURRENCY)
 
 @app.route('/')
 def index():
@@ -733,7 +4777,7 @@ def index():
 def test_llm():
     try:
         model_provider = request.args.get('model_provider', "openai")
-        api_base = request.args.get('api_base', "http://localhost:11434")
+        api_base = request.args.get('api_base', DEFAULT_OLLAMA_API_BASE)
         
         # Verificar se o modelo é um modelo de visão do Ollama
         if is_ollama_vision_model(model_provider):
@@ -763,39 +4807,16 @@ def test_llm():
         # Verificar se o modelo é um modelo Ollama normal
         elif model_provider not in ["openai", "openai-vision"]:
             try:
-                # Tentar primeiro com a biblioteca litellm
-                try:
-                    from litellm import completion
-                    
-                    # Testar a conexão com o Ollama
-                    response = completion(
-                        model="ollama/" + model_provider,
-                        messages=[{"role": "user", "content": "Olá, você está funcionando?"}],
-                        api_base=api_base,
-                        ###temperature=0.0,
-                        stream=False,
-                        max_tokens=10
-                    )
-                    
-                    return jsonify({'status': 'success', 'message': 'Conexão com Ollama estabelecida com sucesso'})
+                # Testar a conexão com o Ollama pelo cliente compartilhado
+                llm_clients.run(llm_clients.chat(
+                    'ollama',
+                    model_provider,
+                    [{"role": "user", "content": "Olá, você está funcionando?"}],
+                    max_tokens=10,
+                    api_base=api_base
+                ))
                 
-                except (ImportError, Exception) as e:
-                    logger.error(f"Erro ao usar litellm: {e}")
-                    # Tentar com a biblioteca ollama diretamente
-                    import ollama
-                    
-                    # Definir o host do Ollama se fornecido
-                    if api_base is not None and api_base != "http://localhost:11434":
-                        ollama.host = api_base
-                    
-                    # Testar a conexão com o Ollama
-                    response = ollama.chat(
-                        model=model_provider,
-                        messages=[{"role": "user", "content": "Olá, você está funcionando?"}],
-                        ###temperature=0.0
-                    )
-                    
-                    return jsonify({'status': 'success', 'message': 'Conexão com Ollama estabelecida com sucesso'})
+                return jsonify({'status': 'success', 'message': 'Conexão com Ollama estabelecida com sucesso'})
             
             except Exception as e:
                 logger.error(f"Erro ao testar conexão com Ollama: {e}")
@@ -805,25 +4826,20 @@ def test_llm():
         elif model_provider in ["openai", "openai-vision"]:
             try:
                 # Verificar se a chave de API está definida
-                ###import os
                 api_key = os.environ.get("OPENAI_API_KEY")
                 if not api_key:
                     return jsonify({'status': 'error', 'message': 'Chave de API da OpenAI não encontrada. Defina a variável de ambiente OPENAI_API_KEY.'}), 500
                 
-                # Testar a conexão com a OpenAI
-                from openai import Client
-                client = Client(api_key=api_key)
-                
                 # Usar o modelo apropriado
                 model = "gpt-4o" if model_provider == "openai-vision" else "gpt-4o-mini"
                 
-                # Testar a conexão
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": "Olá, você está funcionando?"}],
-                    ###temperature=0.0,
+                # Testar a conexão pelo cliente compartilhado
+                llm_clients.run(llm_clients.chat(
+                    'openai',
+                    model,
+                    [{"role": "user", "content": "Olá, você está funcionando?"}],
                     max_tokens=10
-                )
+                ))
                 
                 return jsonify({'status': 'success', 'message': 'Conexão com OpenAI estabelecida com sucesso'})
             
@@ -847,6 +4863,10 @@ def scrape():
         model_provider = request.form.get('model_provider', 'openai')
         api_base = request.form.get('api_base', None)
         use_mock = request.form.get('use_mock', 'false').lower() == 'true'
+        cache_policy = request.form.get('cache_policy', 'use').lower()
+        
+        if cache_policy not in CACHE_POLICIES:
+            return jsonify({'error': f"cache_policy inválida: {cache_policy}. Use 'use', 'refresh' ou 'bypass'"}), 400
         
         # Processar campos
         fields = [field.strip() for field in fields_str.split(',') if field.strip()]
@@ -854,13 +4874,16 @@ def scrape():
         if not fields:
             return jsonify({'error': 'Nenhum campo especificado para extração'}), 400
         
-        # Verificar se há uma imagem
+        # Criar ID da tarefa
+        task_id = str(uuid.uuid4())
+        
+        # Verificar se há uma imagem (salva com o ID da tarefa: a limpeza remove o arquivo junto com a tarefa)
         image_path = None
         if 'page_image' in request.files:
             file = request.files['page_image']
             if file and file.filename and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
-                image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                image_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{task_id}_{filename}")
                 file.save(image_path)
                 logger.info(f"Imagem salva em: {image_path}")
         
@@ -868,64 +4891,291 @@ def scrape():
         if not url and not image_path and not use_mock:
             return jsonify({'error': 'Nem URL nem imagem fornecidas para processamento'}), 400
         
-        # Criar ID da tarefa
-        task_id = str(uuid.uuid4())
+        # URL com modelo de visão e sem imagem enviada: capturar a tela da página no navegador
+        capture_screenshot = (SCREENSHOT_CAPTURE_ENABLED and bool(url) and not image_path and not use_mock
+                              and is_vision_model(model_provider)
+                              and request.form.get('screenshot', 'true').lower() == 'true')
         
         # Inicializar tarefa
-        tasks[task_id] = {
+        task_store.create({
             'id': task_id,
             'status': 'pending',
+            'stage': 'queued',
             'url': url,
             'image_path': image_path,
             'fields': fields,
             'model_provider': model_provider,
             'api_base': api_base,
             'use_mock': use_mock,
+            'cache_policy': cache_policy,
+            'capture_screenshot': capture_screenshot,
             'created_at': time.time()
-        }
+        })
         
-        # Iniciar processamento em thread separada
-        thread = threading.Thread(
-            target=process_task,
-            args=(task_id, url, fields, model_provider, api_base, use_mock, image_path)
-        )
-        thread.daemon = True
-        thread.start()
+        # Enfileirar processamento no agendador de tarefas
+        try:
+            queue_position = task_scheduler.submit(
+                task_id, process_task,
+                task_id, url, fields, model_provider, api_base, use_mock, image_path, cache_policy, capture_screenshot
+            )
+        except queue.Full:
+            task_store.delete(task_id)
+            logger.warning(f"Fila de tarefas cheia ({task_scheduler.queue_size}). Requisição rejeitada.")
+            response = jsonify({
+                'error': 'Fila de processamento cheia. Tente novamente mais tarde.',
+                'queue_size': task_scheduler.queue_size,
+                'queued': task_scheduler.queued()
+            })
+            response.headers['Retry-After'] = '10'
+            return response, 429
         
-        return jsonify({'task_id': task_id})
+        return jsonify({'task_id': task_id, 'queue_position': queue_position})
     
     except Exception as e:
         logger.error(f"Erro ao iniciar scraping: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/status/<task_id>', methods=['GET'])
-def get_status(task_id):
-    if task_id not in tasks:
-        return jsonify({'error': 'Tarefa não encontrada'}), 404
+@app.route('/api/batch', methods=['POST'])
+def start_batch():
+    try:
+        # Aceitar JSON ({"urls": [...], "fields": [...]}) ou formulário (campo "urls" e/ou arquivo "url_file")
+        if request.is_json:
+            data = request.get_json(silent=True) or {}
+            urls_value = data.get('urls', [])
+            urls = parse_url_list('\n'.join(urls_value) if isinstance(urls_value, list) else str(urls_value))
+            fields_value = data.get('fields', [])
+            fields_str = ','.join(fields_value) if isinstance(fields_value, list) else str(fields_value)
+            params = data
+        else:
+            urls_text = request.form.get('urls', '')
+            if 'url_file' in request.files:
+                urls_text += '\n' + request.files['url_file'].read().decode('utf-8', errors='ignore')
+            urls = parse_url_list(urls_text)
+            fields_str = request.form.get('fields', '')
+            params = request.form
+        
+        model_provider = params.get('model_provider', 'openai')
+        api_base = params.get('api_base', None)
+        cache_policy = str(params.get('cache_policy', 'use')).lower()
+        
+        # Processar campos
+        fields = [field.strip() for field in fields_str.split(',') if field.strip()]
+        
+        if not fields:
+            return jsonify({'error': 'Nenhum campo especificado para extração'}), 400
+        if not urls:
+            return jsonify({'error': 'Nenhuma URL válida fornecida'}), 400
+        if len(urls) > BATCH_MAX_URLS:
+            return jsonify({'error': f'Número máximo de URLs por job excedido ({BATCH_MAX_URLS})'}), 400
+        if cache_policy not in CACHE_POLICIES:
+            return jsonify({'error': f"cache_policy inválida: {cache_policy}. Use 'use', 'refresh' ou 'bypass'"}), 400
+        
+        try:
+            parallelism = int(params.get('parallelism', BATCH_DEFAULT_PARALLELISM))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'parallelism deve ser um número inteiro'}), 400
+        parallelism = max(1, min(parallelism, BATCH_MAX_PARALLELISM, len(urls)))
+        pack_pages = str(params.get('pack_pages', LLM_PACK_DEFAULT)).lower() in ('true', '1', 'yes', 'on')
+        
+        # Criar e registrar o job
+        job_id = str(uuid.uuid4())
+        task_store.create({
+            'id': job_id,
+            'type': 'batch',
+            'status': 'pending',
+            'stage': 'queued',
+            'urls': urls,
+            'fields': fields,
+            'model_provider': model_provider,
+            'api_base': api_base,
+            'cache_policy': cache_policy,
+            'parallelism': parallelism,
+            'pack_pages': pack_pages,
+            'total': len(urls),
+            'completed': 0,
+            'failed': 0,
+            'items': [{'url': url, 'status': 'pending'} for url in urls],
+            'created_at': time.time()
+        })
+        
+        try:
+            queue_position = task_scheduler.submit(
+                job_id, process_batch,
+                job_id, urls, fields, model_provider, api_base, parallelism, cache_policy, pack_pages
+            )
+        except queue.Full:
+            task_store.delete(job_id)
+            response = jsonify({
+                'error': 'Fila de processamento cheia. Tente novamente mais tarde.',
+                'queue_size': task_scheduler.queue_size,
+                'queued': task_scheduler.queued()
+            })
+            response.headers['Retry-After'] = '10'
+            return response, 429
+        
+        return jsonify({'job_id': job_id, 'total': len(urls), 'queue_position': queue_position})
+    
+    except Exception as e:
+        logger.error(f"Erro ao iniciar job em lote: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def build_batch_status(job):
+    """Monta a resposta de status de um job em lote (usada por /api/batch e pelo stream de status)."""
+    response = {
+        'status': job['status'],
+        'stage': job.get('stage'),
+        'created_at': job['created_at'],
+        'total': job['total'],
+        'completed': job['completed'],
+        'failed': job['failed'],
+        'progress': round(job['completed'] / job['total'], 4) if job['total'] else 1.0,
+        'items': job['items']
+    }
+    
+    if job['status'] == 'pending':
+        response['queue_position'] = task_scheduler.position(job['id'])
     
-    task = tasks[task_id]
+    if job['status'] == 'completed':
+        response['result_count'] = job['result_count']
     
+    if job['status'] == 'error' and 'message' in job:
+        response['message'] = job['message']
+    
+    return response
+
+def build_task_status(task):
+    """Monta a resposta de status de uma tarefa (usada por /api/status e pelo stream de status)."""
     response = {
         'status': task['status'],
+        'stage': task.get('stage'),
         'created_at': task['created_at']
     }
     
+    if task['status'] == 'pending':
+        response['queue_position'] = task_scheduler.position(task['id'])
+    
+    # Itens preliminares recebidos do LLM em streaming, substituídos por extracted_data ao concluir
+    if task['status'] == 'processing' and task.get('partial_data'):
+        response['partial_data'] = task['partial_data']
+    
     if task['status'] == 'completed':
         response['extracted_data'] = task['extracted_data']
         response['result_count'] = task['result_count']
+        if 'stats' in task:
+            response['stats'] = task['stats']
+    
+    if task['status'] == 'error':
+        if 'message' in task:
+            response['message'] = task['message']
+        if 'stats' in task:
+            response['stats'] = task['stats']
+    
+    return response
+
+@app.route('/api/batch/<job_id>', methods=['GET'])
+def get_batch_status(job_id):
+    job = task_store.get(job_id)
+    if job is None or job.get('type') != 'batch':
+        return jsonify({'error': 'Job não encontrado'}), 404
+    
+    return jsonify(build_batch_status(job))
+
+@app.route('/api/status/<task_id>', methods=['GET'])
+def get_status(task_id):
+    task = task_store.get(task_id)
+    if task is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    
+    return jsonify(build_task_status(task))
+
+@app.route('/api/status/<task_id>/stream', methods=['GET'])
+def stream_status(task_id):
+    """
+    Stream de status via Server-Sent Events (substitui o polling).
+    
+    Emite um evento 'stage' a cada mudança de etapa (queued, fetching, cleaning, llm, exporting;
+    jobs em lote usam processing e também emitem a cada URL concluída), um evento 'rows' com os
+    novos itens preliminares ({'offset', 'rows'}) à medida que o LLM os completa em streaming, e um
+    único evento 'done' com a resposta completa de /api/status (ou /api/batch) quando a tarefa
+    termina ou falha.
+    """
+    if task_store.get(task_id) is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
     
-    if task['status'] == 'error' and 'message' in task:
-        response['message'] = task['message']
+    def events():
+        started = time.time()
+        last_sent = started
+        last_state = None
+        sent_rows = 0
+        yield "retry: 2000\n\n"
+        while time.time() - started < TASK_STREAM_MAX_DURATION:
+            task = task_store.get(task_id)
+            if task is None:
+                yield f"event: done\ndata: {json.dumps({'status': 'error', 'message': 'Tarefa não encontrada'})}\n\n"
+                return
+            
+            build = build_batch_status if task.get('type') == 'batch' else build_task_status
+            if task['status'] in ('completed', 'error'):
+                yield f"event: done\ndata: {json.dumps(build(task), ensure_ascii=False)}\n\n"
+                return
+            
+            state = (task['status'], task.get('stage'), task.get('completed'), task_scheduler.position(task_id))
+            if state != last_state:
+                payload = {'status': task['status'], 'stage': task.get('stage'), 'queue_position': state[3]}
+                if task.get('type') == 'batch':
+                    payload.update(total=task['total'], completed=task['completed'], failed=task['failed'])
+                yield f"event: stage\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                last_state = state
+                last_sent = time.time()
+            
+            partial_rows = task.get('partial_data') or []
+            if len(partial_rows) > sent_rows:
+                payload = {'offset': sent_rows, 'rows': partial_rows[sent_rows:]}
+                yield f"event: rows\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                sent_rows = len(partial_rows)
+                last_sent = time.time()
+            elif time.time() - last_sent >= TASK_STREAM_HEARTBEAT:
+                yield ": ping\n\n"
+                last_sent = time.time()
+            
+            task_store.wait_for_change(TASK_STREAM_POLL_INTERVAL)
     
-    return jsonify(response)
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Métricas do pipeline no formato de exposição do Prometheus
+    counts = task_store.count_by_status()
+    for status in ('pending', 'processing', 'completed', 'error'):
+        pipeline_metrics.set_gauge('scraper_tasks_stored', counts.get(status, 0), status=status)
+    pipeline_metrics.set_gauge('scraper_task_queue_length', task_scheduler.queued())
+    return Response(pipeline_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/readiness-stats', methods=['GET'])
+def get_readiness_stats():
+    # Tempos de espera por prontidão da página, por domínio (para ajuste de READINESS_PROFILES)
+    return jsonify(readiness_stats.summary())
+
+@app.route('/api/llm-cache-stats', methods=['GET'])
+def get_llm_cache_stats():
+    # Contadores do cache de respostas do LLM
+    return jsonify(llm_response_cache.stats())
+
+@app.route('/api/extraction-templates', methods=['GET'])
+def get_extraction_templates():
+    # Templates de extração aprendidos por domínio
+    return jsonify(extraction_templates.stats())
 
 @app.route('/api/download/<task_id>/<file_type>', methods=['GET'])
 def download_file(task_id, file_type):
-    if task_id not in tasks:
+    task = task_store.get(task_id)
+    if task is None:
         return jsonify({'error': 'Tarefa não encontrada'}), 404
     
-    task = tasks[task_id]
-    
     if task['status'] != 'completed':
         return jsonify({'error': 'Tarefa ainda não foi concluída'}), 400
     
@@ -934,6 +5184,8 @@ def download_file(task_id, file_type):
     elif file_type == 'json':
         return send_file(task['json_file'], as_attachment=True, download_name='extracted_data.json')
     elif file_type == 'text':
+        if 'text_file' not in task:
+            return jsonify({'error': 'Texto processado não disponível para esta tarefa'}), 404
         return send_file(task['text_file'], as_attachment=True, download_name='processed_text.txt')
     else:
         return jsonify({'error': 'Tipo de arquivo inválido'}), 400
@@ -985,4 +5237,11 @@ if __name__ == '__main__':
          except Exception as e:
             logger.error(f"Falha ao copiar style.css: {e}")
 
+    # Aquecer o pool de navegadores antes de receber tarefas
+    if BROWSER_POOL_PREWARM:
+        try:
+            browser_pool.warm()
+        except Exception as e:
+            logger.error(f"Falha ao aquecer o pool de navegadores: {e}")
+
     app.run(host='0.0.0.0', port=5000, debug=True)